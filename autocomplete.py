@@ -0,0 +1,128 @@
+import threading
+from bisect import bisect_left
+from typing import Optional
+
+from rich.text import Text
+from textual_autocomplete import DropdownItem
+
+# local imports
+from inventory_store import InventoryStore, get_inventory_store
+
+NGRAM = 3
+
+
+class AutocompleteIndex:
+    """
+    In-memory index over inventory device names for the command input autocomplete.
+
+    The index is built once and only rebuilt when the inventory store's version changes. Names are
+    kept sorted for prefix lookups, and a trigram index narrows down substring lookups. Only the
+    top-k matches are returned, and DropdownItems are reused between keystrokes.
+
+    Args:
+        store (InventoryStore): Local SoT inventory
+        limit (int): Max number of matches returned
+    """
+
+    def __init__(self, store: InventoryStore, limit: int = 20):
+        self.store = store
+        self.limit = limit
+        self._version = None
+        self._devices: list[dict] = []
+        self._names: list[str] = []
+        self._ngrams: dict[str, list[int]] = {}
+        self._items: dict[int, DropdownItem] = {}
+        self._lock = threading.Lock()
+
+    def refresh(self) -> None:
+        """Rebuild the index if the inventory changed since it was built"""
+        version = self.store.version
+        if version == self._version:
+            return
+        with self._lock:
+            devices = sorted(
+                self.store.iter_devices(), key=lambda dev: str(dev["name"]).lower()
+            )
+            names = [str(dev["name"]).lower() for dev in devices]
+            ngrams: dict[str, list[int]] = {}
+            for position, name in enumerate(names):
+                for gram in {name[i : i + NGRAM] for i in range(len(name) - NGRAM + 1)}:
+                    ngrams.setdefault(gram, []).append(position)
+            self._devices, self._names, self._ngrams = devices, names, ngrams
+            self._items = {}
+            self._version = version
+
+    def search(self, value: str) -> list[DropdownItem]:
+        """
+        Devices whose name contains `value`, names starting with `value` first
+
+        Args:
+            value (str): Text typed into the command input
+
+        Returns:
+            Up to `limit` DropdownItems
+        """
+        self.refresh()
+        value = value.lower()
+        positions = self._prefix_matches(value)
+        if len(positions) < self.limit:
+            seen = set(positions)
+            for position in self._substring_matches(value):
+                if position not in seen:
+                    positions.append(position)
+                    if len(positions) == self.limit:
+                        break
+        return [self._item(position) for position in positions]
+
+    def _prefix_matches(self, value: str) -> list[int]:
+        start = bisect_left(self._names, value)
+        positions = []
+        for position in range(start, min(start + self.limit, len(self._names))):
+            if not self._names[position].startswith(value):
+                break
+            positions.append(position)
+        return positions
+
+    def _substring_matches(self, value: str):
+        if len(value) < NGRAM:
+            # Too short for the trigram index, scan until enough matches are found
+            return (
+                position for position, name in enumerate(self._names) if value in name
+            )
+        postings = [
+            self._ngrams.get(value[i : i + NGRAM], [])
+            for i in range(len(value) - NGRAM + 1)
+        ]
+        postings.sort(key=len)
+        candidates = set(postings[0]).intersection(*postings[1:])
+        return (
+            position
+            for position in sorted(candidates)
+            if value in self._names[position]
+        )
+
+    def _item(self, position: int) -> DropdownItem:
+        item = self._items.get(position)
+        if item is None:
+            dev = self._devices[position]
+            item = DropdownItem(
+                Text(str(dev.get("name"))),  # 'main' column
+                Text(str(dev.get("primary_ip")), style="#a1a1a1"),
+                Text(str(dev.get("device_type")), style="#a1a1a1"),
+            )
+            self._items[position] = item
+        else:
+            # The dropdown highlights matches in place, so clear highlights from the last keystroke
+            item.main.spans = []
+        return item
+
+
+_index: Optional[AutocompleteIndex] = None
+
+
+def get_autocomplete_index() -> AutocompleteIndex:
+    """Returns the app-wide autocomplete index"""
+    global _index
+    if _index is None:
+        _index = AutocompleteIndex(get_inventory_store())
+    return _index
@@ -0,0 +1,92 @@
+"""
+Local stand-in for an OpenAI compatible chat completions API. Answers are canned and streamed
+word by word as server-sent events, like the real API does with "stream": true.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+ANSWER = (
+    "This JSON payload is the parsed output of a network device command. "
+    "Each entry in the list is one row of the command's table, and the keys are the column names."
+)
+
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    server: "MockOpenAIServer"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def do_POST(self) -> None:
+        if self.path.rstrip("/") != "/v1/chat/completions":
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        prompt = body["messages"][-1]["content"]
+        self.server.prompts.append(prompt)
+        if not body.get("stream"):
+            data = json.dumps(
+                {"choices": [{"message": {"role": "assistant", "content": ANSWER}}]}
+            ).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        words = ANSWER.split(" ")
+        for i, word in enumerate(words):
+            chunk = {
+                "choices": [
+                    {"delta": {"content": word + (" " if i < len(words) - 1 else "")}}
+                ]
+            }
+            self.send_chunk(f"data: {json.dumps(chunk)}\n\n")
+            time.sleep(self.server.delay)
+        self.send_chunk("data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def send_chunk(self, text: str) -> None:
+        data = text.encode()
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+class MockOpenAIServer(ThreadingHTTPServer):
+    """
+    Serves POST /v1/chat/completions on localhost. Set NET_TEXT_OPENAI_URL to `url` to use it.
+
+    Args:
+        delay (float): Seconds between streamed words
+    """
+
+    daemon_threads = True
+
+    def __init__(self, delay: float = 0.01):
+        super().__init__(("127.0.0.1", 0), MockOpenAIHandler)
+        self.delay = delay
+        self.prompts: list[str] = []
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def start(self) -> "MockOpenAIServer":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
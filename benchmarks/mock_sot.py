@@ -0,0 +1,168 @@
+"""
+Local stand-ins for the NetBox/Nautobot and Cisco DNAC REST endpoints used by the inventory sync.
+Inventories are generated on the fly, so the size can be changed between benchmark runs.
+"""
+
+import datetime
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlencode, urlparse
+
+# NetBox's default MAX_PAGE_SIZE
+MAX_PAGE_SIZE = 1000
+DNAC_MAX_LIMIT = 500
+PLATFORMS = ("cisco_ios", "cisco_nxos", "arista_eos", "juniper_junos")
+
+
+def netbox_device(index: int, updated: str) -> dict:
+    platform = PLATFORMS[index % len(PLATFORMS)]
+    return {
+        "id": index + 1,
+        "url": f"/api/dcim/devices/{index + 1}/",
+        "display": f"bench-{index:06d}",
+        "name": f"bench-{index:06d}",
+        "device_type": {
+            "id": index % 10 + 1,
+            "display": f"model-{index % 10}",
+            "model": f"model-{index % 10}",
+            "slug": f"model-{index % 10}",
+        },
+        "platform": {
+            "id": index % len(PLATFORMS) + 1,
+            "display": platform,
+            "name": platform,
+            "slug": platform,
+        },
+        "primary_ip": {
+            "id": index + 1,
+            "display": f"10.{index // 65536 % 256}.{index // 256 % 256}.{index % 256}/32",
+            "address": f"10.{index // 65536 % 256}.{index // 256 % 256}.{index % 256}/32",
+            "family": 4,
+        },
+        "last_updated": updated,
+    }
+
+
+def dnac_device(index: int) -> dict:
+    return {
+        "id": f"dnac-{index}",
+        "hostname": f"bench-{index:06d}",
+        "managementIpAddress": f"10.{index // 65536 % 256}.{index // 256 % 256}.{index % 256}",
+        "platformId": "C9300-48U",
+        "softwareType": "IOS-XE",
+    }
+
+
+class MockSoTHandler(BaseHTTPRequestHandler):
+    server: "MockSoTServer"
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def send_json(self, body, status: int = 200) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("API-Version", "3.7")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        self.server.requests += 1
+        if url.path.rstrip("/") == "/api/dcim/devices":
+            self.netbox_devices(url.path, query)
+        elif url.path == "/dna/intent/api/v1/network-device/count":
+            self.send_json({"response": self.server.devices, "version": "1.0"})
+        elif url.path == "/dna/intent/api/v1/network-device":
+            offset = int(query.get("offset", 1))
+            limit = min(int(query.get("limit", DNAC_MAX_LIMIT)), DNAC_MAX_LIMIT)
+            # DNAC offsets start at 1
+            start = max(0, offset - 1)
+            stop = min(start + limit, self.server.devices)
+            self.send_json(
+                {
+                    "response": [dnac_device(i) for i in range(start, stop)],
+                    "version": "1.0",
+                }
+            )
+        else:
+            self.send_json({"detail": "Not found."}, status=404)
+
+    def netbox_devices(self, path: str, query: dict) -> None:
+        """Paginated device list, like NetBox and Nautobot return it"""
+        indexes = range(self.server.devices)
+        updated_since = query.get("last_updated__gte")
+        if updated_since is not None:
+            # Only the last `changed` devices were updated after the first sync
+            indexes = range(
+                self.server.devices - self.server.changed, self.server.devices
+            )
+        limit = int(query.get("limit", 50))
+        limit = MAX_PAGE_SIZE if limit == 0 else min(limit, MAX_PAGE_SIZE)
+        offset = int(query.get("offset", 0))
+        page = indexes[offset : offset + limit]
+        brief = query.get("brief") in ("1", "true", "True")
+        results = []
+        for index in page:
+            updated = (
+                self.server.updated
+                if index < self.server.devices - self.server.changed
+                else self.server.changed_at
+            )
+            device = netbox_device(index, updated)
+            if brief:
+                device = {key: device[key] for key in ("id", "url", "display", "name")}
+            results.append(device)
+        next_url = None
+        if offset + limit < len(indexes):
+            next_query = dict(query, offset=offset + limit, limit=limit)
+            next_url = f"http://{self.headers['Host']}{path}?{urlencode(next_query)}"
+        self.send_json(
+            {
+                "count": len(indexes),
+                "next": next_url,
+                "previous": None,
+                "results": results,
+            }
+        )
+
+
+class MockSoTServer(ThreadingHTTPServer):
+    """
+    Serves a NetBox/Nautobot style /api/dcim/devices/ endpoint and the DNAC network-device
+    endpoints on localhost.
+
+    Args:
+        devices (int): Number of devices in the inventory
+        changed (int): Devices reported as changed by `last_updated__gte` queries (incremental syncs)
+    """
+
+    daemon_threads = True
+
+    def __init__(self, devices: int = 1000, changed: int = 0):
+        super().__init__(("127.0.0.1", 0), MockSoTHandler)
+        self.devices = devices
+        self.changed = changed
+        now = datetime.datetime.now(datetime.timezone.utc)
+        self.updated = (now - datetime.timedelta(days=1)).isoformat()
+        self.changed_at = now.isoformat()
+        self.requests = 0
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self) -> "MockSoTServer":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,179 @@
+"""
+Local SSH server that behaves enough like a Cisco IOS device for Netmiko: it accepts any
+username/password, echoes input, answers with canned outputs and shows an IOS prompt.
+"""
+
+import socket
+import threading
+from typing import Optional
+
+import paramiko
+
+SHOW_VERSION = """Cisco IOS Software, IOSv Software (VIOS-ADVENTERPRISEK9-M), Version 15.9(3)M4, RELEASE SOFTWARE (fc3)
+Technical Support: http://www.cisco.com/techsupport
+Copyright (c) 1986-2021 by Cisco Systems, Inc.
+Compiled Fri 14-May-21 15:08 by prod_rel_team
+
+ROM: Bootstrap program is IOSv
+
+{hostname} uptime is 1 week, 2 days, 3 hours, 4 minutes
+System returned to ROM by reload
+System image file is "flash0:/vios-adventerprisek9-m"
+Last reload reason: Unknown reason
+
+Cisco IOSv (revision 1.0) with  with 460137K/62464K bytes of memory.
+Processor board ID 9A1B2C3D4E5F6G7H8I9J0
+4 Gigabit Ethernet interfaces
+DRAM configuration is 72 bits wide with parity disabled.
+256K bytes of non-volatile configuration memory.
+2097152K bytes of ATA System CompactFlash 0 (Read/Write)
+
+Configuration register is 0x0
+"""
+
+INTERFACE_HEADER = (
+    "Interface              IP-Address      OK? Method Status                Protocol"
+)
+
+
+def interface_brief(lines: int) -> str:
+    """'show ip interface brief' output with `lines` interfaces"""
+    rows = [INTERFACE_HEADER]
+    for i in range(lines):
+        name = f"GigabitEthernet{i // 48}/{i % 48}"
+        address = f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}"
+        rows.append(
+            f"{name:<22} {address:<15} YES NVRAM  up                    up      "
+        )
+    return "\n".join(rows)
+
+
+class MockDevice(paramiko.ServerInterface):
+    """paramiko server interface that lets every login in and opens a shell"""
+
+    def __init__(self):
+        self.shell_requested = threading.Event()
+
+    def check_channel_request(self, kind, chanid):
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_auth_password(self, username, password):
+        return paramiko.AUTH_SUCCESSFUL
+
+    def get_allowed_auths(self, username):
+        return "password"
+
+    def check_channel_shell_request(self, channel):
+        self.shell_requested.set()
+        return True
+
+    def check_channel_pty_request(self, *args):
+        return True
+
+
+class MockSSHServer:
+    """
+    Fake Cisco IOS device listening on localhost. `show ip interface brief` returns
+    `interfaces` lines, so output size can be changed between benchmark runs.
+
+    Args:
+        hostname (str): Hostname shown in the prompt
+        interfaces (int): Number of interfaces in 'show ip interface brief'
+        port (int): Port to listen on, 0 picks a free port
+    """
+
+    def __init__(self, hostname: str = "bench-r1", interfaces: int = 10, port: int = 0):
+        self.hostname = hostname
+        self.interfaces = interfaces
+        self.host_key = paramiko.RSAKey.generate(2048)
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind(("127.0.0.1", port))
+        self._socket.listen(100)
+        self.port = self._socket.getsockname()[1]
+        self._outputs: dict[int, str] = {}
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def prompt(self) -> str:
+        return f"{self.hostname}#"
+
+    def start(self) -> "MockSSHServer":
+        self._thread = threading.Thread(target=self._accept, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._socket.close()
+
+    def _accept(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                client, _ = self._socket.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(client,), daemon=True).start()
+
+    def output(self, command: str) -> str:
+        """Canned output for a command"""
+        words = command.split()
+        if not words:
+            return ""
+        if words[0] in ("terminal", "term"):
+            return ""
+        if words[:2] in (["show", "version"], ["sh", "ver"]):
+            return SHOW_VERSION.format(hostname=self.hostname)
+        if (
+            words[0] in ("show", "sh")
+            and words[1:2] == ["ip"]
+            and words[2:3]
+            and words[2].startswith("int")
+        ):
+            # Built once per size, so the benchmark measures the client and not the server
+            if self.interfaces not in self._outputs:
+                self._outputs[self.interfaces] = interface_brief(self.interfaces)
+            return self._outputs[self.interfaces]
+        return "                ^\n% Invalid input detected at '^' marker."
+
+    def _serve(self, client: socket.socket) -> None:
+        transport = paramiko.Transport(client)
+        transport.add_server_key(self.host_key)
+        device = MockDevice()
+        try:
+            transport.start_server(server=device)
+            channel = transport.accept(20)
+            if channel is None or not device.shell_requested.wait(10):
+                return
+            channel.sendall(f"\r\n{self.prompt}")
+            buffer = ""
+            last_char = ""
+            while not self._stopped.is_set():
+                data = channel.recv(65536)
+                if not data:
+                    return
+                reply = ""
+                for char in data.decode(errors="ignore"):
+                    if char == "\n" and last_char == "\r":
+                        # '\r\n' is one line ending
+                        pass
+                    elif char in "\r\n":
+                        command, buffer = buffer, ""
+                        output = self.output(command)
+                        if output:
+                            reply += "\r\n" + output.replace("\n", "\r\n")
+                        reply += f"\r\n{self.prompt}"
+                    else:
+                        buffer += char
+                        # Echo what was typed, like a real terminal
+                        reply += char
+                    last_char = char
+                if reply:
+                    channel.sendall(reply)
+        except (EOFError, OSError, paramiko.SSHException):
+            return
+        finally:
+            transport.close()
@@ -0,0 +1,387 @@
+"""
+Benchmark suite. Starts a local mock SSH device and mock NetBox/Nautobot/DNAC APIs, times the
+device and inventory code paths across output and inventory sizes, and saves the timings to
+benchmarks/results/ so they can be compared between versions.
+
+Usage:
+    python benchmarks/run.py                       # full run, saves results/<timestamp>-<git rev>.json
+    python benchmarks/run.py --quick               # smaller sizes and fewer repeats
+    python benchmarks/run.py --compare latest      # flag benchmarks slower than the last saved run
+    python benchmarks/run.py --only sot_sync       # only benchmarks whose name contains 'sot_sync'
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT = BENCH_DIR.parent
+RESULTS_DIR = BENCH_DIR / "results"
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(BENCH_DIR))
+
+# local imports
+from mock_sot import MockSoTServer
+from mock_ssh import MockSSHServer
+
+HOST = "127.0.0.1"
+CREDENTIALS = {"username": "bench", "password": "bench"}
+
+FULL = {
+    "repeat": 5,
+    "connect_repeat": 3,
+    "output_lines": [100, 1000, 10000, 50000],
+    "inventory_sizes": [1000, 10000, 50000],
+}
+QUICK = {
+    "repeat": 3,
+    "connect_repeat": 1,
+    "output_lines": [100, 1000],
+    "inventory_sizes": [1000, 5000],
+}
+
+
+def measure(
+    func: Callable[[], object],
+    repeat: int,
+    setup: Optional[Callable[[], None]] = None,
+) -> dict:
+    """Time `func` `repeat` times, calling `setup` (untimed) before each run"""
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return summarize(times)
+
+
+def summarize(times: list[float]) -> dict:
+    return {
+        "runs": len(times),
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.mean(times),
+        "max": max(times),
+    }
+
+
+class BenchmarkRun:
+    """Runs the benchmarks and collects their timings"""
+
+    def __init__(self, config: dict, only: Optional[str] = None):
+        self.config = config
+        self.only = only
+        self.results: dict[str, dict] = {}
+
+    def record(
+        self,
+        name: str,
+        func: Callable[[], object],
+        repeat: Optional[int] = None,
+        setup: Optional[Callable[[], None]] = None,
+        **params,
+    ) -> None:
+        """Time `func` and keep the timings, unless the benchmark is filtered out"""
+        self.record_samples(
+            name,
+            lambda: measure(func, repeat or self.config["repeat"], setup),
+            **params,
+        )
+
+    def record_samples(self, name: str, collect: Callable[[], dict], **params) -> None:
+        """Keep timings measured by `collect`, which returns `summarize()` output"""
+        key = name + (
+            f"[{','.join(f'{k}={v}' for k, v in params.items())}]" if params else ""
+        )
+        if self.only and self.only not in key:
+            return
+        stats = collect()
+        self.results[key] = {"name": name, "params": params, **stats}
+        print(
+            f"{key:<50} median {stats['median'] * 1000:10.2f}ms  min {stats['min'] * 1000:10.2f}ms"
+        )
+
+
+def startup_benchmarks(run: BenchmarkRun) -> None:
+    from startup import measure_startup
+
+    run.record_samples(
+        "startup",
+        lambda: summarize(
+            [sample["first_frame"] for sample in measure_startup(run.config["repeat"])]
+        ),
+        phase="first_frame",
+    )
+
+
+def device_benchmarks(run: BenchmarkRun) -> None:
+    import helpers
+    from netmiko.ssh_autodetect import SSHDetect
+    from device_types import get_device_type_cache
+    from session_pool import close_session_pool
+
+    device = MockSSHServer().start()
+    os.environ["NET_TEXT_SSH_PORT"] = str(device.port)
+    repeat = run.config["connect_repeat"]
+    cache = get_device_type_cache()
+
+    def connect() -> None:
+        connection = helpers.device_connection(HOST, CREDENTIALS)
+        helpers.release_connection(connection)
+
+    def cold_start() -> None:
+        close_session_pool()
+        cache.invalidate(HOST)
+
+    def autodetect() -> None:
+        guesser = SSHDetect(
+            device_type="autodetect", host=HOST, port=device.port, **CREDENTIALS
+        )
+        guesser.autodetect()
+        guesser.connection.disconnect()
+
+    try:
+        run.record("autodetect", autodetect, repeat=repeat)
+        run.record(
+            "device_connection",
+            connect,
+            repeat=repeat,
+            setup=cold_start,
+            mode="autodetect",
+        )
+        run.record(
+            "device_connection",
+            connect,
+            repeat=repeat,
+            setup=close_session_pool,
+            mode="cached_device_type",
+        )
+        connect()
+        run.record("device_connection", connect, mode="pooled")
+
+        for lines in run.config["output_lines"]:
+            device.interfaces = lines
+            command = "show ip interface brief"
+            run.record(
+                "get_device_info",
+                lambda: helpers.get_device_info(f"{HOST} {command}"),
+                lines=lines,
+            )
+            run.record(
+                "run_device_command",
+                lambda: helpers.run_device_command(
+                    HOST, command, on_output=lambda chunk: None
+                ),
+                lines=lines,
+                mode="streamed",
+            )
+    finally:
+        close_session_pool()
+        device.stop()
+
+
+def inventory_benchmarks(run: BenchmarkRun) -> None:
+    import helpers
+    import autocomplete
+    from textual_autocomplete import InputState
+
+    for size in run.config["inventory_sizes"]:
+        sot = MockSoTServer(devices=size, changed=max(1, size // 100)).start()
+        try:
+            # netbox last, so the incremental sync below picks up its sync state
+            for source in ("nautobot", "netbox"):
+                run.record(
+                    "sot_sync",
+                    lambda: helpers.sot_sync(sot.url, "bench", source),
+                    repeat=1,
+                    source=source,
+                    devices=size,
+                )
+            run.record(
+                "sot_sync",
+                lambda: helpers.sot_sync(sot.url, "bench", "netbox", incremental=True),
+                repeat=1,
+                source="netbox_incremental",
+                devices=size,
+            )
+            run.record(
+                "dnac_inventory",
+                lambda: helpers.dnac_inventory(sot.url, "bench"),
+                repeat=1,
+                devices=size,
+            )
+
+            if run.only:
+                # The timed syncs may have been skipped, get_items still needs an inventory
+                helpers.sot_sync(sot.url, "bench", "netbox")
+
+            def reset_index() -> None:
+                autocomplete._index = None
+
+            state = InputState("bench-0001", len("bench-0001"))
+            run.record(
+                "get_items",
+                lambda: helpers.get_items(state),
+                setup=reset_index,
+                devices=size,
+                mode="cold",
+            )
+            helpers.get_items(state)
+            run.record(
+                "get_items", lambda: helpers.get_items(state), devices=size, mode="warm"
+            )
+            substring = InputState("00123", 5)
+            run.record(
+                "get_items",
+                lambda: helpers.get_items(substring),
+                devices=size,
+                mode="substring",
+            )
+        finally:
+            sot.stop()
+
+
+def tree_benchmarks(run: BenchmarkRun) -> None:
+    from rich.tree import Tree
+    from helpers import add_node
+    from mock_ssh import interface_brief
+    from parsers import parse_output
+
+    for lines in run.config["output_lines"]:
+        parsed = parse_output(
+            interface_brief(lines), "cisco_ios", "show ip interface brief"
+        )
+        run.record(
+            "add_node", lambda: add_node("Parsed Output", Tree(""), parsed), lines=lines
+        )
+        run.record(
+            "parse_output",
+            lambda: parse_output(
+                interface_brief(lines), "cisco_ios", "show ip int brief"
+            ),
+            lines=lines,
+        )
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "rev-parse", "--short", "HEAD"],
+                cwd=ROOT,
+                stderr=subprocess.DEVNULL,
+            )
+            .decode()
+            .strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(results: dict, config_name: str) -> Path:
+    RESULTS_DIR.mkdir(exist_ok=True)
+    revision = git_revision()
+    now = datetime.datetime.now()
+    path = RESULTS_DIR / f"{now:%Y%m%d-%H%M%S}-{revision or 'unknown'}.json"
+    with open(path, "w") as results_file:
+        json.dump(
+            {
+                "timestamp": now.isoformat(timespec="seconds"),
+                "revision": revision,
+                "config": config_name,
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "results": results,
+            },
+            results_file,
+            indent=2,
+        )
+    return path
+
+
+def load_baseline(name: str, exclude: Path) -> Optional[dict]:
+    """Load saved results, 'latest' picks the newest file in benchmarks/results/"""
+    if name == "latest":
+        saved = sorted(path for path in RESULTS_DIR.glob("*.json") if path != exclude)
+        if not saved:
+            return None
+        path = saved[-1]
+    else:
+        path = Path(name)
+    with open(path) as baseline_file:
+        baseline = json.load(baseline_file)
+    print(f"\nComparing with {path.name} (revision {baseline.get('revision')})")
+    return baseline
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """Print the change in median time per benchmark. Returns the benchmarks that got slower."""
+    regressions = []
+    for key, stats in results.items():
+        before = baseline["results"].get(key)
+        if before is None:
+            continue
+        change = stats["median"] / before["median"] - 1 if before["median"] else 0
+        flag = ""
+        if change > threshold:
+            flag = "  <-- slower"
+            regressions.append(key)
+        print(f"{key:<50} {change:+8.1%}{flag}")
+    return regressions
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--quick", action="store_true", help="Smaller sizes, fewer repeats"
+    )
+    parser.add_argument(
+        "--only", help="Only run benchmarks whose name contains this text"
+    )
+    parser.add_argument(
+        "--compare",
+        help="Results file to compare with, or 'latest' for the last saved run",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="Slowdown (fraction of the median) reported as a regression (default: 0.2)",
+    )
+    parser.add_argument("--no-save", action="store_true", help="Don't save the results")
+    args = parser.parse_args(argv)
+
+    if args.compare and args.compare != "latest":
+        args.compare = os.path.abspath(args.compare)
+    run = BenchmarkRun(QUICK if args.quick else FULL, only=args.only)
+    # Stores and caches are created in the working directory, so keep them out of the repo
+    os.chdir(tempfile.mkdtemp(prefix="net-textorial-bench-"))
+    startup_benchmarks(run)
+    device_benchmarks(run)
+    inventory_benchmarks(run)
+    tree_benchmarks(run)
+
+    path = None
+    if not args.no_save:
+        path = save_results(run.results, "quick" if args.quick else "full")
+        print(f"\nSaved results to {path}")
+    if args.compare:
+        baseline = load_baseline(args.compare, exclude=path)
+        if baseline is not None and compare(run.results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""
+Measure how long the app takes to draw its first frame. Each run starts a fresh Python process,
+so imports are measured cold, and runs the app headless until the first frame is drawn.
+
+Usage:
+    python benchmarks/startup.py                   # 5 runs, fails if the median is over 500 ms
+    python benchmarks/startup.py --runs 10 --target 0.3
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Runs in the child process. Startup is measured by the app itself (see NetTextorialApp.first_frame).
+CHILD = """
+import asyncio, json, sys
+sys.path.insert(0, {root!r})
+import net
+
+async def wait_for_first_frame(pilot):
+    while pilot.app.startup_time is None:
+        await asyncio.sleep(0.005)
+    pilot.app.exit({{
+        "import": net.IMPORTED - net.STARTED,
+        "first_frame": pilot.app.startup_time,
+    }})
+
+print(json.dumps(net.NetTextorialApp().run(headless=True, auto_pilot=wait_for_first_frame)))
+"""
+
+
+def measure_startup(runs: int = 5) -> list[dict]:
+    """
+    Start the app `runs` times
+
+    Returns:
+        List of dicts with 'import' and 'first_frame' (seconds since the app module started
+        importing) and 'process' (seconds since the process was started) keys
+    """
+    env = dict(os.environ, NET_TEXT_WARM_UP="0")
+    code = CHILD.format(root=str(ROOT))
+    samples = []
+    # Inventory, history and cache files are created in the working directory
+    with tempfile.TemporaryDirectory(prefix="net-textorial-startup-") as workdir:
+        for _ in range(runs):
+            start = time.perf_counter()
+            output = subprocess.run(
+                [sys.executable, "-c", code],
+                cwd=workdir,
+                env=env,
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout
+            elapsed = time.perf_counter() - start
+            sample = json.loads(output.strip().splitlines()[-1])
+            # Time to the first frame, plus starting the interpreter
+            sample["process"] = elapsed
+            samples.append(sample)
+    return samples
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--runs", type=int, default=5, help="Number of starts (default: 5)"
+    )
+    parser.add_argument(
+        "--target",
+        type=float,
+        default=0.5,
+        help="Seconds allowed until the first frame, compared with the median (default: 0.5)",
+    )
+    args = parser.parse_args(argv)
+
+    samples = measure_startup(args.runs)
+    for key, label in (
+        ("import", "Importing the app"),
+        ("first_frame", "First frame"),
+        ("process", "Process start to exit"),
+    ):
+        values = [sample[key] for sample in samples]
+        print(
+            f"{label:<24} median {statistics.median(values) * 1000:7.1f}ms"
+            f"  min {min(values) * 1000:7.1f}ms  max {max(values) * 1000:7.1f}ms"
+        )
+    median = statistics.median(sample["first_frame"] for sample in samples)
+    if median > args.target:
+        print(f"First frame took longer than the {args.target * 1000:.0f}ms target")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
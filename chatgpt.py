@@ -0,0 +1,330 @@
+import hashlib
+import json
+import os
+import threading
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Iterator, Optional
+
+# local imports
+from parsers import is_table
+
+DEFAULT_BASE_URL = "https://api.openai.com/v1"
+DEFAULT_MODEL = "gpt-3.5-turbo"
+PROMPT = "Tell me about this JSON payload: "
+# Rough size of a token in characters of JSON, close enough to budget prompts without a tokenizer
+CHARS_PER_TOKEN = 4
+# Distinct values listed per column in a table summary
+EXAMPLE_VALUES = 5
+
+
+class ChatError(Exception):
+    """The chat completions API could not be reached or returned an error"""
+
+
+def compact_json(data: Any) -> str:
+    return json.dumps(data, separators=(",", ":"), default=str)
+
+
+def table_schema(rows: list[dict]) -> dict:
+    """
+    Summary of a TextFSM table: the number of rows and, for each column, how many rows have a value,
+    how many distinct values there are and the most common ones
+    """
+    columns = {}
+    for column in rows[0]:
+        values = [
+            (
+                compact_json(row[column])
+                if isinstance(row[column], (list, dict))
+                else row[column]
+            )
+            for row in rows
+        ]
+        filled = [value for value in values if value not in ("", None, [])]
+        counts = Counter(filled)
+        columns[column] = {
+            "filled": len(filled),
+            "distinct": len(counts),
+            "examples": [value for value, _ in counts.most_common(EXAMPLE_VALUES)],
+        }
+    return {"rows": len(rows), "columns": columns}
+
+
+def sample_rows(rows: list[dict], budget: int) -> list[dict]:
+    """
+    Rows spread evenly across a table, as many as fit in `budget` characters of JSON.
+    The first and last rows are always tried first, so the sample shows both ends of the table.
+    """
+    picked: dict[int, dict] = {}
+    size = 2
+    # Halve the step each pass, so the sample stays spread out however many rows fit
+    step = len(rows)
+    while step >= 1 and len(picked) < len(rows):
+        for index in list(range(0, len(rows), step)) + [len(rows) - 1]:
+            if index in picked:
+                continue
+            row_size = len(compact_json(rows[index])) + 1
+            if size + row_size > budget:
+                return [picked[i] for i in sorted(picked)]
+            picked[index] = rows[index]
+            size += row_size
+        step //= 2
+    return [picked[i] for i in sorted(picked)]
+
+
+def reduce_payload(data: Any, budget: int) -> Any:
+    """
+    Shrink parsed output to at most `budget` characters of JSON. Tables are replaced by their schema
+    and a sample of rows, dicts (e.g. outputs keyed by device) and lists share the budget between
+    their values, and long strings are cut. Entries left once the budget runs out are left out.
+    """
+    if len(compact_json(data)) <= budget:
+        return data
+    if is_table(data):
+        schema = table_schema(data)
+        remaining = budget - len(compact_json({"schema": schema, "sample_rows": []}))
+        # The schema may not fit either, e.g. for very wide tables, then it's reduced like any dict
+        return reduce_payload(
+            {"schema": schema, "sample_rows": sample_rows(data, max(remaining, 0) + 2)},
+            budget,
+        )
+    if isinstance(data, dict):
+        reduced = {}
+        size = 2
+        for position, (key, value) in enumerate(data.items()):
+            left = len(data) - position
+            # Keep room for a note saying how many entries were left out
+            note = len(compact_json({"...": f"{left} more entries left out"}))
+            key_size = len(compact_json(str(key))) + 2
+            share = _share(budget - size - note, left) - key_size
+            if share < 2:
+                break
+            value = reduce_payload(value, share)
+            value_size = len(compact_json(value))
+            if value_size > share:
+                break
+            reduced[key] = value
+            size += key_size + value_size
+        else:
+            return reduced
+        note = {"...": f"{len(data) - len(reduced)} more entries left out"}
+        if size + len(compact_json(note)) - 1 <= budget:
+            reduced.update(note)
+        return reduced
+    if isinstance(data, list):
+        size = len(compact_json({"items": len(data), "sample": []}))
+        sample = []
+        for position, item in enumerate(data):
+            share = _share(budget - size, len(data) - position) - 1
+            if share < 2:
+                break
+            item = reduce_payload(item, share)
+            item_size = len(compact_json(item))
+            if item_size > share:
+                break
+            sample.append(item)
+            size += item_size + 1
+        if size > budget:
+            return []
+        return {"items": len(data), "sample": sample}
+    if isinstance(data, str):
+        suffix = "...(cut)"
+        if budget < len(compact_json(suffix)):
+            return ""
+        text = data[:budget]
+        # Escaped characters take more than one character of JSON, cut until it fits
+        excess = len(compact_json(text + suffix)) - budget
+        while excess > 0:
+            text = text[:-excess]
+            excess = len(compact_json(text + suffix)) - budget
+        return text + suffix
+    # Other values, e.g. huge numbers, are dropped
+    return ""
+
+
+def _share(remaining: int, entries: int) -> int:
+    """Budget for the next of `entries` values: an even split, at least 64 but never more than what's left"""
+    return min(max(remaining // max(entries, 1), 64), remaining)
+
+
+def build_prompt(parsed_output: Any, max_tokens: int) -> str:
+    """
+    Question asked about parsed output. Output that's over the token budget is reduced with
+    `reduce_payload()` and the prompt says so, so the answer isn't about a partial table.
+    """
+    budget = max_tokens * CHARS_PER_TOKEN - len(PROMPT)
+    payload = compact_json(parsed_output)
+    if len(payload) <= budget:
+        return PROMPT + payload
+    note = (
+        "The payload was too large to send, so tables were replaced by a schema summary "
+        "(row count, and filled/distinct counts and common values per column) and a sample of rows. "
+    )
+    return (
+        note + PROMPT + compact_json(reduce_payload(parsed_output, budget - len(note)))
+    )
+
+
+class AnswerCache:
+    """
+    Answers kept in memory by a hash of the model and the prompt, so reopening the tab for the same
+    output doesn't ask again. The least recently used answer is dropped once `max_entries` are kept.
+
+    Args:
+        max_entries (int): Maximum number of answers kept
+    """
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._answers: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(model: str, prompt: str) -> str:
+        return hashlib.sha256(f"{model}\n{prompt}".encode()).hexdigest()
+
+    def get(self, model: str, prompt: str) -> Optional[str]:
+        key = self.make_key(model, prompt)
+        with self._lock:
+            answer = self._answers.get(key)
+            if answer is not None:
+                self._answers.move_to_end(key)
+            return answer
+
+    def put(self, model: str, prompt: str, answer: str) -> None:
+        if self.max_entries <= 0:
+            return
+        key = self.make_key(model, prompt)
+        with self._lock:
+            self._answers[key] = answer
+            self._answers.move_to_end(key)
+            while len(self._answers) > self.max_entries:
+                self._answers.popitem(last=False)
+
+
+def stream_chat(
+    prompt: str,
+    api_key: str,
+    base_url: str = DEFAULT_BASE_URL,
+    model: str = DEFAULT_MODEL,
+    timeout: float = 60,
+) -> Iterator[str]:
+    """
+    Ask a question through an OpenAI compatible chat completions API and yield the answer as it
+    is generated, a few tokens at a time
+
+    Args:
+        prompt (str): Question to ask
+        api_key (str): API key, sent as a bearer token
+        base_url (str): API URL up to and including the version, e.g. 'http://localhost:8000/v1'
+        model (str): Model name
+        timeout (float): Seconds allowed to connect and between chunks of the answer
+
+    Raises:
+        ChatError: If the API can't be reached or returns an error
+    """
+    import requests
+
+    try:
+        response = requests.post(
+            url=f"{base_url.rstrip('/')}/chat/completions",
+            headers={"authorization": f"Bearer {api_key}"},
+            json={
+                "model": model,
+                "messages": [{"role": "user", "content": prompt}],
+                "stream": True,
+            },
+            stream=True,
+            timeout=timeout,
+        )
+    except requests.RequestException as e:
+        raise ChatError(f"Could not reach {base_url}: {e}")
+
+    with response:
+        if response.status_code != 200:
+            try:
+                message = response.json()["error"]["message"]
+            except (ValueError, KeyError, TypeError):
+                message = response.text[:200]
+            raise ChatError(f"The API returned {response.status_code}: {message}")
+        try:
+            # Server-sent events: one 'data: <json>' line per chunk, then 'data: [DONE]'
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:") :].strip()
+                if data == "[DONE]":
+                    return
+                choices = json.loads(data).get("choices") or [{}]
+                content = choices[0].get("delta", {}).get("content")
+                if content:
+                    yield content
+        except (requests.RequestException, ValueError) as e:
+            raise ChatError(f"The answer was cut off: {e}")
+
+
+_cache: Optional[AnswerCache] = None
+
+
+def get_answer_cache() -> AnswerCache:
+    """Returns the app-wide answer cache, its size can be set with NET_TEXT_OPENAI_CACHE_SIZE (default: 64)"""
+    global _cache
+    if _cache is None:
+        _cache = AnswerCache(
+            max_entries=int(os.getenv("NET_TEXT_OPENAI_CACHE_SIZE", 64))
+        )
+    return _cache
+
+
+def ask_about_output(
+    parsed_output: Any,
+    on_text: Callable[[str], None],
+    cancelled: Optional[Callable[[], bool]] = None,
+) -> Optional[str]:
+    """
+    Ask ChatGPT to explain parsed output. Settings are read from environment variables:
+        - OPEN_AI_KEY: API key (required)
+        - NET_TEXT_OPENAI_URL: base URL of an OpenAI compatible API (default: https://api.openai.com/v1)
+        - NET_TEXT_OPENAI_MODEL: model name (default: gpt-3.5-turbo)
+        - NET_TEXT_OPENAI_MAX_TOKENS: size of the prompt, bigger outputs are reduced (default: 3000)
+
+    Args:
+        parsed_output (Any): Parsed output to explain
+        on_text (Callable): Receives the answer so far each time more of it arrives
+        cancelled (Callable): Optional callback, the answer stops streaming when it returns True
+
+    Returns:
+        The full answer, or None if no API key is set or the answer was cancelled
+
+    Raises:
+        ChatError: If the API can't be reached or returns an error
+    """
+    if cancelled is None:
+        cancelled = lambda: False
+    api_key = os.getenv("OPEN_AI_KEY")
+    if api_key is None:
+        return None
+    model = os.getenv("NET_TEXT_OPENAI_MODEL", DEFAULT_MODEL)
+    prompt = build_prompt(
+        parsed_output, int(os.getenv("NET_TEXT_OPENAI_MAX_TOKENS", 3000))
+    )
+    cache = get_answer_cache()
+    answer = cache.get(model, prompt)
+    if answer is not None:
+        on_text(answer)
+        return answer
+
+    chunks = []
+    for chunk in stream_chat(
+        prompt,
+        api_key,
+        base_url=os.getenv("NET_TEXT_OPENAI_URL", DEFAULT_BASE_URL),
+        model=model,
+    ):
+        if cancelled():
+            return None
+        chunks.append(chunk)
+        on_text("".join(chunks))
+    answer = "".join(chunks)
+    cache.put(model, prompt, answer)
+    return answer
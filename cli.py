@@ -0,0 +1,226 @@
+"""
+Run commands on many devices without the TUI, e.g. from cron or a pipeline.
+One JSON record is written per device and command as soon as it finishes (NDJSON).
+
+Example:
+    python cli.py -t 'dist-*' -t type:cisco_nxos -c 'show version' -c 'show ip route' -o results.ndjson
+"""
+
+import argparse
+import datetime
+import json
+import sys
+import time
+from typing import Iterator, Optional, TextIO
+
+# local imports
+from export import FORMATS, ExportError, TableExporter
+from fanout import resolve_targets, run_fanout
+from inventory_store import get_inventory_store
+from parsers import close_parse_pool
+from session_pool import close_session_pool
+from timing import get_timing_stats
+
+
+def read_lines(path: str) -> list[str]:
+    """Non-empty lines of a file, skipping '#' comments. '-' reads stdin."""
+    handle = sys.stdin if path == "-" else open(path)
+    try:
+        lines = [line.split("#", 1)[0].strip() for line in handle]
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+    return [line for line in lines if line]
+
+
+def collect_targets(selectors: list[str]) -> list[dict]:
+    """
+    Resolve host selectors to devices, removing duplicates
+
+    Args:
+        selectors (list[str]): Hostnames/IPs, comma separated lists, inventory name globs or 'type:<device type>'
+
+    Returns:
+        List of dicts with 'name' and 'host' keys
+    """
+    store = get_inventory_store()
+    targets = {}
+    for selector in selectors:
+        for target in resolve_targets(selector, store):
+            targets.setdefault(target["host"], target)
+    return list(targets.values())
+
+
+def to_record(result: dict, include_raw: bool = True) -> dict:
+    """NDJSON record for a device result"""
+    record = {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "name": result["name"],
+        "host": result["host"],
+        "command": result["command"],
+        "ok": not result["error"],
+        "error": result["error"],
+        "elapsed": round(result["elapsed"], 3),
+        "parsed_output": result["parsed_output"],
+        "timings": {
+            phase: round(duration, 4)
+            for phase, duration in result["trace"].phases.items()
+        },
+    }
+    if include_raw:
+        record["raw_output"] = result["raw_output"]
+    return record
+
+
+def write_records(
+    results: Iterator[dict],
+    output: TextIO,
+    include_raw: bool = True,
+    exporter: Optional[TableExporter] = None,
+) -> tuple[int, int]:
+    """
+    Write each result as one JSON line and flush it, so readers see results as they finish.
+    Tabular parsed output is also appended to the exporter's datasets, if one is given.
+
+    Returns:
+        Tuple of (results written, results that failed)
+    """
+    written = failed = 0
+    for result in results:
+        record = to_record(result, include_raw)
+        output.write(json.dumps(record) + "\n")
+        output.flush()
+        if exporter is not None:
+            try:
+                exporter.export_result(
+                    result, datetime.datetime.fromisoformat(record["timestamp"])
+                )
+            except ExportError as e:
+                print(f"{result['name']}: {e}", file=sys.stderr)
+        written += 1
+        failed += bool(result["error"])
+    return written, failed
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="net-textorial",
+        description="Run 'show' commands on devices and stream the results as NDJSON.",
+    )
+    parser.add_argument(
+        "-t",
+        "--target",
+        action="append",
+        default=[],
+        help="Device(s) to run on: hostname/IP, comma separated list, inventory name glob "
+        "(e.g. 'dist-*') or 'type:<device type>'. Can be repeated.",
+    )
+    parser.add_argument(
+        "-T",
+        "--targets-file",
+        help="File with one target (or selector) per line, '-' for stdin",
+    )
+    parser.add_argument(
+        "-c",
+        "--command",
+        action="append",
+        default=[],
+        help="'show' command to run on every target. Can be repeated.",
+    )
+    parser.add_argument("-C", "--commands-file", help="File with one command per line")
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="Append results to this file instead of writing them to stdout",
+    )
+    parser.add_argument(
+        "-j",
+        "--concurrency",
+        type=int,
+        help="Devices queried at once (default: NET_TEXT_CONCURRENCY or 16)",
+    )
+    parser.add_argument(
+        "--trace",
+        help="Write the time spent in each phase on each device to this Chrome trace file "
+        "(the last NET_TEXT_TRACE_KEEP runs, default 1000)",
+    )
+    parser.add_argument(
+        "--export",
+        metavar="DIR",
+        help="Also append tabular parsed output to columnar datasets in this directory, "
+        "one per platform and command, e.g. DIR/cisco_ios/show_interfaces.csv",
+    )
+    parser.add_argument(
+        "--export-format",
+        choices=FORMATS,
+        default="csv",
+        help="Format of the --export datasets (default: csv, parquet needs pyarrow)",
+    )
+    parser.add_argument(
+        "--no-raw",
+        action="store_true",
+        help="Leave the raw output out of the records",
+    )
+    args = parser.parse_args(argv)
+
+    if args.targets_file:
+        args.target += read_lines(args.targets_file)
+    if args.commands_file:
+        args.command += read_lines(args.commands_file)
+    if not args.target:
+        parser.error("no targets given, use --target or --targets-file")
+    if not args.command:
+        parser.error("no commands given, use --command or --commands-file")
+    return args
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """
+    Returns:
+        Exit code: 0 if every command succeeded, 1 if any failed, 2 if the export can't be set up,
+            3 if no device matched
+    """
+    args = parse_args(argv)
+    targets = collect_targets(args.target)
+    if not targets:
+        print("No devices match the given targets.", file=sys.stderr)
+        return 3
+
+    try:
+        exporter = (
+            TableExporter(args.export, args.export_format) if args.export else None
+        )
+    except ExportError as e:
+        print(e, file=sys.stderr)
+        return 2
+    output = open(args.output, "a") if args.output else sys.stdout
+    start = time.perf_counter()
+    try:
+        written, failed = write_records(
+            run_fanout(targets, args.command, max_workers=args.concurrency),
+            output,
+            include_raw=not args.no_raw,
+            exporter=exporter,
+        )
+    except KeyboardInterrupt:
+        print("Interrupted, results so far were written.", file=sys.stderr)
+        return 130
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        if exporter is not None:
+            exporter.close()
+        close_session_pool()
+        close_parse_pool()
+        if args.trace:
+            get_timing_stats().export(args.trace)
+    print(
+        f"Ran {len(args.command)} command(s) on {len(targets)} device(s) in "
+        f"{time.perf_counter() - start:.1f}s: {written - failed} succeeded, {failed} failed",
+        file=sys.stderr,
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+import json
+import os
+import threading
+import time
+from typing import Optional
+
+CACHE_FILE = "device_type_cache.json"
+
+# Common SoT platform names that don't match a Netmiko device type as-is
+PLATFORM_ALIASES = {
+    "ios": "cisco_ios",
+    "ios-xe": "cisco_xe",
+    "iosxe": "cisco_xe",
+    "ios_xe": "cisco_xe",
+    "ios-xr": "cisco_xr",
+    "iosxr": "cisco_xr",
+    "ios_xr": "cisco_xr",
+    "nx-os": "cisco_nxos",
+    "nxos": "cisco_nxos",
+    "asa": "cisco_asa",
+    "eos": "arista_eos",
+    "junos": "juniper_junos",
+}
+
+
+def netmiko_device_type(platform: Optional[str]) -> Optional[str]:
+    """
+    Map a platform name from a SoT (e.g. 'cisco-ios', 'IOS-XE', 'arista_eos') to a Netmiko device type
+
+    Args:
+        platform (str): Platform slug/name as stored in the SoT
+
+    Returns:
+        Netmiko device type or None if the platform isn't recognized
+    """
+    if not platform:
+        return None
+    value = str(platform).strip().lower()
+    if value in PLATFORM_ALIASES:
+        return PLATFORM_ALIASES[value]
+    value = value.replace("-", "_").replace(" ", "_")
+    if value in PLATFORM_ALIASES:
+        return PLATFORM_ALIASES[value]
+    # Imported here, Netmiko is slow to import and isn't needed until the first sync or command
+    from netmiko.ssh_dispatcher import CLASS_MAPPER
+
+    if value in CLASS_MAPPER and value != "autodetect":
+        return value
+    return None
+
+
+class DeviceTypeCache:
+    """
+    Local store of Netmiko device types per host, so SSHDetect only runs for hosts we haven't seen.
+
+    Autodetected entries expire after `ttl` seconds. Entries seeded from the SoT inventory don't expire,
+    but every entry is dropped as soon as a connection with it fails.
+
+    Args:
+        path (str): JSON file the cache is persisted to
+        ttl (float): Seconds an autodetected device type is trusted for
+    """
+
+    def __init__(self, path: str = CACHE_FILE, ttl: float = 7 * 24 * 3600):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = self._load()
+
+    def get(self, host: str) -> Optional[str]:
+        """Returns the cached device type for a host, or None if unknown or expired"""
+        with self._lock:
+            entry = self._entries.get(host)
+            if entry is None:
+                return None
+            if entry.get("source") == "autodetect" and (
+                time.time() - entry.get("updated", 0) > self.ttl
+            ):
+                del self._entries[host]
+                return None
+            return entry.get("device_type")
+
+    def set(self, host: str, device_type: str, source: str = "autodetect") -> None:
+        """Store the device type for a host"""
+        with self._lock:
+            self._entries[host] = {
+                "device_type": device_type,
+                "source": source,
+                "updated": time.time(),
+            }
+            self._save()
+
+    def invalidate(self, host: str) -> None:
+        """Forget the device type for a host, e.g. after a failed connection"""
+        with self._lock:
+            if self._entries.pop(host, None) is not None:
+                self._save()
+
+    def seed_from_inventory(self, devices: list[dict]) -> int:
+        """
+        Seed device types from inventory records synced from a SoT. Both the device name
+        and its primary IP are cached, since either can be typed into the command input.
+
+        Args:
+            devices (list[dict]): Inventory records with 'name', 'primary_ip', 'platform' and 'device_type' keys
+
+        Returns:
+            Number of devices with a recognized platform
+        """
+        seeded = 0
+        now = time.time()
+        with self._lock:
+            for dev in devices:
+                device_type = netmiko_device_type(
+                    dev.get("platform")
+                ) or netmiko_device_type(dev.get("device_type"))
+                if device_type is None:
+                    continue
+                seeded += 1
+                entry = {"device_type": device_type, "source": "sot", "updated": now}
+                hosts = [dev.get("name"), str(dev.get("primary_ip", "")).split("/")[0]]
+                for host in hosts:
+                    if host and host not in ("None", "N/A"):
+                        self._entries[host] = entry
+            if seeded:
+                self._save()
+        return seeded
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path) as cache_file:
+                return json.load(cache_file)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self) -> None:
+        """Write the cache to disk. Expects self._lock held."""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as cache_file:
+            json.dump(self._entries, cache_file)
+        os.replace(tmp_path, self.path)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_device_type_cache() -> DeviceTypeCache:
+    """
+    Returns the app-wide device type cache. The TTL for autodetected device types can be set
+    with the NET_TEXT_DEVICE_TYPE_TTL environment variable (seconds, default: 7 days).
+
+    The first time the cache is created it is seeded from the local SoT inventory file.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            first_run = not os.path.exists(CACHE_FILE)
+            _cache = DeviceTypeCache(
+                ttl=float(os.getenv("NET_TEXT_DEVICE_TYPE_TTL", 7 * 24 * 3600))
+            )
+            if first_run:
+                # Local import to avoid a circular import with helpers
+                from helpers import load_inventory_file
+
+                _cache.seed_from_inventory(load_inventory_file())
+    return _cache
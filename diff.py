@@ -0,0 +1,431 @@
+import time
+from itertools import compress, islice, repeat
+from operator import itemgetter, ne
+from typing import Any, Callable, Iterator, Optional
+
+from rich.console import Group, RenderableType
+from rich.table import Table
+from rich.text import Text
+
+# local imports
+from parsers import is_table
+
+# Columns that identify a row in common TextFSM tables (ntc-templates names), most specific first.
+# The first group whose columns are all in the table is used as the table's key.
+KEY_COLUMNS = (
+    ("vrf", "network", "prefix_length"),
+    ("network", "prefix_length"),
+    ("network", "mask"),
+    ("neighbor_name", "local_interface"),
+    ("neighbor_id", "interface"),
+    ("bgp_neighbor",),
+    ("neighbor",),
+    ("neighbor_id",),
+    ("interface",),
+    ("intf",),
+    ("port",),
+    ("destination_address", "vlan"),
+    ("vlan_id",),
+)
+# Changed rows listed in the diff tab, the counts always cover every row
+SHOW_CHANGES = 500
+# Rows compared at once while both tables are in step
+BLOCK = 64
+# Rows out of step after which the tables are taken not to share an order, and every row is keyed
+OUT_OF_STEP_LIMIT = 1000
+# Joins a row's values into one string, so whole rows are compared as single strings
+SEPARATOR = "\x00"
+
+
+def key_columns(columns) -> tuple[str, ...]:
+    """Natural key of a table with these columns, or an empty tuple if none is known"""
+    for group in KEY_COLUMNS:
+        if all(column in columns for column in group):
+            return group
+    return ()
+
+
+def _getter(columns: tuple[str, ...]) -> Callable[[dict], tuple]:
+    """Function returning a row's values for `columns` as a tuple"""
+    if len(columns) == 1:
+        get = itemgetter(columns[0])
+        return lambda row: (get(row),)
+    return itemgetter(*columns)
+
+
+def _hashable(values: tuple) -> tuple:
+    # TextFSM 'List' values come out as lists
+    return tuple(tuple(value) if isinstance(value, list) else value for value in values)
+
+
+class TableDiff:
+    """
+    Differences between two TextFSM tables, with rows matched by their natural key.
+
+    Args:
+        key (tuple): Columns rows were matched on. Empty if no key was found, then whole rows are matched
+            and changes only show up as added and removed rows.
+        added (list[dict]): Rows only in the new table
+        removed (list[dict]): Rows only in the old table
+        modified (list[tuple]): (old row, new row, changed columns) for rows whose values changed
+        unchanged (int): Number of rows that are the same in both tables
+        elapsed (float): Seconds the comparison took
+        added_columns (tuple): Columns only in the new table, if the template changed
+        removed_columns (tuple): Columns only in the old table, if the template changed
+    """
+
+    def __init__(
+        self,
+        key: tuple,
+        added: list[dict],
+        removed: list[dict],
+        modified: list[tuple],
+        unchanged: int,
+        elapsed: float = 0,
+        added_columns: tuple = (),
+        removed_columns: tuple = (),
+    ):
+        self.key = key
+        self.added = added
+        self.removed = removed
+        self.modified = modified
+        self.unchanged = unchanged
+        self.elapsed = elapsed
+        self.added_columns = added_columns
+        self.removed_columns = removed_columns
+
+    @property
+    def changed(self) -> bool:
+        return bool(
+            self.added
+            or self.removed
+            or self.modified
+            or self.added_columns
+            or self.removed_columns
+        )
+
+    @property
+    def summary(self) -> str:
+        return (
+            f"+{len(self.added)} added, -{len(self.removed)} removed, "
+            f"~{len(self.modified)} modified, {self.unchanged} unchanged"
+        )
+
+
+def _project(rows: list[dict], columns: tuple[str, ...]) -> list[dict]:
+    """The rows with only `columns`"""
+    get = _getter(columns)
+    return [dict(zip(columns, get(row))) for row in rows]
+
+
+def _row_texts(rows: list[dict], columns: tuple[str, ...]) -> Optional[list[str]]:
+    """
+    Each row's values joined into one string, so whole rows are compared as single strings.
+    None if a value isn't a string (TextFSM 'List' values).
+    """
+    try:
+        return list(map(SEPARATOR.join, map(_getter(columns), rows)))
+    except TypeError:
+        return None
+
+
+def _match_by_key(
+    old: list[dict],
+    new: list[dict],
+    key_of: Callable[[dict], tuple],
+    columns: tuple[str, ...],
+) -> tuple[int, list[tuple[dict, dict]], list[dict], list[dict]]:
+    """
+    Match rows by key, in C as much as possible so only rows that differ are handled one by one.
+    Rows that are in both tables unchanged are found first through a set of the old rows' texts
+    (see `_row_texts()`), which the new rows go through once. The rest of the old rows are
+    indexed by key and the new rows are looked up in it. Rows with the same key are matched in
+    the order they appear in each table.
+
+    Returns:
+        Tuple of (number of unchanged rows, (old row, new row) pairs that differ,
+        rows only in `new`, rows only in `old`)
+    """
+    unchanged = 0
+    old_texts = _row_texts(old, columns)
+    # Equal texts are equal rows unless an old value contains the separator
+    if old_texts is not None and sum(
+        map(str.count, old_texts, repeat(SEPARATOR))
+    ) != len(old) * (len(columns) - 1):
+        old_texts = None
+    new_texts = _row_texts(new, columns) if old_texts is not None else None
+    if new_texts is not None:
+        old_set = set(old_texts)
+        new_set = set(new_texts)
+        # Repeated rows would have to be counted, leave them to the index
+        if len(old_set) == len(old) and len(new_set) == len(new):
+            changed = old_set.symmetric_difference(new_set)
+            unchanged = len(new)
+            old = list(compress(old, map(changed.__contains__, old_texts)))
+            new = list(compress(new, map(changed.__contains__, new_texts)))
+            unchanged -= len(new)
+    index = dict(zip(map(key_of, old), old))
+    repeats: dict[tuple, list[dict]] = {}
+    if len(index) < len(old):
+        # The first row of each key is indexed, the others are kept in order (reversed, to pop)
+        index = {}
+        for row in old:
+            row_key = key_of(row)
+            if row_key in index:
+                repeats.setdefault(row_key, []).append(row)
+            else:
+                index[row_key] = row
+        for rows in repeats.values():
+            rows.reverse()
+    matches = list(map(index.pop, map(key_of, new), repeat(None)))
+    differ = list(compress(range(len(new)), map(ne, matches, new)))
+    unchanged += len(new) - len(differ)
+    pairs = []
+    added = []
+    for position in differ:
+        row = new[position]
+        old_row = matches[position]
+        if old_row is None:
+            rows = repeats.get(key_of(row))
+            if not rows:
+                added.append(row)
+                continue
+            old_row = rows.pop()
+            if old_row == row:
+                unchanged += 1
+                continue
+        pairs.append((old_row, row))
+    removed = list(index.values())
+    for rows in repeats.values():
+        removed.extend(reversed(rows))
+    return unchanged, pairs, added, removed
+
+
+def diff_tables(old: list[dict], new: list[dict]) -> TableDiff:
+    """
+    Compare two TextFSM tables in linear time. Devices usually list rows in the same order run
+    after run, so both tables are walked in step and blocks of equal rows are compared at once.
+    Rows that are out of step (added, removed or moved) are matched by their natural key
+    (see `KEY_COLUMNS`), and if the tables don't share an order at all the rest is matched
+    through one index of the old rows. Two 500k route tables compare in a fraction of a second.
+
+    If the template changed between the runs, rows are compared on the columns both tables
+    have, and the added and removed columns are reported.
+    """
+    start = time.perf_counter()
+    columns = tuple(new[0] if new else old[0] if old else ())
+    old_columns = tuple(old[0]) if old else columns
+    added_columns = tuple(column for column in columns if column not in old_columns)
+    removed_columns = tuple(column for column in old_columns if column not in columns)
+    if added_columns or removed_columns:
+        columns = tuple(column for column in columns if column in old_columns)
+        if not columns:
+            # Nothing in common, every row changed
+            return TableDiff(
+                (),
+                new,
+                old,
+                [],
+                0,
+                time.perf_counter() - start,
+                added_columns,
+                removed_columns,
+            )
+        old = _project(old, columns)
+        new = _project(new, columns)
+    key = key_columns(columns)
+    key_of = _getter(key or columns)
+    if not key and any(isinstance(value, list) for value in (new or old)[0].values()):
+        whole_row = key_of
+        key_of = lambda row: _hashable(whole_row(row))
+
+    modified = []
+    unchanged = 0
+
+    def compare(old_row: dict, row: dict) -> None:
+        nonlocal unchanged
+        if old_row == row:
+            unchanged += 1
+        else:
+            changed = [column for column in row if old_row.get(column) != row[column]]
+            modified.append((old_row, row, changed))
+
+    def take(pending: dict, row_key: tuple) -> Optional[dict]:
+        rows = pending.get(row_key)
+        if not rows:
+            return None
+        row = rows.pop(0)
+        if not rows:
+            del pending[row_key]
+        return row
+
+    # Rows out of step that haven't been matched yet, by key, in the order they were seen
+    old_pending: dict[tuple, list[dict]] = {}
+    new_pending: dict[tuple, list[dict]] = {}
+    i = j = 0
+    while i < len(old) and j < len(new) and len(old_pending) < OUT_OF_STEP_LIMIT:
+        # Lists are compared in C, which is much faster than comparing row by row
+        if old[i : i + BLOCK] == new[j : j + BLOCK]:
+            step = min(BLOCK, len(old) - i)
+            unchanged += step
+            i += step
+            j += step
+            continue
+        # Something changed in this block, go through it row by row
+        for _ in range(BLOCK):
+            if i >= len(old) or j >= len(new):
+                break
+            old_row, row = old[i], new[j]
+            if old_row == row:
+                unchanged += 1
+                i += 1
+                j += 1
+                continue
+            old_key, new_key = key_of(old_row), key_of(row)
+            if old_key == new_key:
+                compare(old_row, row)
+                i += 1
+                j += 1
+                continue
+            # Match either row with one seen earlier on the other side, to get back in step
+            match = take(new_pending, old_key)
+            if match is not None:
+                compare(old_row, match)
+                i += 1
+                continue
+            match = take(old_pending, new_key)
+            if match is not None:
+                compare(match, row)
+                j += 1
+                continue
+            old_pending.setdefault(old_key, []).append(old_row)
+            new_pending.setdefault(new_key, []).append(row)
+            i += 1
+            j += 1
+
+    # Rows still out of step, the rest of the longer table, or everything left if the tables
+    # don't share an order (e.g. a template that sorts differently)
+    matched, pairs, added, removed = _match_by_key(
+        [row for rows in old_pending.values() for row in rows] + old[i:],
+        [row for rows in new_pending.values() for row in rows] + new[j:],
+        key_of,
+        columns,
+    )
+    unchanged += matched
+    for old_row, row in pairs:
+        compare(old_row, row)
+    return TableDiff(
+        key,
+        added,
+        removed,
+        modified,
+        unchanged,
+        time.perf_counter() - start,
+        added_columns,
+        removed_columns,
+    )
+
+
+def diff_outputs(old: Any, new: Any) -> dict[str, Optional[TableDiff]]:
+    """
+    Compare two parsed outputs. Tables are compared row by row, and outputs of a multi-device run
+    (tables keyed by device) device by device.
+
+    Returns:
+        Dict of device name ('' for a single device) to its `TableDiff`, or None if the outputs
+        aren't tables and were only compared as a whole
+    """
+    if is_table(old) and is_table(new):
+        return {"": diff_tables(old, new)}
+    if isinstance(old, dict) and isinstance(new, dict):
+        if all(
+            is_table(value) or value == [] for value in (*old.values(), *new.values())
+        ):
+            return {
+                name: diff_tables(old.get(name) or [], new.get(name) or [])
+                for name in {**old, **new}
+                if old.get(name) or new.get(name)
+            }
+    return {"": None}
+
+
+def _row_text(row: dict, key: tuple) -> str:
+    columns = key or tuple(row)
+    return " ".join(str(row[column]) for column in columns)
+
+
+def _changes(diff: TableDiff) -> Iterator[tuple[Text, dict, Text]]:
+    """(marker, row, changed values) for each added, removed and modified row"""
+    for row in diff.added:
+        yield Text("+", style="green1"), row, Text()
+    for row in diff.removed:
+        yield Text("-", style="red1"), row, Text()
+    for old_row, new_row, changed in diff.modified:
+        changes = Text()
+        for column in changed:
+            changes.append(f"{column}: ")
+            changes.append(str(old_row.get(column)), style="red1")
+            changes.append(" -> ")
+            changes.append(str(new_row[column]), style="green1")
+            changes.append("  ")
+        yield Text("~", style="gold1"), new_row, changes
+
+
+def diff_renderable(
+    diffs: dict[str, Optional[TableDiff]], outputs_equal: bool, baseline: str
+) -> RenderableType:
+    """
+    Diff tab: a summary line per device, then the added, removed and modified rows
+
+    Args:
+        diffs (dict): Result of `diff_outputs()`
+        outputs_equal (bool): Whether the outputs are the same, used when they aren't tables
+        baseline (str): What the output was compared with, e.g. 'the run at 10:01:02'
+    """
+    parts: list[RenderableType] = [Text(f"Compared with {baseline}", style="#a1a1a1")]
+    shown = 0
+    for name, diff in sorted(diffs.items()):
+        label = f"{name}: " if name else ""
+        if diff is None:
+            parts.append(
+                Text(
+                    f"{label}The outputs aren't tables, so they were compared as a whole: "
+                    + ("no changes." if outputs_equal else "they differ."),
+                    style="green1" if outputs_equal else "gold1",
+                )
+            )
+            continue
+        key = ", ".join(diff.key) if diff.key else "whole rows"
+        parts.append(
+            Text.assemble(
+                (label, "bold"),
+                (diff.summary, "gold1" if diff.changed else "green1"),
+                (f" (matched on {key}, {diff.elapsed * 1000:.0f}ms)", "#a1a1a1"),
+            )
+        )
+        if diff.added_columns or diff.removed_columns:
+            columns = [f"+{column}" for column in diff.added_columns]
+            columns += [f"-{column}" for column in diff.removed_columns]
+            parts.append(
+                Text(
+                    f"{label}The template changed ({', '.join(columns)}), "
+                    "rows were compared on the columns both runs have",
+                    style="gold1",
+                )
+            )
+        if not diff.changed or shown >= SHOW_CHANGES:
+            continue
+        table = Table(box=None, show_header=False, padding=(0, 1))
+        table.add_column(width=1)
+        table.add_column()
+        table.add_column()
+        # Only the first changed rows are drawn, a huge table would take long to render
+        budget = SHOW_CHANGES - shown
+        for sign, row, changes in islice(_changes(diff), budget):
+            table.add_row(sign, _row_text(row, diff.key), changes)
+        parts.append(table)
+        rows = len(diff.added) + len(diff.removed) + len(diff.modified)
+        if rows > budget:
+            parts.append(Text(f"... and {rows - budget} more", style="#a1a1a1"))
+        shown += rows
+    return Group(*parts)
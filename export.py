@@ -0,0 +1,275 @@
+import csv
+import datetime
+import gzip
+import json
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Optional, Union
+
+# local imports
+from parsers import is_table
+
+FORMATS = ("csv", "csv.gz", "parquet")
+
+
+class ExportError(Exception):
+    """A table could not be added to a dataset, e.g. its columns don't match the dataset's"""
+
+
+def dataset_path(
+    directory: Union[str, Path], platform: Optional[str], command: str, fmt: str
+) -> Path:
+    """
+    Dataset of one command on one platform, laid out like captured outputs (see `parsers.parse_directory()`),
+    e.g. '<directory>/cisco_ios/show_interfaces.csv'
+    """
+    name = "_".join(command.split())
+    return Path(directory) / (platform or "unknown") / f"{name}.{fmt}"
+
+
+def csv_value(value: Any) -> str:
+    """TextFSM values are strings or lists of strings. Lists are written as JSON, so they can be split again."""
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return json.dumps(value, separators=(",", ":"))
+    return str(value)
+
+
+class CsvDataset:
+    """
+    Appends TextFSM tables to a CSV file, with 'host' and 'timestamp' columns before the table's own.
+    The header is written when the file is created, and every table added later must have the same
+    columns. Rows are written to the file as they're generated, a table isn't built in memory first.
+
+    Files ending in '.gz' are gzip compressed. Each append adds a gzip member to the end of the file,
+    which gzip readers (zcat, pandas, DuckDB) read as one file.
+
+    Args:
+        path (str): CSV file, created if it doesn't exist
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._columns: Optional[list[str]] = None
+
+    def _open(self, mode: str):
+        if self.path.suffix == ".gz":
+            return gzip.open(self.path, mode + "t", newline="")
+        return open(self.path, mode, newline="")
+
+    def _read_header(self) -> Optional[list[str]]:
+        if not self.path.exists() or self.path.stat().st_size == 0:
+            return None
+        with self._open("r") as dataset:
+            return next(csv.reader(dataset), None)
+
+    def append(self, rows: list[dict], host: str, timestamp: datetime.datetime) -> int:
+        """
+        Add a table's rows
+
+        Returns:
+            Number of rows written
+
+        Raises:
+            ExportError: If the table's columns don't match the file's header
+        """
+        columns = ["host", "timestamp", *rows[0]]
+        if self._columns is None:
+            self._columns = self._read_header()
+        new_file = self._columns is None
+        if not new_file and self._columns != columns:
+            raise ExportError(
+                f"Columns of {self.path} ({', '.join(self._columns[2:])}) don't match "
+                f"the table ({', '.join(columns[2:])})"
+            )
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        when = timestamp.isoformat(timespec="seconds")
+        with self._open("a") as dataset:
+            writer = csv.writer(dataset)
+            if new_file:
+                writer.writerow(columns)
+            writer.writerows(
+                [host, when, *(csv_value(value) for value in row.values())]
+                for row in rows
+            )
+        self._columns = columns
+        return len(rows)
+
+    def close(self) -> None:
+        pass
+
+
+class ParquetDataset:
+    """
+    Appends TextFSM tables to a Parquet dataset: a directory of Parquet files that Arrow, pandas,
+    DuckDB and Spark read as one table. Each `ParquetDataset` writes a file of its own, one row group
+    per table, so earlier files are never rewritten. The file is only readable once `close()` is called.
+
+    Columns are 'host', 'timestamp' and the table's own, as strings or lists of strings. Files added
+    later use the schema of the files already in the directory. Needs pyarrow.
+
+    Args:
+        path (str): Dataset directory, created if it doesn't exist
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._schema = None
+        self._writer = None
+
+    def _make_schema(self, rows: list[dict]):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        existing = sorted(self.path.glob("*.parquet"))
+        if existing:
+            return pq.read_schema(existing[0])
+        fields = [("host", pa.string()), ("timestamp", pa.timestamp("ms"))]
+        for column in rows[0]:
+            is_list = any(isinstance(row[column], list) for row in rows)
+            fields.append((column, pa.list_(pa.string()) if is_list else pa.string()))
+        return pa.schema(fields)
+
+    def append(self, rows: list[dict], host: str, timestamp: datetime.datetime) -> int:
+        """
+        Add a table's rows as a row group
+
+        Returns:
+            Number of rows written
+
+        Raises:
+            ExportError: If the table's columns don't match the dataset's
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self._schema is None:
+            self._schema = self._make_schema(rows)
+        columns = ["host", "timestamp", *rows[0]]
+        if self._schema.names != columns:
+            raise ExportError(
+                f"Columns of {self.path} ({', '.join(self._schema.names[2:])}) don't match "
+                f"the table ({', '.join(columns[2:])})"
+            )
+        # Timestamps are kept to the second, like the CSV export
+        timestamp = timestamp.replace(microsecond=0)
+        data = {"host": [host] * len(rows), "timestamp": [timestamp] * len(rows)}
+        for column in columns[2:]:
+            data[column] = [row[column] for row in rows]
+        try:
+            batch = pa.RecordBatch.from_pydict(data, schema=self._schema)
+        except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+            raise ExportError(f"Table doesn't fit the schema of {self.path}: {e}")
+        if self._writer is None:
+            self.path.mkdir(parents=True, exist_ok=True)
+            name = f"part-{timestamp:%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}.parquet"
+            self._writer = pq.ParquetWriter(
+                self.path / name, self._schema, compression="zstd"
+            )
+        self._writer.write_batch(batch)
+        return len(rows)
+
+    def close(self) -> None:
+        """Finish the Parquet file"""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+class TableExporter:
+    """
+    Appends tabular parsed output from any number of devices to columnar datasets, one per platform
+    and command (see `dataset_path()`), so e.g. a fleet-wide 'show interfaces' can be loaded into
+    analytics tools without parsing JSON. Output that isn't a table (e.g. 'No parser available.')
+    is skipped. Close the exporter when done, Parquet files are finished then.
+
+    Args:
+        directory (str): Where datasets are written
+        fmt (str): 'csv', 'csv.gz' or 'parquet'
+    """
+
+    def __init__(self, directory: Union[str, Path], fmt: str = "csv"):
+        if fmt not in FORMATS:
+            raise ExportError(
+                f"Unknown export format '{fmt}', use one of: {', '.join(FORMATS)}"
+            )
+        if fmt == "parquet":
+            try:
+                import pyarrow.parquet  # noqa: F401
+            except ImportError:
+                raise ExportError("Parquet export needs pyarrow: pip install pyarrow")
+        self.directory = Path(directory)
+        self.fmt = fmt
+        self._datasets: dict[Path, Union[CsvDataset, ParquetDataset]] = {}
+        self._lock = threading.Lock()
+
+    def export(
+        self,
+        parsed_output: Any,
+        host: str,
+        platform: Optional[str],
+        command: str,
+        timestamp: Optional[datetime.datetime] = None,
+    ) -> int:
+        """
+        Append parsed output to its dataset
+
+        Returns:
+            Number of rows written, 0 if the output isn't a table
+
+        Raises:
+            ExportError: If the table's columns don't match the dataset's
+        """
+        if not is_table(parsed_output):
+            return 0
+        path = dataset_path(self.directory, platform, command, self.fmt)
+        with self._lock:
+            dataset = self._datasets.get(path)
+            if dataset is None:
+                dataset_class = ParquetDataset if self.fmt == "parquet" else CsvDataset
+                dataset = self._datasets[path] = dataset_class(path)
+            return dataset.append(
+                parsed_output, host, timestamp or datetime.datetime.now()
+            )
+
+    def export_result(
+        self, result: dict, timestamp: Optional[datetime.datetime] = None
+    ) -> int:
+        """Append a `run_device_command()` result. The host column is the inventory name, if there is one."""
+        if result["error"]:
+            return 0
+        return self.export(
+            result["parsed_output"],
+            result.get("name") or result["host"],
+            result.get("platform"),
+            result["command"],
+            timestamp,
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            datasets = list(self._datasets.values())
+            self._datasets.clear()
+        for dataset in datasets:
+            dataset.close()
+
+    def __enter__(self) -> "TableExporter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def open_table_exporter() -> Optional[TableExporter]:
+    """
+    Exporter set up with environment variables, or None if exporting is off:
+        - NET_TEXT_EXPORT_DIR: directory datasets are written to (default: not exported)
+        - NET_TEXT_EXPORT_FORMAT: 'csv', 'csv.gz' or 'parquet' (default: csv)
+    """
+    directory = os.getenv("NET_TEXT_EXPORT_DIR")
+    if not directory:
+        return None
+    return TableExporter(directory, os.getenv("NET_TEXT_EXPORT_FORMAT", "csv"))
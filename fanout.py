@@ -0,0 +1,164 @@
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Iterable, Iterator, Optional, Sequence, Union
+
+# local imports
+from helpers import run_device_command
+from inventory_store import InventoryStore, device_address
+from timing import Trace
+
+GLOB_CHARS = "*?["
+
+
+def is_multi_target(selector: str) -> bool:
+    """
+    Check whether the host part of the user input selects more than one device. Supported selectors:
+        - 'r1,r2,r3': list of hostnames/IPs
+        - 'core-*': glob over inventory device names
+        - 'type:cisco_ios': inventory devices with a matching device type or platform (globs allowed)
+    """
+    return (
+        "," in selector
+        or selector.startswith("type:")
+        or any(char in selector for char in GLOB_CHARS)
+    )
+
+
+def resolve_targets(selector: str, store: InventoryStore) -> list[dict]:
+    """
+    Resolve a host selector to the devices it matches
+
+    Args:
+        selector (str): Hostname/IP, comma separated list, inventory name glob or 'type:<device type>'
+        store (InventoryStore): Local SoT inventory
+
+    Returns:
+        List of dicts with 'name' (label shown to the user) and 'host' (address to connect to) keys
+    """
+    if selector.startswith("type:"):
+        matches = store.find(type_glob=selector[len("type:") :])
+    elif any(char in selector for char in GLOB_CHARS):
+        matches = store.find(name_glob=selector)
+    else:
+        hosts = [host.strip() for host in selector.split(",") if host.strip()]
+        # Remove duplicates but keep the order the user typed
+        matches = [
+            store.lookup(host) or {"name": host} for host in dict.fromkeys(hosts)
+        ]
+
+    targets = []
+    for dev in matches:
+        # Connect to the primary IP, so inventory names don't need to resolve in DNS
+        address = device_address(dev.get("primary_ip")) or dev.get("name")
+        targets.append({"name": dev.get("name"), "host": address})
+    return targets
+
+
+def run_fanout(
+    targets: Iterable[dict],
+    command: Union[str, Sequence[str]],
+    max_workers: Optional[int] = None,
+    cancelled: Optional[Callable[[], bool]] = None,
+) -> Iterator[dict]:
+    """
+    Run the same command(s) on many devices at once, on a bounded thread pool. Devices are only
+    queued as workers free up, so a run over thousands of devices doesn't hold every result in memory.
+
+    Args:
+        targets (Iterable[dict]): Devices returned by `resolve_targets()`
+        command (str | list[str]): 'show' command to run, or a list of commands run in order on each device
+        max_workers (int): Max devices queried at once. Defaults to the NET_TEXT_CONCURRENCY env var (default: 16).
+        cancelled (Callable): Optional callback; once it returns True, devices that haven't started are skipped
+
+    Yields:
+        Results from `run_device_command()` with a 'name' key added, in the order devices finish
+    """
+    if max_workers is None:
+        max_workers = int(os.getenv("NET_TEXT_CONCURRENCY", 16))
+    max_workers = max(1, max_workers)
+    if cancelled is None:
+        cancelled = lambda: False
+    commands = [command] if isinstance(command, str) else list(command)
+
+    executor = ThreadPoolExecutor(
+        max_workers=max_workers, thread_name_prefix="net-textorial-fanout"
+    )
+    remaining = iter(targets)
+    pending = set()
+
+    def submit_next() -> None:
+        target = next(remaining, None)
+        if target is not None:
+            pending.add(executor.submit(run_target, target, commands))
+
+    try:
+        # Keep every worker busy, with a few devices queued behind them
+        for _ in range(max_workers * 2):
+            submit_next()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.remove(future)
+                yield from future.result()
+                if cancelled():
+                    return
+                submit_next()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def run_target(target: dict, commands: list[str]) -> list[dict]:
+    """
+    Run commands one after the other on a device, so they share its pooled SSH session.
+    An unexpected error is returned as the device's result, so it doesn't end the run for the other devices.
+    """
+    results = []
+    for command in commands:
+        start = time.perf_counter()
+        try:
+            result = run_device_command(target["host"], command)
+        except Exception as e:
+            error = f"There was an error: {e}"
+            result = {
+                "host": target["host"],
+                "command": command,
+                "platform": None,
+                "raw_output": error,
+                "parsed_output": "N/A",
+                "error": error,
+                "cancelled": False,
+                "elapsed": time.perf_counter() - start,
+                "trace": Trace(
+                    "command", host=target["host"], command=command
+                ).finish(),
+            }
+        result["name"] = target["name"]
+        results.append(result)
+    return results
+
+
+def summarize(command: str, results: list[dict], elapsed: float) -> str:
+    """Summary of a fan-out run: successes, failures and timings per device"""
+    failed = [result for result in results if result["error"]]
+    lines = [
+        f"Ran '{command}' on {len(results)} device(s) in {elapsed:.1f}s: "
+        f"{len(results) - len(failed)} succeeded, {len(failed)} failed",
+    ]
+    for result in sorted(results, key=lambda r: r["elapsed"], reverse=True):
+        status = "FAILED" if result["error"] else "ok"
+        lines.append(f"  {result['name']:<30} {status:<7} {result['elapsed']:.2f}s")
+    return "\n".join(lines)
+
+
+def combine_results(command: str, results: list[dict], elapsed: float) -> tuple:
+    """
+    Combine fan-out results into the (raw_output, parsed_output) pair shown in the output tabs.
+    The parsed output is keyed by device name.
+    """
+    sections = [summarize(command, results, elapsed)]
+    for result in results:
+        sections.append(f"### {result['name']} ###\n{result['raw_output']}")
+    raw_output = "\n\n".join(sections)
+    parsed_output = {result["name"]: result["parsed_output"] for result in results}
+    return raw_output, parsed_output
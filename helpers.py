@@ -1,131 +1,497 @@
+import datetime
 import ipaddress
 import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from math import ceil
-from typing import Union
-from netmiko.exceptions import (
-    NetmikoAuthenticationException,
-    NetmikoTimeoutException,
-)
-from netmiko import ConnectHandler
-from netmiko.ssh_autodetect import SSHDetect
+from typing import TYPE_CHECKING, Callable, Optional, Union
 import os
-import pynetbox
-import pynautobot
-import requests
+import socket
+import time
 from rich.text import Text
 from rich.tree import Tree
 from textual_autocomplete import DropdownItem, InputState
 
+# Netmiko, the SoT clients and requests take most of a second to import, so they're imported
+# by the functions that use them. `warm_up()` imports them in the background once the app is up.
+if TYPE_CHECKING:
+    import requests
+    from netmiko import ConnectHandler
 
-def device_connection(host_id: str, credentials: dict) -> ConnectHandler:
+# local imports
+from autocomplete import get_autocomplete_index
+from device_types import get_device_type_cache
+from inventory_store import device_key, get_inventory_store
+from parsers import parse_command_output
+from prewarm import get_prewarmer
+from session_pool import get_session_pool
+from timing import Trace, span, start_trace
+
+
+def warm_up() -> None:
+    """
+    Import the modules left out at startup and build the autocomplete index, so the first command,
+    sync or keystroke doesn't wait for them. The app runs this in the background after its first frame.
+    """
+    import netmiko.ssh_autodetect  # noqa: F401
+    import pynautobot  # noqa: F401
+    import pynetbox  # noqa: F401
+    import requests  # noqa: F401
+
+    get_autocomplete_index().refresh()
+
+
+def get_timeouts() -> dict:
+    """
+    Read device timeouts (in seconds) from env vars:
+        - NET_TEXT_CONN_TIMEOUT: time allowed to open the SSH connection (default: 10)
+        - NET_TEXT_READ_TIMEOUT: time allowed for a command's output to be returned (default: 60)
     """
-    Automatically handles device connections using Netmiko.
+    return {
+        "conn_timeout": float(os.getenv("NET_TEXT_CONN_TIMEOUT", 10)),
+        "read_timeout": float(os.getenv("NET_TEXT_READ_TIMEOUT", 60)),
+    }
+
+
+def get_credentials() -> dict:
+    """Device credentials from the NET_TEXT_USER and NET_TEXT_PASS env vars, admin/admin by default"""
+    return {
+        "username": os.getenv("NET_TEXT_USER", "admin"),
+        "password": os.getenv("NET_TEXT_PASS", "admin"),
+    }
+
+
+def device_connection(
+    host_id: str, credentials: dict, progress: Optional[Callable[[str], None]] = None
+) -> "ConnectHandler":
+    """
+    Automatically handles device connections using Netmiko. Open sessions are reused
+    from the session pool, so only the first connection to a device pays for autodetect
+    and the SSH login. Hand the connection back with `release_connection()` when done.
 
     Args:
         host_id (str): Commonly the hostname of a network device
         credentials (dict): A dictionary with 'username' and 'password' as keys
+        progress (Callable): Optional callback that receives a description of each connection phase
 
     Returns:
         ConnectHandler object
+
+    Raises:
+        NetmikoTimeoutException: If the device can't be reached
+        NetmikoAuthenticationException: If the device refuses the login
+        ConnectionException: If the device type can't be detected
     """
+    from netmiko.exceptions import (
+        ConnectionException,
+        NetmikoAuthenticationException,
+        NetmikoTimeoutException,
+    )
+    from netmiko.ssh_autodetect import SSHDetect
+
+    if progress is None:
+        progress = lambda phase: None
     remote_device = {
         "device_type": "autodetect",
         "host": host_id,
         "username": credentials.get("username"),
         "password": credentials.get("password"),
+        "port": int(os.getenv("NET_TEXT_SSH_PORT", 22)),
+        "conn_timeout": get_timeouts()["conn_timeout"],
     }
+    pool = get_session_pool()
+    # Reuse an open session to the device, if there is one
+    with span("session_checkout"):
+        connection = pool.checkout(host_id, remote_device["username"])
+    if connection is not None:
+        return connection
+
+    # Skip autodetect when the device type is already known
+    device_types = get_device_type_cache()
+    cached_type = device_types.get(host_id)
+    if cached_type is not None:
+        progress(f"Connecting to {host_id} ({cached_type})...")
+        try:
+            return open_session({**remote_device, "device_type": cached_type})
+        except (NetmikoTimeoutException, NetmikoAuthenticationException):
+            # The device is unreachable or refused the login, which autodetect wouldn't fix.
+            # Keep the cached type, it's most likely still right.
+            raise
+        except Exception:
+            # Cached device type may be stale, fall back to autodetect
+            device_types.invalidate(host_id)
+
+    progress(f"Detecting device type of {host_id}...")
+    sock = open_socket(host_id, remote_device["port"], remote_device["conn_timeout"])
+    try:
+        with span("autodetect"):
+            guesser = SSHDetect(**remote_device, sock=sock)
+            best_match = guesser.autodetect()
+    finally:
+        # Detection logs in over its own socket, the session for the command opens a new one
+        sock.close()
+    if best_match is None:
+        raise ConnectionException(
+            f"Could not detect the device type of {host_id}, it doesn't look like a supported platform"
+        )
+    remote_device["device_type"] = best_match
+    progress(f"Connecting to {host_id} ({best_match})...")
+    connection = open_session(remote_device)
+    device_types.set(host_id, best_match)
+    return connection
+
+
+def open_socket(host: str, port: int, timeout: float) -> socket.socket:
+    """
+    Resolve the host and open the TCP connection Netmiko logs in over, so the DNS lookup and the
+    TCP connect are timed separately from the SSH login.
+
+    Raises:
+        NetmikoTimeoutException: If the host can't be resolved or reached
+    """
+    from netmiko.exceptions import NetmikoTimeoutException
 
     try:
-        guesser = SSHDetect(**remote_device)
-        best_match = guesser.autodetect()
-        remote_device["device_type"] = best_match
-        connection = ConnectHandler(**remote_device)
-    except (
-        NetmikoTimeoutException,
-        NetmikoAuthenticationException,
-    ) as e:
-        print(f"Could not connect to device due to the following error: {e}")
-        connection = None
+        with span("dns"):
+            addresses = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except OSError as e:
+        raise NetmikoTimeoutException(f"Could not resolve {host}: {e}")
+    error = None
+    for family, sock_type, proto, _, address in addresses:
+        sock = socket.socket(family, sock_type, proto)
+        sock.settimeout(timeout)
+        try:
+            with span("tcp_connect"):
+                sock.connect(address)
+            return sock
+        except OSError as e:
+            sock.close()
+            error = e
+    raise NetmikoTimeoutException(f"TCP connection to {host}:{port} failed: {error}")
+
+
+def open_session(remote_device: dict) -> "ConnectHandler":
+    """Open a new pooled session over a socket from `open_socket()`. Returns it reserved."""
+    if remote_device["device_type"].endswith(("_telnet", "_serial")):
+        with span("ssh_login"):
+            return get_session_pool().open(remote_device)
+    sock = open_socket(
+        remote_device["host"], remote_device["port"], remote_device["conn_timeout"]
+    )
+    try:
+        # Covers the SSH handshake, authentication and Netmiko's session preparation
+        with span("ssh_login"):
+            return get_session_pool().open({**remote_device, "sock": sock})
+    except Exception:
+        sock.close()
+        raise
 
-    return connection
 
+def release_connection(connection: "ConnectHandler", failed: bool = False) -> None:
+    """
+    Hand a connection back to the session pool
 
-def get_device_info(user_input) -> tuple:
+    Args:
+        connection (ConnectHandler): Connection returned by `device_connection()`
+        failed (bool): Close the session instead of keeping it for reuse
     """
-    Allows user to run any CLI command and have the raw and parsed output returned.
+    pool = get_session_pool()
+    if failed:
+        pool.discard(connection)
+    else:
+        pool.release(connection)
+
+
+def stream_command(
+    connection: "ConnectHandler",
+    command: str,
+    on_output: Callable[[str], None],
+    cancelled: Optional[Callable[[], bool]] = None,
+    read_timeout: float = 60,
+) -> tuple[str, bool]:
     """
+    Send a command and read its output from the channel in chunks, instead of waiting for
+    the whole output like `send_command()`. Complete lines are passed to `on_output` as they
+    arrive. The command echo and the trailing prompt are stripped, like `send_command()` does.
 
-    command_list = user_input.split(" ")
-    # Check whether entered host is an IP address or hostname
-    # It won't matter now, but can provide simple validation in future.
+    Args:
+        connection (ConnectHandler): Open connection to the device
+        command (str): Command to run
+        on_output (Callable): Receives each chunk of output, ending on a line break
+        cancelled (Callable): Optional callback, reading stops early when it returns True
+        read_timeout (float): Seconds allowed for the prompt to come back
+
+    Returns:
+        Tuple of the output read so far and whether the prompt was seen (False if cancelled)
+    """
+    from netmiko.exceptions import ReadTimeout
+
+    if cancelled is None:
+        cancelled = lambda: False
+    prompt = connection.find_prompt().strip()
+    connection.write_channel(connection.normalize_cmd(command))
+
+    chunks = []
+    pending = ""
+    echo_seen = False
+    deadline = time.monotonic() + read_timeout
+    while True:
+        if cancelled():
+            chunks.append(connection.normalize_linefeeds(pending))
+            return "".join(chunks), False
+        data = connection.read_channel()
+        if not data:
+            if time.monotonic() > deadline:
+                raise ReadTimeout(
+                    f"Pattern not detected: '{prompt}' in output after {read_timeout} seconds."
+                )
+            time.sleep(0.02)
+            continue
+        pending += data
+        # A '\r' at the end of a chunk may be the first half of a '\r\n'
+        cut = len(pending.rstrip("\r"))
+        complete, held = connection.normalize_linefeeds(pending[:cut]), pending[cut:]
+        if not echo_seen:
+            if "\n" not in complete:
+                continue
+            first_line, _, rest = complete.partition("\n")
+            echo_seen = True
+            if command.strip() in first_line:
+                complete = rest
+        # Only pass on complete lines, the last line may turn out to be the prompt
+        lines, newline, last_line = complete.rpartition("\n")
+        if newline:
+            lines += newline
+            chunks.append(lines)
+            on_output(lines)
+        pending = last_line + held
+        if last_line.strip() == prompt:
+            break
+
+    output = "".join(chunks)
+    # Drop the line break before the prompt, like send_command() does
+    return output[:-1] if output.endswith("\n") else output, True
+
+
+def run_device_command(
+    host: str,
+    command: str,
+    progress: Optional[Callable[[str], None]] = None,
+    on_output: Optional[Callable[[str], None]] = None,
+    cancelled: Optional[Callable[[], bool]] = None,
+) -> dict:
+    """
+    Run a single 'show' command on a device and parse the output.
+
+    Args:
+        host (str): Hostname/IP of the device
+        command (str): 'show' command to run
+        progress (Callable): Optional callback that receives a description of each phase as it starts
+        on_output (Callable): Optional callback that receives the output as it arrives. If set, the
+            output is streamed with `stream_command()` instead of waiting for the whole output.
+        cancelled (Callable): Optional callback, a streamed command stops early when it returns True
+
+    Returns:
+        Dict with 'host', 'command', 'platform', 'raw_output', 'parsed_output', 'error', 'cancelled',
+        'elapsed' (seconds) and 'trace' keys. 'platform' is the Netmiko device type, if connected.
+        'parsed_output' is the structured output, or a message if the output could not be parsed.
+        If the command was cancelled, 'raw_output' holds the output received until then. 'trace' is
+        a `timing.Trace` with the time spent in each phase.
+    """
+    with start_trace("command", host=host, command=command) as trace:
+        result = _run_device_command(
+            trace, host, command, progress, on_output, cancelled
+        )
+    result["trace"] = trace
+    return result
+
+
+def _run_device_command(
+    trace: Trace,
+    host: str,
+    command: str,
+    progress: Optional[Callable[[str], None]],
+    on_output: Optional[Callable[[str], None]],
+    cancelled: Optional[Callable[[], bool]],
+) -> dict:
+    """Body of `run_device_command()`, timed by `trace`"""
+    from netmiko.exceptions import (
+        NetmikoAuthenticationException,
+        NetmikoTimeoutException,
+    )
+
+    if progress is None:
+        progress = lambda phase: None
+    start = time.perf_counter()
+    result = {
+        "host": host,
+        "command": command,
+        "platform": None,
+        "error": None,
+        "cancelled": False,
+    }
+
+    if command.split(" ")[0] != "show":
+        raw_output = "There was an error: Only 'show' commands are supported."
+        result.update(raw_output=raw_output, parsed_output="N/A", error=raw_output)
+        result["elapsed"] = time.perf_counter() - start
+        return result
+
+    # A session to this device may already be opening in the background, wait for it to land in the pool
+    get_prewarmer().wait(host)
     try:
-        ipaddress.ip_address(command_list[0])
-        host = command_list[0]
-    except ValueError:
-        host = command_list[0]
-    host = command_list[0]
-    # Try reading from env vars, default to admin/admin
-    user = os.getenv("NET_TEXT_USER", "admin")
-    pw = os.getenv("NET_TEXT_PASS", "admin")
-    creds = {"username": user, "password": pw}
-    dev_connect = device_connection(host_id=host, credentials=creds)
+        dev_connect = device_connection(
+            host_id=host, credentials=get_credentials(), progress=progress
+        )
+    except Exception as e:
+        # Reported in the result, nothing is printed, so headless output stays machine readable
+        dev_connect = None
+        connect_error = f"There was an issue connecting to the device: {e}"
     if dev_connect is not None:
         try:
-            if command_list[1] != "show":
-                raise Exception("Only 'show' commands are supported.")
-            else:
-                with dev_connect as device:
-                    raw_output = device.send_command((" ".join(command_list[1:])))
-                    parsed_output = device.send_command(
-                        (" ".join(command_list[1:])), use_textfsm=True
+            progress(f"Running '{command}' on {host}...")
+            result["platform"] = trace.attributes["platform"] = dev_connect.device_type
+            with span("command"):
+                if on_output is None:
+                    raw_output = dev_connect.send_command(
+                        command, read_timeout=get_timeouts()["read_timeout"]
+                    )
+                else:
+                    raw_output, complete = stream_command(
+                        dev_connect,
+                        command,
+                        on_output,
+                        cancelled=cancelled,
+                        read_timeout=get_timeouts()["read_timeout"],
                     )
-                    if not parsed_output:
-                        parsed_output = "N/A"
+                    if not complete:
+                        # The rest of the output is still on its way, so the session can't be reused
+                        release_connection(dev_connect, failed=True)
+                        result.update(
+                            raw_output=raw_output,
+                            parsed_output="N/A",
+                            error="Command cancelled.",
+                            cancelled=True,
+                            elapsed=time.perf_counter() - start,
+                        )
+                        return result
+            parsed_output = None
+            platform = dev_connect.device_type
+            release_connection(dev_connect)
         except (NetmikoTimeoutException, NetmikoAuthenticationException) as e:
+            release_connection(dev_connect, failed=True)
             raw_output = f"There was an issue connecting to the device: {e}"
             parsed_output = "N/A"
+            result["error"] = raw_output
         except Exception as e:
+            # The session may be in an unknown state, so don't reuse it
+            release_connection(dev_connect, failed=True)
             raw_output = f"There was an error: {e}"
             parsed_output = "N/A"
+            result["error"] = raw_output
     else:
-        raw_output = "Could not connect to device."
+        raw_output = connect_error
         parsed_output = "N/A"
+        result["error"] = raw_output
+
+    if result["error"] is None:
+        progress("Parsing output...")
+        # Parse the same output locally instead of running the command again.
+        # The session is already back in the pool, so another command can use it meanwhile.
+        if not raw_output:
+            parsed_output = "N/A"
+        else:
+            with span("parse", size=len(raw_output)):
+                parsed_output = parse_command_output(raw_output, platform, command)
+            if parsed_output is None:
+                parsed_output = "No parser available."
 
     # Cleanse the output if invalid command provided by user
     if "Invalid input detected" in raw_output:
         raw_output = "Invalid command sent to the device."
         parsed_output = "No parser available."
-    # Convert parsed output to string and format
-    if "\n" in parsed_output:
-        # If newline characters are returned, there's a good chance there was not a parser available
-        parsed_output = "No parser available."
-    else:
-        try:
-            # Check if parsed_output is an iterable (dict, list, etc.) and convert to JSON string
-            iter(parsed_output)
-            parsed_output = json.dumps(parsed_output, indent=2)
-        except TypeError:
-            # parsed_output is not an iterable (most likely a string), so JSON string conversion is not necessary
-            pass
+        result["error"] = raw_output
+
+    result.update(raw_output=raw_output, parsed_output=parsed_output)
+    result["elapsed"] = time.perf_counter() - start
+    return result
+
+
+def get_device_info(
+    user_input, progress: Optional[Callable[[str], None]] = None
+) -> tuple:
+    """
+    Allows user to run any CLI command and have the raw and parsed output returned.
+
+    Args:
+        user_input (str): '<hostname/IP> show <command>'
+        progress (Callable): Optional callback that receives a description of each phase as it starts
+    """
+    command_list = user_input.split(" ")
+    # Check whether entered host is an IP address or hostname
+    # It won't matter now, but can provide simple validation in future.
+    try:
+        ipaddress.ip_address(command_list[0])
+        host = command_list[0]
+    except ValueError:
+        host = command_list[0]
+    host = command_list[0]
+    result = run_device_command(host, " ".join(command_list[1:]), progress=progress)
+    raw_output = result["raw_output"]
+    parsed_output = format_parsed_output(result["parsed_output"])
 
     return raw_output, parsed_output
 
 
-def sot_sync(url: str, token: str, source: str = None) -> bool:
+def format_parsed_output(parsed_output: Union[dict, list, str]) -> str:
+    """Convert parsed output to a JSON string for display"""
+    try:
+        # Check if parsed_output is an iterable (dict, list, etc.) and convert to JSON string
+        iter(parsed_output)
+        parsed_output = json.dumps(parsed_output, indent=2)
+    except TypeError:
+        # parsed_output is not an iterable (most likely a string), so JSON string conversion is not necessary
+        pass
+
+    return parsed_output
+
+
+SYNC_STATE_FILE = "sot_sync_state.json"
+# Only these fields are used to build the local inventory
+SOT_FIELDS = "id,name,primary_ip,device_type,platform,last_updated"
+
+
+def sot_sync(
+    url: str, token: str, source: str = None, incremental: bool = False
+) -> bool:
     """
     Gathers the following device info from Netbox or Nautobot:
         - Name
         - Primary IP
         - Device type
+        - Platform
+
+    Pages are fetched in parallel. Set the NET_TEXT_SOT_FIELDS env var to ask the SoT for only the
+    fields above (requires NetBox >= 4.0, which supports the `fields` query parameter).
 
     Args:
         url (str): Netbox/Nautobot instance URL
         token (str): Netbox/Nautobot API token
         source (str): Specifies the SoT system. Valid options include: "netbox" or "nautobot"
+        incremental (bool): Only fetch devices changed since the last sync and merge them into the
+            existing inventory. Falls back to a full sync if there's no previous sync of this SoT.
 
     Returns:
         Boolean
     """
+    with start_trace("sync", host=url, source=source, incremental=incremental):
+        return _sot_sync(url, token, source, incremental)
+
+
+def _sot_sync(url: str, token: str, source: str, incremental: bool) -> bool:
+    """Body of `sot_sync()`, phases are timed in the caller's trace"""
+    import pynautobot
+    import pynetbox
+
     if source is None:
         # Source must be specified. Probably should add helpful error message
         return False
@@ -134,94 +500,226 @@ def sot_sync(url: str, token: str, source: str = None) -> bool:
         # User must provide URL and API token
         # Defer to helper function to collect DNAC inventory
         if source == "dnac":
+            # The inventory is replaced, so a later Netbox/Nautobot sync can't be incremental
+            save_sync_state({"source": source, "url": url})
             return dnac_inventory(url, token)
         # Builds query objects for Netbox or Nautobot
         if source == "netbox":
-            nb = pynetbox.api(url, token)
+            nb = pynetbox.api(url, token, threading=True)
         elif source == "nautobot":
-            nb = pynautobot.api(url, token)
+            nb = pynautobot.api(url, token, threading=True)
         else:
             # Invalid source was provided. Again, probably should add helpful error message
             return False
-        # Extract device objs from SoT
-        devices = nb.dcim.devices.all()
     else:
         return False
 
+    query = {"fields": SOT_FIELDS} if os.getenv("NET_TEXT_SOT_FIELDS") else {}
+    state = load_sync_state()
+    if incremental and state.get("source") == source and state.get("url") == url:
+        return sot_delta_sync(nb, state, query)
+
     device_list = []
+    watermark = None
+    try:
+        with span("fetch"):
+            # Extract device objs from SoT
+            devices = (
+                nb.dcim.devices.filter(**query) if query else nb.dcim.devices.all()
+            )
+            # Executes device collection and generates local JSON inventory file
+            for device in devices:
+                watermark = max_timestamp(
+                    watermark, getattr(device, "last_updated", None)
+                )
+                device_obj = sot_device_record(device)
+                if device_obj is not None:
+                    device_list.append(device_obj)
+    except (pynetbox.RequestError, pynautobot.core.query.RequestError):
+        return False
+
+    with span("save", devices=len(device_list)):
+        saved = save_sot_inventory(device_list)
+    save_sync_state({"source": source, "url": url, "watermark": watermark})
+    return saved
+
+
+def sot_delta_sync(nb, state: dict, query: dict) -> bool:
+    """
+    Merge devices changed since the last sync into the local inventory.
+
+    Changed devices are found with the `last_updated__gte` filter supported by Netbox and Nautobot.
+    Deleted devices are found by a second pass that only lists device IDs (`brief` mode).
+
+    Args:
+        nb: pynetbox/pynautobot API object
+        state (dict): Sync state saved by the previous sync
+        query (dict): Extra query parameters for the device list
+
+    Returns:
+        Boolean
+    """
+    import pynautobot
+    import pynetbox
+
+    watermark = state.get("watermark")
+    store = get_inventory_store()
     try:
-        # Executes device collection and generates local JSON inventory file
-        for device in devices:
-            if device.name is not None and device.primary_ip is not None:
-                device_obj = {
-                    "name": str(device.name),
-                    "primary_ip": str(device.primary_ip),
-                    "device_type": str(device.device_type),
-                }
-                device_list.append(device_obj)
+        with span("fetch_changed"):
+            if watermark is not None:
+                changed = nb.dcim.devices.filter(last_updated__gte=watermark, **query)
+            else:
+                changed = (
+                    nb.dcim.devices.filter(**query) if query else nb.dcim.devices.all()
+                )
+            changed_records = []
+            removed = set()
+            for device in changed:
+                watermark = max_timestamp(
+                    watermark, getattr(device, "last_updated", None)
+                )
+                device_obj = sot_device_record(device)
+                if device_obj is not None:
+                    changed_records.append(device_obj)
+                else:
+                    # Devices that lost their name or primary IP drop out of the inventory
+                    removed.add(device_key({"id": device.id}))
+        # Deletion pass
+        with span("fetch_ids"):
+            current_keys = {
+                device_key({"id": device.id})
+                for device in nb.dcim.devices.filter(brief=True)
+            }
     except (pynetbox.RequestError, pynautobot.core.query.RequestError):
         return False
 
-    # Serializing json
-    json_object = json.dumps(device_list, indent=4)
+    with span("save", devices=len(changed_records)):
+        removed.update(store.keys() - current_keys)
+        store.merge(changed_records, removed)
+        # Synced hosts with a known platform never need autodetect
+        get_device_type_cache().seed_from_inventory(changed_records)
+    save_sync_state({**state, "watermark": watermark})
+    return True
+
+
+def sot_device_record(device) -> Optional[dict]:
+    """Build a local inventory record from a Netbox/Nautobot device. Returns None for devices that can't be reached."""
+    if device.name is None or device.primary_ip is None:
+        return None
+    return {
+        "id": device.id,
+        "name": str(device.name),
+        "primary_ip": str(device.primary_ip),
+        "device_type": str(device.device_type),
+        "platform": getattr(device.platform, "slug", None),
+    }
+
+
+def save_sot_inventory(device_list: list[dict]) -> bool:
+    """
+    Replace the local SoT inventory
+
+    Args:
+        device_list (list[dict]): Inventory records
+
+    Returns:
+        Boolean
+    """
+    with get_inventory_store().replace_all() as writer:
+        writer.write(device_list)
+
+    # Synced hosts with a known platform never need autodetect
+    get_device_type_cache().seed_from_inventory(device_list)
 
-    # Writing devices to JSON file
-    with open("sot_inventory.json", "w") as outfile:
-        outfile.write(json_object)
-        inv_filepath = os.path.dirname(os.path.abspath(__file__))
+    return True
 
-    # Confirm inventory file was created and exists - return True or False
-    inv_file_exists = os.path.exists(f"{inv_filepath}/sot_inventory.json")
 
-    return inv_file_exists
+def max_timestamp(current: Optional[str], candidate: Optional[str]) -> Optional[str]:
+    """Return the later of two ISO 8601 timestamps, either of which may be None"""
+    if candidate is None:
+        return current
+    if current is None:
+        return candidate
+
+    def parse(value: str) -> datetime.datetime:
+        return datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+    return candidate if parse(candidate) > parse(current) else current
+
+
+def load_sync_state() -> dict:
+    """Load the state (source, URL and watermark) saved by the last Netbox/Nautobot sync"""
+    try:
+        with open(SYNC_STATE_FILE) as state_file:
+            return json.load(state_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_sync_state(state: dict) -> None:
+    """Save the state of the last Netbox/Nautobot sync"""
+    with open(SYNC_STATE_FILE, "w") as state_file:
+        json.dump(state, state_file, indent=4)
 
 
 ### Disabled until textual autocomplete is compatible with Textual >=0.14.0 ###
 def get_items(input_state: InputState) -> list[DropdownItem]:
-    """Attempt to read local inventory file (JSON) and build list of DropdownItems to use for autocomplete
+    """Look up matching inventory devices in the in-memory autocomplete index and return DropdownItems
 
     Args:
         value (str): Automatically received by Input widget included in the AutoComplete container
         cursor_position (int): Automatically received by Input widget included in the AutoComplete container
     """
+    # Devices that start with the Input value are pulled to the top
+    return get_autocomplete_index().search(input_state.value)
 
-    try:
-        with open(f"./sot_inventory.json", "r") as f:
-            nb_devices = json.load(f)
-    except FileNotFoundError:
-        return ""
-
-    items = []
-
-    for dev in nb_devices:
-        items.append(
-            DropdownItem(
-                Text(dev.get("name")),  # 'main' column
-                Text(dev.get("primary_ip"), style="#a1a1a1"),
-                Text(dev.get("device_type"), style="#a1a1a1"),
-            )
-        )
 
-    # Only keep devices that contain the Input value as a substring
-    matches = [c for c in items if input_state.value.lower() in c.main.plain.lower()]
+DNAC_PAGE_SIZE = 500
 
-    # Favor items that start with the Input value, pull them to the top
-    ordered = sorted(
-        matches, key=lambda v: v.main.plain.startswith(input_state.value.lower())
-    )
 
-    return ordered
+def dnac_session(token: str) -> "requests.Session":
+    """
+    Build a pooled keep-alive HTTP session for DNAC API calls. Requests that fail with
+    429 or 5xx responses are retried with exponential backoff (honoring Retry-After).
+
+    Args:
+        token (str): DNAC API token
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    session = requests.Session()
+    session.headers.update(
+        {
+            "Content-Type": "application/json",
+            "Accept": "application/json",
+            "X-Auth-Token": token,
+        }
+    )
+    session.verify = False
+    retries = Retry(
+        total=5,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["GET"],
+        raise_on_status=False,
+    )
+    max_workers = int(os.getenv("NET_TEXT_DNAC_CONCURRENCY", 4))
+    adapter = HTTPAdapter(max_retries=retries, pool_maxsize=max_workers)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
 
 
-def get_device_count(url: str, token: str) -> int:
+def get_device_count(
+    url: str, token: str, session: Optional["requests.Session"] = None
+) -> int:
     """Retrieve device count from DNAC inventory"""
-    headers = {
-        "Content-Type": "application/json",
-        "Accept": "application/json",
-        "X-Auth-Token": token,
-    }
+    if session is None:
+        session = dnac_session(token)
     device_count_url = f"{url}/dna/intent/api/v1/network-device/count"
-    response = requests.get(url=device_count_url, headers=headers, verify=False)
+    response = session.get(url=device_count_url)
     if response.status_code == 200:
         device_count = response.json()["response"]
         return device_count
@@ -230,87 +728,91 @@ def get_device_count(url: str, token: str) -> int:
         return 0
 
 
+def get_dnac_page(session: "requests.Session", url: str, offset: int) -> list[dict]:
+    """
+    Retrieve one page of devices from DNAC inventory
+
+    Args:
+        session (requests.Session): Session returned by `dnac_session()`
+        url (str): DNAC instance URL
+        offset (int): Index of the first device on the page (DNAC offsets start at 1)
+
+    Returns:
+        List of DNAC device records
+
+    Raises:
+        requests.HTTPError: If the page could not be retrieved after retries
+    """
+    response = session.get(
+        url=f"{url}/dna/intent/api/v1/network-device",
+        params={"limit": DNAC_PAGE_SIZE, "offset": offset},
+    )
+    response.raise_for_status()
+    return response.json()["response"]
+
+
 def dnac_inventory(url: str, token: str) -> bool:
-    """Retrieve all devices from DNAC inventory"""
-    headers = {
-        "Content-Type": "application/json",
-        "Accept": "application/json",
-        "X-Auth-Token": token,
-    }
+    """
+    Retrieve all devices from DNAC inventory. Pages are fetched concurrently (up to the
+    NET_TEXT_DNAC_CONCURRENCY env var, default 4) over one shared session and written to
+    the inventory file as they complete.
+    """
+    import requests
+
+    session = dnac_session(token)
     # Get total number of devices to figure out offset for larger inventories
-    total_dev_count = get_device_count(url, token)
+    with span("count"):
+        total_dev_count = get_device_count(url, token, session=session)
     if total_dev_count == 0:
         # If there are no devices or an error collecting the device count
         return False
     # Default and max limit for device inventory is 500, so we need to figure out how many API calls to make
-    total_pages = ceil(total_dev_count / 500)
-    # There's a hard limit to only return 500 devices per call, so we must change the params
-    # if there's more than 500 devices in the inventory
-    # Initialize device list
-    device_list = []
-    for page in range(total_pages):
-        # Make additional calls (if necessary) - needed for inventories with more than 500 devices
-        calc_offset = page * 500
-        if calc_offset > 0:
-            dnac_devices_url = (
-                f"{url}/dna/intent/api/v1/network-device?limit=500&offset={calc_offset}"
-            )
-        else:
-            # No offset needed
-            dnac_devices_url = f"{url}/dna/intent/api/v1/network-device?limit=500"
-        response = requests.get(
-            url=dnac_devices_url,
-            headers=headers,
-            verify=False,
-        )
-        if response.status_code == 200:
-            # Add devices to the response from the initial call
-            device_list.extend(response.json()["response"])
-        else:
-            return False
-
-        device_export = []
-        # Time to create inventory JSON file
+    total_pages = ceil(total_dev_count / DNAC_PAGE_SIZE)
+    offsets = [page * DNAC_PAGE_SIZE + 1 for page in range(total_pages)]
+    max_workers = int(os.getenv("NET_TEXT_DNAC_CONCURRENCY", 4))
+
+    device_types = get_device_type_cache()
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = [
+            executor.submit(get_dnac_page, session, url, offset) for offset in offsets
+        ]
         try:
-            # Executes device collection and generates local JSON inventory file
-            for device in device_list:
-                device_obj = {
-                    "name": str(device.get("hostname")),
-                    "primary_ip": str(device.get("managementIpAddress")),
-                    "device_type": str(device.get("platformId")),
-                }
-                device_export.append(device_obj)
-        except IndexError:
-            # Assumes list is empty and avoids
+            # Pages are written as they complete, but only replace the inventory once all have arrived
+            with get_inventory_store().replace_all() as writer:
+                for future in as_completed(futures):
+                    with span("fetch"):
+                        page = future.result()
+                    with span("save", devices=len(page)):
+                        page_export = [
+                            {
+                                "name": str(device.get("hostname")),
+                                "primary_ip": str(device.get("managementIpAddress")),
+                                "device_type": str(device.get("platformId")),
+                                "platform": device.get("softwareType"),
+                            }
+                            for device in page
+                        ]
+                        writer.write(page_export)
+                        # Synced hosts with a known platform never need autodetect
+                        device_types.seed_from_inventory(page_export)
+        except (requests.RequestException, KeyError, ValueError):
+            for future in futures:
+                future.cancel()
             return False
+        finally:
+            session.close()
 
-        # Serializing json
-        json_object = json.dumps(device_export, indent=4)
-
-        # Writing devices to JSON file
-        with open("sot_inventory.json", "w") as outfile:
-            outfile.write(json_object)
-            inv_filepath = os.path.dirname(os.path.abspath(__file__))
-
-        # Confirm inventory file was created and exists - return True or False
-        inv_file_exists = os.path.exists(f"{inv_filepath}/sot_inventory.json")
-
-        return inv_file_exists
+    return True
 
 
 def load_inventory_file() -> list[dict]:
     """
-    Loads JSON inventory file synced from SoT
+    Loads inventory synced from SoT
 
     Example:
         [{'name': 'ams01-edge-01', 'primary_ip': '10.11.128.1/32', 'device_type': 'DCS-7280CR2-60'}, {'name': 'ams01-edge-02', 'primary_ip': '10.11.128.2/32', 'device_type': 'DCS-7280CR2-60'},...]
     """
-    try:
-        with open("sot_inventory.json") as json_file:
-            data = json.load(json_file)
-    except:
-        data = []
-    return data
+    return get_inventory_store().all()
 
 
 def write_json_file(filename: str, output: Union[dict, list]) -> Tree:
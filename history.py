@@ -0,0 +1,123 @@
+from rich.text import Text
+from textual import work
+from textual.app import ComposeResult
+from textual.containers import Vertical
+from textual.screen import Screen
+from textual.widgets import Footer, Input, Static
+from textual.worker import get_current_worker
+
+# local imports
+from history_store import get_history_store
+from inventory import InventoryRows, InventoryTable
+from results import CommandResult
+
+
+class HistoryTable(InventoryTable):
+    """Command history table, newest first. Only the rows in view are rendered."""
+
+    COLUMNS = (
+        ("Time", "created"),
+        ("Host", "host"),
+        ("Command", "command"),
+        ("Status", "status"),
+        ("Elapsed", "elapsed"),
+    )
+    FIELDS = tuple(field for _, field in COLUMNS)
+    FILTER_COLUMNS = {"time": 0, "host": 1, "command": 2, "status": 3}
+
+
+class HistoryScreen(Screen):
+    """Browse previously run commands and reload their outputs without going back to the device"""
+
+    BINDINGS = [
+        ("escape", "app.pop_screen", "Return"),
+        ("/", "focus_filter", "Filter"),
+    ]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._entry_ids: list[int] = []
+        self._count = None
+
+    def compose(self) -> ComposeResult:
+        with Vertical():
+            yield Static(
+                Text("Loading history...", style="bold orange1"),
+                id="history_label",
+            )
+            yield Input(
+                placeholder="Filter history, e.g. 'r1' or 'command:bgp' (columns: time, host, command, status)",
+                id="history_filter",
+            )
+            yield HistoryTable(id="history_table")
+            yield Footer()
+
+    def on_screen_resume(self) -> None:
+        """Reload the history if commands were run since it was last shown"""
+        self.query_one(HistoryTable).focus()
+        history = get_history_store()
+        if history is None:
+            self.query_one("#history_label", Static).update(
+                Text("Command history is turned off (NET_TEXT_HISTORY).", style="gold1")
+            )
+        elif history.count() != self._count:
+            self.load_history()
+
+    @work(exclusive=True, group="history")
+    def load_history(self) -> None:
+        """Read the history entries (without their outputs) in the background"""
+        worker = get_current_worker()
+        history = get_history_store()
+        entries = history.entries()
+        for entry in entries:
+            entry["status"] = "FAILED" if entry["error"] else "ok"
+            if entry["elapsed"] is not None:
+                entry["elapsed"] = f"{entry['elapsed']:.2f}s"
+        data = InventoryRows(entries, HistoryTable.FIELDS)
+        if not worker.is_cancelled:
+            self.app.call_from_thread(
+                self.show_history, data, [entry["id"] for entry in entries]
+            )
+
+    def show_history(self, data: InventoryRows, entry_ids: list[int]) -> None:
+        self._count = len(entry_ids)
+        self._entry_ids = entry_ids
+        self.query_one(HistoryTable).set_rows(data)
+        self.update_label()
+
+    def update_label(self) -> None:
+        table = self.query_one(HistoryTable)
+        self.query_one("#history_label", Static).update(
+            Text(
+                f"{table.row_count} of {table.total_count} commands - select a row to load its output",
+                style="bold orange1",
+            )
+        )
+
+    def action_focus_filter(self) -> None:
+        self.query_one("#history_filter", Input).focus()
+
+    def on_input_changed(self, event: Input.Changed) -> None:
+        """Filter the table as the user types"""
+        if event.input.id == "history_filter":
+            self.query_one(HistoryTable).filter(event.value)
+            self.update_label()
+
+    def on_input_submitted(self, event: Input.Submitted) -> None:
+        if event.input.id == "history_filter":
+            self.query_one(HistoryTable).focus()
+
+    def on_inventory_table_cell_selected(self, event: InventoryTable.CellSelected):
+        """Load the selected command's output into the main screen"""
+        entry = get_history_store().load(self._entry_ids[event.row])
+        if entry is None:
+            return
+        self.app.pop_screen()
+        self.app.show_result(
+            CommandResult.from_run(
+                entry,
+                created=entry["created"],
+                source="history",
+                history_id=entry["id"],
+            )
+        )
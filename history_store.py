@@ -0,0 +1,228 @@
+import datetime
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Optional
+
+HISTORY_FILE = "command_history.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY,
+    created TEXT NOT NULL,
+    host TEXT NOT NULL,
+    command TEXT NOT NULL,
+    error TEXT,
+    elapsed REAL,
+    raw_output BLOB,
+    parsed_output BLOB
+);
+CREATE INDEX IF NOT EXISTS idx_history_host_command ON history (host COLLATE NOCASE, command);
+"""
+
+
+def normalize_command(command: str) -> str:
+    """
+    Collapse whitespace, so 'show  ip route' and 'show ip route' are the same command.
+    Case is kept, pipe filters like '| include Vlan10' are case sensitive.
+    """
+    return " ".join(command.split())
+
+
+class ResultCache:
+    """
+    In-memory cache of recent command results keyed by (host, normalized command).
+    Entries expire after `ttl` seconds, and the least recently used entry is evicted
+    once the cache holds `max_entries` results.
+
+    Args:
+        ttl (float): Seconds a result is served from the cache
+        max_entries (int): Maximum number of results kept
+    """
+
+    def __init__(self, ttl: float = 60, max_entries: int = 128):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(host: str, command: str) -> tuple:
+        return (host.lower(), normalize_command(command))
+
+    def get(self, host: str, command: str) -> Optional[Any]:
+        """Returns the cached result, or None if there is none or it has expired"""
+        key = self.make_key(host, command)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored, result = entry
+            if time.monotonic() - stored > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return result
+
+    def put(self, host: str, command: str, result: Any) -> None:
+        if self.ttl <= 0 or self.max_entries <= 0:
+            return
+        key = self.make_key(host, command)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, host: str, command: str) -> None:
+        with self._lock:
+            self._entries.pop(self.make_key(host, command), None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class HistoryStore:
+    """
+    Append-only record of every command run, stored in SQLite. Outputs are compressed with zlib,
+    so the history can be listed without reading the outputs, and any entry can be reloaded
+    without going back to the device.
+
+    Args:
+        path (str): SQLite database file
+    """
+
+    def __init__(self, path: str = HISTORY_FILE):
+        self.path = path
+        self._local = threading.local()
+        self._db.executescript(SCHEMA)
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        # SQLite connections can't be shared between threads, so each thread gets its own
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, isolation_level=None)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def append(self, result: dict, created: Optional[datetime.datetime] = None) -> int:
+        """
+        Add a command result to the history
+
+        Args:
+            result (dict): Result returned by `run_device_command()`
+            created (datetime): When the command was run, defaults to now
+
+        Returns:
+            Id of the new history entry
+        """
+        created = created or datetime.datetime.now()
+        cursor = self._db.execute(
+            "INSERT INTO history (created, host, command, error, elapsed, raw_output, parsed_output) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                created.isoformat(timespec="seconds"),
+                result["host"],
+                normalize_command(result["command"]),
+                result.get("error"),
+                result.get("elapsed"),
+                zlib.compress(result["raw_output"].encode()),
+                zlib.compress(json.dumps(result["parsed_output"]).encode()),
+            ),
+        )
+        return cursor.lastrowid
+
+    def entries(self, limit: Optional[int] = None) -> list[dict]:
+        """History entries without their outputs, newest first"""
+        cursor = self._db.execute(
+            "SELECT id, created, host, command, error, elapsed FROM history "
+            "ORDER BY id DESC LIMIT ?",
+            (-1 if limit is None else limit,),
+        )
+        return [dict(row) for row in cursor]
+
+    def load(self, entry_id: int) -> Optional[dict]:
+        """
+        A history entry with its outputs
+
+        Returns:
+            Dict with the same keys as `run_device_command()` results, plus 'id' and 'created'
+        """
+        row = self._db.execute(
+            "SELECT * FROM history WHERE id = ?", (entry_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        entry = dict(row)
+        entry["raw_output"] = zlib.decompress(entry["raw_output"]).decode()
+        entry["parsed_output"] = json.loads(zlib.decompress(entry["parsed_output"]))
+        entry["created"] = datetime.datetime.fromisoformat(entry["created"])
+        return entry
+
+    def previous(
+        self, host: str, command: str, before: Optional[int] = None
+    ) -> Optional[dict]:
+        """
+        The latest successful run of a command on a host, with its outputs
+
+        Args:
+            host (str): Device the command ran on
+            command (str): Command that was run
+            before (int): Only look at entries older than this history entry
+
+        Returns:
+            Dict like `load()` returns, or None if the command wasn't run successfully before
+        """
+        row = self._db.execute(
+            "SELECT id FROM history WHERE host = ? COLLATE NOCASE AND command = ? "
+            "AND error IS NULL AND id < ? ORDER BY id DESC LIMIT 1",
+            (
+                host,
+                normalize_command(command),
+                before if before is not None else 2**63 - 1,
+            ),
+        ).fetchone()
+        return None if row is None else self.load(row["id"])
+
+    def count(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+
+
+_cache = None
+_history = None
+_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    """
+    Returns the app-wide result cache. It can be tuned with environment variables:
+        - NET_TEXT_CACHE_TTL (seconds, default: 60, 0 disables the cache)
+        - NET_TEXT_CACHE_SIZE (default: 128)
+    """
+    global _cache
+    with _lock:
+        if _cache is None:
+            _cache = ResultCache(
+                ttl=float(os.getenv("NET_TEXT_CACHE_TTL", 60)),
+                max_entries=int(os.getenv("NET_TEXT_CACHE_SIZE", 128)),
+            )
+    return _cache
+
+
+def get_history_store() -> Optional[HistoryStore]:
+    """Returns the app-wide command history, or None if NET_TEXT_HISTORY is set to 0/false/no"""
+    global _history
+    if os.getenv("NET_TEXT_HISTORY", "1").lower() in ("0", "false", "no"):
+        return None
+    with _lock:
+        if _history is None:
+            _history = HistoryStore()
+    return _history
@@ -1,13 +1,34 @@
 import datetime
+from typing import Optional
 import pyperclip
+from rich.cells import cell_len, set_cell_size
+from rich.segment import Segment
+from rich.style import Style
 from rich.text import Text
+from textual import events, work
 from textual.app import ComposeResult
-from textual.containers import Vertical, VerticalScroll
+from textual.binding import Binding
+from textual.containers import Vertical
+from textual.geometry import Size
+from textual.message import Message
 from textual.screen import Screen
-from textual.widgets import Label, Input, Button, RadioSet, DataTable, Footer, Static
+from textual.scroll_view import ScrollView
+from textual.strip import Strip
+from textual.widgets import (
+    Label,
+    Input,
+    Button,
+    Checkbox,
+    RadioSet,
+    Footer,
+    Static,
+)
+from textual.worker import get_current_worker
 
 # local imports
-from helpers import sot_sync, load_inventory_file
+from helpers import sot_sync
+from inventory_store import get_inventory_store
+from prewarm import get_prewarmer
 
 
 class InventorySidebar(Vertical):
@@ -40,6 +61,9 @@ class InventorySidebar(Vertical):
             id="sot_api_token",
             classes="disabled-text",
         )
+        yield Checkbox(
+            "Incremental sync", id="sot_incremental", classes="disabled-text"
+        )
         yield Button(
             label="Sync", disabled=True, variant="success", id="sot_sync_button"
         )
@@ -71,6 +95,7 @@ class InventorySidebar(Vertical):
         # Enable URL/API token textboxes and Sync button
         self.query_one("#sot_url").remove_class("disabled-text")
         self.query_one("#sot_api_token").remove_class("disabled-text")
+        self.query_one("#sot_incremental").remove_class("disabled-text")
         self.query_one("#sot_sync_button").disabled = False
 
     def on_button_pressed(self, event: Button.Pressed) -> None:
@@ -80,9 +105,13 @@ class InventorySidebar(Vertical):
         api_token = self.query_one("#sot_api_token", Input)
         sync_msg = self.query_one("#sync_message")
         last_sync_msg = self.query_one("#last_synced")
+        incremental = self.query_one("#sot_incremental", Checkbox).value
         if sot_url.value and api_token.value:
             nb_sync = sot_sync(
-                sot_url.value, api_token.value, self.sot_selected.label.plain.lower()
+                sot_url.value,
+                api_token.value,
+                self.sot_selected.label.plain.lower(),
+                incremental=incremental,
             )
         else:
             nb_sync = False
@@ -96,40 +125,375 @@ class InventorySidebar(Vertical):
             sync_msg.update(Text("Sync was not successful", style="red1"))
 
 
-class InventoryTable(DataTable):
-    def __init__(self):
-        super().__init__()
-        headers = iter([("Name", "IP Address", "Device Type")])
-        self.add_columns(*next(headers))
-        inv_data = self.load_inventory()
-        # Only iterate if inventory is populated
-        if inv_data:
-            for dev in inv_data:
-                self.add_row(
-                    dev.get("name", "N/A"),
-                    dev.get("primary_ip", "N/A"),
-                    dev.get("device_type", "N/A"),
+class InventoryRows:
+    """
+    Inventory rows prepared for the inventory table. Built in a background thread, so the
+    screen doesn't block while a big inventory is loaded.
+
+    Args:
+        devices (list[dict]): Devices from the inventory store
+        columns (tuple): Device fields shown in each column
+    """
+
+    def __init__(self, devices: list[dict], columns: tuple):
+        self.rows = [
+            tuple(
+                "N/A" if dev.get(field) is None else str(dev.get(field))
+                for field in columns
+            )
+            for dev in devices
+        ]
+        # Lowercase copies for case insensitive filtering and sorting
+        self.lowered = [tuple(value.lower() for value in row) for row in self.rows]
+        self.widths = [
+            max((cell_len(row[column]) for row in self.rows), default=0)
+            for column in range(len(columns))
+        ]
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+
+class InventoryTable(ScrollView, can_focus=True):
+    """
+    Inventory table that only renders the rows in view, so it opens instantly with tens of
+    thousands of devices. Rows can be filtered with `filter()` and sorted by clicking a header
+    or pressing 's' on a column. Selecting a cell posts `InventoryTable.CellSelected`.
+    """
+
+    COLUMNS = (
+        ("Name", "name"),
+        ("IP Address", "primary_ip"),
+        ("Device Type", "device_type"),
+    )
+    FIELDS = tuple(field for _, field in COLUMNS)
+    # Prefixes for searching a single column, e.g. 'type:ios'
+    FILTER_COLUMNS = {"name": 0, "ip": 1, "type": 2}
+
+    BINDINGS = [
+        Binding("up", "cursor_up", "Up", show=False),
+        Binding("down", "cursor_down", "Down", show=False),
+        Binding("left", "cursor_left", "Left", show=False),
+        Binding("right", "cursor_right", "Right", show=False),
+        Binding("pageup", "page_up", "Page up", show=False),
+        Binding("pagedown", "page_down", "Page down", show=False),
+        Binding("home", "cursor_home", "First row", show=False),
+        Binding("end", "cursor_end", "Last row", show=False),
+        Binding("enter", "select_cell", "Copy cell"),
+        Binding("s", "sort", "Sort by column"),
+    ]
+
+    COMPONENT_CLASSES = {
+        "inventory-table--header",
+        "inventory-table--cursor",
+    }
+
+    DEFAULT_CSS = """
+    InventoryTable {
+        height: 1fr;
+    }
+    InventoryTable > .inventory-table--header {
+        background: $primary;
+        color: $text;
+        text-style: bold;
+    }
+    InventoryTable > .inventory-table--cursor {
+        background: $secondary;
+        color: $text;
+    }
+    """
+
+    class CellSelected(Message):
+        """Posted when a cell is clicked or selected with enter. `row` is the row's position in the loaded data."""
+
+        def __init__(self, value: str, row: int) -> None:
+            self.value = value
+            self.row = row
+            super().__init__()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._data = InventoryRows([], self.FIELDS)
+        self._view: list[int] = []
+        self._sort_orders: dict[int, list[int]] = {}
+        self._filter = ""
+        self.sort_column: Optional[int] = None
+        self.sort_reverse = False
+        self.cursor_row = 0
+        self.cursor_column = 0
+
+    @property
+    def row_count(self) -> int:
+        """Number of rows shown after filtering"""
+        return len(self._view)
+
+    @property
+    def total_count(self) -> int:
+        return len(self._data)
+
+    def row_values(self, row: int) -> tuple:
+        """Values of a row, by its position in the loaded data"""
+        return self._data.rows[row]
+
+    def set_rows(self, data: InventoryRows) -> None:
+        """Show new inventory rows, keeping the current filter and sort"""
+        self._data = data
+        self._sort_orders = {}
+        self._apply()
+
+    def filter(self, text: str) -> None:
+        """
+        Only show rows containing `text` (case insensitive). Prefix the text with a column,
+        e.g. 'name:core' or 'type:ios', to search that column only.
+        """
+        self._filter = text.strip().lower()
+        self._apply()
+
+    def sort(self, column: int) -> None:
+        """Sort by a column. Sorting by the same column again reverses the order."""
+        if column == self.sort_column:
+            self.sort_reverse = not self.sort_reverse
+        else:
+            self.sort_column = column
+            self.sort_reverse = False
+        self._apply()
+
+    def _apply(self) -> None:
+        """Rebuild the list of visible rows from the filter and sort order"""
+        lowered = self._data.lowered
+        if self.sort_column is None:
+            order = range(len(lowered))
+        else:
+            order = self._sort_orders.get(self.sort_column)
+            if order is None:
+                column = self.sort_column
+                order = sorted(range(len(lowered)), key=lambda i: lowered[i][column])
+                self._sort_orders[column] = order
+            if self.sort_reverse:
+                order = order[::-1]
+
+        text, columns = self._filter, None
+        prefix, sep, value = text.partition(":")
+        if sep and prefix in self.FILTER_COLUMNS:
+            text, columns = value, (self.FILTER_COLUMNS[prefix],)
+        if not text:
+            self._view = list(order)
+        elif columns is None:
+            self._view = [i for i in order if any(text in cell for cell in lowered[i])]
+        else:
+            column = columns[0]
+            self._view = [i for i in order if text in lowered[i][column]]
+
+        self.cursor_row = min(self.cursor_row, max(0, len(self._view) - 1))
+        self.virtual_size = Size(self._table_width, len(self._view) + 1)
+        self.refresh()
+
+    @property
+    def _column_widths(self) -> list[int]:
+        return [
+            max(cell_len(label) + 2, width)
+            for (label, _), width in zip(self.COLUMNS, self._data.widths)
+        ]
+
+    @property
+    def _table_width(self) -> int:
+        # Each cell is padded with a space on both sides
+        return sum(width + 2 for width in self._column_widths)
+
+    def _column_at(self, x: int) -> Optional[int]:
+        edge = 0
+        for column, width in enumerate(self._column_widths):
+            edge += width + 2
+            if x < edge:
+                return column
+        return None
+
+    def render_line(self, y: int) -> Strip:
+        scroll_x, scroll_y = self.scroll_offset
+        width = self.size.width
+        base_style = self.rich_style
+        widths = self._column_widths
+
+        if y == 0:
+            # Header, stays in place while scrolling down
+            style = self.get_component_rich_style("inventory-table--header")
+            labels = []
+            for column, (label, _) in enumerate(self.COLUMNS):
+                if column == self.sort_column:
+                    label += " ▼" if self.sort_reverse else " ▲"
+                labels.append(label)
+            segments = [
+                Segment(f" {set_cell_size(label, column_width)} ", style)
+                for label, column_width in zip(labels, widths)
+            ]
+        else:
+            row_index = scroll_y + y - 1
+            if row_index >= len(self._view):
+                return Strip.blank(width, base_style)
+            row = self._data.rows[self._view[row_index]]
+            cursor_style = self.get_component_rich_style("inventory-table--cursor")
+            segments = []
+            for column, (value, column_width) in enumerate(zip(row, widths)):
+                style = base_style
+                if row_index == self.cursor_row and self.has_focus:
+                    style = (
+                        cursor_style
+                        if column == self.cursor_column
+                        else base_style + Style(bold=True)
+                    )
+                segments.append(
+                    Segment(f" {set_cell_size(value, column_width)} ", style)
                 )
+        return (
+            Strip(segments, self._table_width)
+            .crop(scroll_x, scroll_x + width)
+            .extend_cell_length(width, base_style)
+        )
+
+    def _scroll_to_cursor(self) -> None:
+        # One line is taken up by the header
+        height = max(1, self.size.height - 1)
+        # scroll_y is a float, scroll_offset has the whole line at the top
+        scroll_y = self.scroll_offset.y
+        if self.cursor_row < scroll_y:
+            self.scroll_to(y=self.cursor_row, animate=False)
+        elif self.cursor_row >= scroll_y + height:
+            self.scroll_to(y=self.cursor_row - height + 1, animate=False)
+        self.refresh()
+
+    def _move_cursor(self, rows: int = 0, columns: int = 0) -> None:
+        self.cursor_row = max(0, min(self.cursor_row + rows, len(self._view) - 1))
+        self.cursor_column = max(
+            0, min(self.cursor_column + columns, len(self.COLUMNS) - 1)
+        )
+        self._scroll_to_cursor()
+
+    def action_cursor_up(self) -> None:
+        self._move_cursor(rows=-1)
+
+    def action_cursor_down(self) -> None:
+        self._move_cursor(rows=1)
+
+    def action_cursor_left(self) -> None:
+        self._move_cursor(columns=-1)
+
+    def action_cursor_right(self) -> None:
+        self._move_cursor(columns=1)
+
+    def action_page_up(self) -> None:
+        self._move_cursor(rows=-(self.size.height - 1))
+
+    def action_page_down(self) -> None:
+        self._move_cursor(rows=self.size.height - 1)
+
+    def action_cursor_home(self) -> None:
+        self._move_cursor(rows=-self.cursor_row)
+
+    def action_cursor_end(self) -> None:
+        self._move_cursor(rows=len(self._view))
 
-    def load_inventory(self) -> list[dict]:
-        return load_inventory_file()
+    def action_sort(self) -> None:
+        self.sort(self.cursor_column)
+
+    def action_select_cell(self) -> None:
+        if self._view:
+            row_index = self._view[self.cursor_row]
+            row = self._data.rows[row_index]
+            self.post_message(self.CellSelected(row[self.cursor_column], row_index))
+
+    def on_click(self, event: events.Click) -> None:
+        """Sort when a header is clicked, select the cell otherwise"""
+        scroll_x, scroll_y = self.scroll_offset
+        column = self._column_at(event.x + scroll_x)
+        if column is None:
+            return
+        if event.y == 0:
+            self.sort(column)
+            return
+        row_index = scroll_y + event.y - 1
+        if row_index < len(self._view):
+            self.cursor_row, self.cursor_column = row_index, column
+            self.refresh()
+            self.action_select_cell()
 
 
 class InventoryScreen(Screen):
-    BINDINGS = [("escape", "app.pop_screen", "Return")]
+    """
+    Inventory page. The screen is only created when it's first opened, and the inventory is
+    loaded in the background each time the screen is shown after the inventory changed.
+    """
+
+    BINDINGS = [
+        ("escape", "app.pop_screen", "Return"),
+        ("/", "focus_filter", "Filter"),
+    ]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._version = None
 
     def compose(self) -> ComposeResult:
-        with VerticalScroll():
+        with Vertical():
             yield Static(
-                Text("Select cell to copy value", style="bold orange1"),
+                Text("Loading inventory...", style="bold orange1"),
                 id="inv_copy_label",
             )
-            yield InventoryTable()
+            yield Input(
+                placeholder="Filter devices, e.g. 'core' or 'type:ios' (columns: name, ip, type)",
+                id="inv_filter",
+            )
+            yield InventoryTable(id="inv_table")
             yield Footer()
 
-    def on_data_table_cell_selected(self, event: DataTable.CellSelected):
-        """Copy the cell value when selected"""
+    def on_screen_resume(self) -> None:
+        """Reload the inventory if it changed since it was last shown"""
+        self.query_one(InventoryTable).focus()
+        if get_inventory_store().version != self._version:
+            self.load_inventory()
+
+    @work(exclusive=True, group="inventory")
+    def load_inventory(self) -> None:
+        """Read the inventory and prepare the rows in the background"""
+        worker = get_current_worker()
+        store = get_inventory_store()
+        version = store.version
+        data = InventoryRows(list(store.iter_devices()), InventoryTable.FIELDS)
+        if not worker.is_cancelled:
+            self.app.call_from_thread(self.show_inventory, data, version)
+
+    def show_inventory(self, data: InventoryRows, version: int) -> None:
+        self._version = version
+        self.query_one(InventoryTable).set_rows(data)
+        self.update_label()
+
+    def update_label(self) -> None:
+        table = self.query_one(InventoryTable)
+        self.query_one("#inv_copy_label", Static).update(
+            Text(
+                f"{table.row_count} of {table.total_count} devices - select cell to copy value",
+                style="bold orange1",
+            )
+        )
+
+    def action_focus_filter(self) -> None:
+        self.query_one("#inv_filter", Input).focus()
+
+    def on_input_changed(self, event: Input.Changed) -> None:
+        """Filter the table as the user types"""
+        if event.input.id == "inv_filter":
+            self.query_one(InventoryTable).filter(event.value)
+            self.update_label()
+
+    def on_input_submitted(self, event: Input.Submitted) -> None:
+        if event.input.id == "inv_filter":
+            self.query_one(InventoryTable).focus()
+
+    def on_inventory_table_cell_selected(self, event: InventoryTable.CellSelected):
+        """Copy the cell value when selected, and start connecting to the row's device"""
         pyperclip.copy(event.value)
+        name = self.query_one(InventoryTable).row_values(event.row)[0]
+        if name != "N/A":
+            get_prewarmer().prewarm(name)
         self.query_one("#inv_copy_label").update(
             Text(f"Copied '{event.value}'", style="bold green1")
         )
@@ -0,0 +1,250 @@
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Iterable, Iterator, Optional
+
+STORE_FILE = "sot_inventory.db"
+# Inventory file written by earlier versions, imported into the store on first use
+LEGACY_INVENTORY_FILE = "sot_inventory.json"
+FIELDS = ("id", "name", "primary_ip", "device_type", "platform")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS devices (
+    key TEXT PRIMARY KEY,
+    id INTEGER,
+    name TEXT NOT NULL,
+    primary_ip TEXT,
+    address TEXT,
+    device_type TEXT,
+    platform TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_devices_name ON devices (name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_devices_address ON devices (address);
+CREATE INDEX IF NOT EXISTS idx_devices_device_type ON devices (device_type COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_devices_platform ON devices (platform COLLATE NOCASE);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def device_key(device: dict) -> str:
+    """Devices synced from Netbox/Nautobot are keyed by their SoT id, others by name"""
+    if device.get("id") is not None:
+        return str(device["id"])
+    return str(device.get("name"))
+
+
+def device_address(primary_ip: Optional[str]) -> Optional[str]:
+    """Strip the prefix length from a primary IP, e.g. '10.1.1.1/32' -> '10.1.1.1'"""
+    if primary_ip is None or primary_ip in ("None", "N/A"):
+        return None
+    return str(primary_ip).split("/")[0]
+
+
+def _like_prefix(glob: str) -> str:
+    """
+    LIKE pattern matching the literal start of a glob, e.g. 'core-*' -> 'core-%'. SQLite can only
+    use the NOCASE indexes for LIKE, so queries narrow a glob down with it first.
+    """
+    for position, char in enumerate(glob):
+        if char in "*?[":
+            glob = glob[:position]
+            break
+    return glob.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+class InventoryStore:
+    """
+    Local SQLite store for devices synced from a SoT, indexed on name, IP and device type.
+
+    Args:
+        path (str): SQLite database file
+    """
+
+    def __init__(self, path: str = STORE_FILE):
+        self.path = path
+        self._local = threading.local()
+        self._db.executescript(SCHEMA)
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        # SQLite connections can't be shared between threads, so each thread gets its own
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, isolation_level=None)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        db = self._db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        else:
+            db.execute(
+                "INSERT INTO meta (key, value) VALUES ('version', 1) "
+                "ON CONFLICT (key) DO UPDATE SET value = value + 1"
+            )
+            db.execute("COMMIT")
+
+    @property
+    def version(self) -> int:
+        """Increases every time the inventory changes"""
+        row = self._db.execute(
+            "SELECT value FROM meta WHERE key = 'version'"
+        ).fetchone()
+        return int(row["value"]) if row else 0
+
+    @staticmethod
+    def _rows(devices: Iterable[dict]) -> Iterator[tuple]:
+        for dev in devices:
+            yield (
+                device_key(dev),
+                dev.get("id"),
+                str(dev.get("name")),
+                dev.get("primary_ip"),
+                device_address(dev.get("primary_ip")),
+                dev.get("device_type"),
+                dev.get("platform"),
+            )
+
+    def _upsert(self, db: sqlite3.Connection, devices: Iterable[dict]) -> None:
+        db.executemany(
+            "INSERT INTO devices (key, id, name, primary_ip, address, device_type, platform) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET id = excluded.id, name = excluded.name, "
+            "primary_ip = excluded.primary_ip, address = excluded.address, "
+            "device_type = excluded.device_type, platform = excluded.platform",
+            self._rows(devices),
+        )
+
+    def merge(self, devices: Iterable[dict], deleted_keys: Iterable[str]) -> None:
+        """Upsert changed devices and remove deleted ones in one transaction, e.g. for an incremental sync"""
+        with self._transaction() as db:
+            self._upsert(db, devices)
+            db.executemany(
+                "DELETE FROM devices WHERE key = ?",
+                ((str(key),) for key in deleted_keys),
+            )
+
+    def keys(self) -> set[str]:
+        return {row["key"] for row in self._db.execute("SELECT key FROM devices")}
+
+    @contextmanager
+    def replace_all(self) -> Iterator["InventoryWriter"]:
+        """
+        Replace the whole inventory, e.g. for a full sync. Devices written to the returned writer
+        only replace the current inventory if the block finishes without an error.
+
+        Example:
+            with store.replace_all() as writer:
+                for page in pages:
+                    writer.write(page)
+        """
+        with self._transaction() as db:
+            db.execute("DELETE FROM devices")
+            yield InventoryWriter(self, db)
+
+    def all(self) -> list[dict]:
+        """All devices, ordered by name"""
+        return list(self.iter_devices())
+
+    def iter_devices(self, order_by: str = "name") -> Iterator[dict]:
+        if order_by not in FIELDS:
+            raise ValueError(f"Can't order inventory by '{order_by}'")
+        cursor = self._db.execute(
+            f"SELECT {', '.join(FIELDS)} FROM devices ORDER BY {order_by} COLLATE NOCASE"
+        )
+        for row in cursor:
+            yield dict(row)
+
+    def find(
+        self, name_glob: Optional[str] = None, type_glob: Optional[str] = None
+    ) -> list[dict]:
+        """
+        Devices whose name matches a glob, or whose device type or platform matches a glob (case insensitive).
+        Globs that don't start with a wildcard are looked up in the indexes.
+
+        Args:
+            name_glob (str): Shell-style pattern matched against device names, e.g. 'core-*'
+            type_glob (str): Shell-style pattern matched against device types and platforms, e.g. 'cisco_*'
+        """
+        clauses, params = [], []
+        if name_glob is not None:
+            clauses.append("name LIKE ? ESCAPE '\\' AND lower(name) GLOB ?")
+            params.extend([_like_prefix(name_glob), name_glob.lower()])
+        if type_glob is not None:
+            clauses.append(
+                "((device_type LIKE ? ESCAPE '\\' AND lower(device_type) GLOB ?) "
+                "OR (platform LIKE ? ESCAPE '\\' AND lower(platform) GLOB ?))"
+            )
+            params.extend([_like_prefix(type_glob), type_glob.lower()] * 2)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        cursor = self._db.execute(
+            f"SELECT {', '.join(FIELDS)} FROM devices {where} ORDER BY name COLLATE NOCASE",
+            params,
+        )
+        return [dict(row) for row in cursor]
+
+    def lookup(self, host: str) -> Optional[dict]:
+        """The device with this name (case insensitive) or IP address, if it's in the inventory"""
+        row = self._db.execute(
+            f"SELECT {', '.join(FIELDS)} FROM devices "
+            "WHERE name = ? COLLATE NOCASE OR address = ? LIMIT 1",
+            (host, host),
+        ).fetchone()
+        return None if row is None else dict(row)
+
+    def import_json(self, path: str) -> bool:
+        """Import an inventory file written by earlier versions. Returns True if it was imported."""
+        try:
+            with open(path) as json_file:
+                devices = json.load(json_file)
+        except (OSError, ValueError):
+            return False
+        with self.replace_all() as writer:
+            writer.write(devices)
+        return True
+
+
+class InventoryWriter:
+    """Writes batches of devices into an open `InventoryStore.replace_all()` transaction"""
+
+    def __init__(self, store: InventoryStore, db: sqlite3.Connection):
+        self._store = store
+        self._db = db
+        self.count = 0
+
+    def write(self, devices: list[dict]) -> None:
+        self._store._upsert(self._db, devices)
+        self.count += len(devices)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_inventory_store() -> InventoryStore:
+    """
+    Returns the app-wide inventory store. The first time the store is created,
+    an existing sot_inventory.json file is imported into it.
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            first_run = not os.path.exists(STORE_FILE)
+            _store = InventoryStore()
+            if first_run:
+                _store.import_json(LEGACY_INVENTORY_FILE)
+    return _store
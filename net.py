@@ -1,24 +1,89 @@
-import json
+import time
+
+# Startup time is measured from here, so it includes importing the app's modules
+STARTED = time.perf_counter()
+
+import datetime
 import os
-import requests
-from rich.syntax import Syntax
-from rich.tree import Tree
-from pathlib import Path
+from typing import Optional
 import pyperclip
+from rich.console import RenderableType
 from rich.text import Text
 from textual import work
 from textual.app import App, ComposeResult
 from textual.binding import Binding
-from textual.containers import VerticalScroll, Container
-from textual.widgets import Static, Input, Footer, Button, Tabs
-from textual.worker import get_current_worker
+from textual.containers import VerticalScroll, Container, Vertical
+from textual.message import Message
+from textual.widgets import Static, Input, Footer, Button, Tabs, ContentSwitcher
+from textual.worker import Worker, get_current_worker
 from textual_autocomplete import AutoComplete, Dropdown
 
 # from textual_autocomplete._autocomplete import AutoComplete, Dropdown
 
 # local imports
-from helpers import get_device_info, add_node, get_items, write_json_file
+from helpers import get_items, run_device_command, warm_up, write_json_file
+from chatgpt import ChatError, ask_about_output
+from fanout import combine_results, is_multi_target, resolve_targets, run_fanout
+from history import HistoryScreen
+from history_store import ResultCache, get_history_store, get_result_cache
+from inventory_store import get_inventory_store
 from inventory import InventorySidebar, InventoryScreen
+from results import CommandResult
+from diff import diff_outputs, diff_renderable
+from export import ExportError, TableExporter, open_table_exporter
+from parsers import close_parse_pool, is_table
+from prewarm import close_prewarmer, get_prewarmer
+from session_pool import close_session_pool
+from timing import Trace, get_timing_stats, timing_renderable
+from viewers import JSONTree, RawOutputViewer, WatchTable
+from watch import Watcher, get_watch_settings
+
+IMPORTED = time.perf_counter()
+
+
+class CommandProgress(Message):
+    """Posted by the command worker when it starts a new phase"""
+
+    def __init__(self, phase: str) -> None:
+        self.phase = phase
+        super().__init__()
+
+
+class CommandOutput(Message):
+    """Posted by the command worker with each chunk of output as it arrives from the device"""
+
+    def __init__(self, output: str, worker: Worker) -> None:
+        self.output = output
+        self.worker = worker
+        super().__init__()
+
+
+class CommandComplete(Message):
+    """Posted by the command worker with the command's outputs"""
+
+    def __init__(self, result: CommandResult, worker: Optional[Worker] = None) -> None:
+        self.result = result
+        self.worker = worker
+        super().__init__()
+
+
+class DeviceResult(Message):
+    """Posted by the command worker each time a device finishes during a multi-device run"""
+
+    def __init__(self, result: dict, done: int, total: int) -> None:
+        self.result = result
+        self.done = done
+        self.total = total
+        super().__init__()
+
+
+class WatchResult(Message):
+    """A device's result from the next run of a watched command"""
+
+    def __init__(self, result: dict, watcher: Watcher) -> None:
+        self.result = result
+        self.watcher = watcher
+        super().__init__()
 
 
 class NetTextorialApp(App):
@@ -30,8 +95,18 @@ class NetTextorialApp(App):
         Binding("r", "copy_output", "Copy output"),
         Binding("i", "inventory", "Inventory"),
         Binding("v", "push_screen('inventory')", "Inventory Page"),
+        Binding("ctrl+x", "cancel_command", "Cancel command"),
+        Binding("ctrl+g", "search_output", "Search output"),
+        Binding("ctrl+r", "refresh_command", "Refresh"),
+        Binding("h", "push_screen('history')", "History"),
+        Binding("t", "toggle_timings", "Timings"),
+        Binding("ctrl+t", "export_timings", "Export timings", show=False),
+        Binding("s", "snapshot", "Snapshot"),
+        Binding("w", "toggle_watch", "Watch"),
+        Binding("ctrl+o", "cancel_prewarm", "Cancel pre-warm", show=False),
     ]
-    SCREENS = {"inventory": InventoryScreen()}
+    # Screens are only created when they're first opened
+    SCREENS = {"inventory": InventoryScreen, "history": HistoryScreen}
 
     def action_toggle_sidebar(self) -> None:
         """Called when user hits 'b' key."""
@@ -39,15 +114,16 @@ class NetTextorialApp(App):
 
     def action_copy_output(self) -> None:
         """Called when user hits 'r' key. Copies the raw command output."""
-        # Queries for widget that holds raw results
-        raw_output = self.query_one("#output-results")
         tabs = self.query(Tabs).first()
+        if self.result is None:
+            return
         # Figures out whether the 'Parsed Output (tree)' tab is currently active
-        if tabs.validate_active("tab-3"):
+        if tabs.active == "tab-3":
             output = "Manually copy tree output from app."
+        elif tabs.active == "tab-2":
+            output = self.result.parsed_json
         else:
-            # Extracts text from 'Syntax' renderable and copies to clipboard
-            output = str(raw_output.render().code)
+            output = self.result.raw_output
         pyperclip.copy(output)
 
     def compose(self) -> ComposeResult:
@@ -71,139 +147,672 @@ class NetTextorialApp(App):
                 "Parsed Output",
                 "Parsed Output (tree)",
                 "Learn with ChatGPT",
+                "Diff",
                 id="output-tabs",
             ),
-            Static(id="output-results", classes="result"),
+            Static(id="output-info"),
+            Static(id="timing-panel", classes="hidden"),
+            ContentSwitcher(
+                VerticalScroll(
+                    Static(id="output-results", classes="result"),
+                    id="output-static-view",
+                ),
+                Vertical(
+                    Input(
+                        placeholder="Search raw output (press enter for next match)",
+                        id="raw_search",
+                    ),
+                    RawOutputViewer(id="output-raw", classes="result"),
+                    id="output-raw-view",
+                ),
+                initial="output-static-view",
+                id="output-switcher",
+            ),
             classes="results-container",
         )
         yield Footer()
-        self.inventory = InventorySidebar(classes="hidden")
-        yield self.inventory
 
     def on_mount(self) -> None:
         """Called when app starts."""
         # Give the input focus, so we can start typing straight away
         self.query_one("#command_input").focus()
         # Initialize outputs
-        self.raw_output = ""
-        self.parsed_output = ""
+        self.result = None
+        self.command_worker = None
+        self.streaming = False
+        self.last_input = None
+        self.startup_time = None
+        self.export_error = None
+        # Results pinned with 's' to compare later runs of the same command with, by (host, command)
+        self.snapshots: dict[tuple, CommandResult] = {}
+        # Command re-run on an interval with 'w', and the latest result of each watched device
+        self.watcher: Optional[Watcher] = None
+        self.watch_results: dict[str, dict] = {}
+        # The sidebar and the tree view are only built when they're first opened, to start faster
+        self.inventory = None
+        self.call_after_refresh(self.first_frame)
+
+    def first_frame(self) -> None:
+        """Called once the first frame is drawn. Records the startup time and warms up in the background."""
+        now = time.perf_counter()
+        self.startup_time = now - STARTED
+        trace = Trace("startup")
+        trace.add("import", IMPORTED - STARTED, start=STARTED)
+        trace.add("first_frame", now - IMPORTED, start=IMPORTED)
+        trace.total = self.startup_time
+        get_timing_stats().record(trace)
+        if os.getenv("NET_TEXT_WARM_UP", "1").lower() not in ("0", "false", "no"):
+            self.preload()
 
-    def on_button_pressed(self, _: Button.Pressed) -> None:
+    @work(group="preload")
+    def preload(self) -> None:
+        """Load SSH, SoT and inventory modules and data before they're first needed"""
+        warm_up()
+
+    def on_button_pressed(self, event: Button.Pressed) -> None:
         """Run when user clicks 'Go!' button"""
+        if event.button.id != "run_button":
+            # Other buttons (e.g. inventory sync) are handled by their own widgets
+            return
         user_input = self.query_one("#command_input")
         if user_input.value:
-            # Get user input when user clicks 'Go!' button
-            outputs = get_device_info(user_input.value)
-            self.raw_output = outputs[0]
-            self.parsed_output = outputs[1]
-            # Write parsed output to local JSON file
-            write_json_file("parsed_output", self.parsed_output)
-
-    def action_inventory(self) -> None:
+            self.start_command(user_input.value)
+
+    def action_refresh_command(self) -> None:
+        """Called when user hits 'ctrl+r'. Runs the last command again, skipping the result cache."""
+        if self.last_input:
+            self.start_command(self.last_input, refresh=True)
+
+    def start_command(self, user_input: str, refresh: bool = False) -> None:
+        """Show a cached result if there is a fresh one, otherwise run the command"""
+        self.stop_watch()
+        self.last_input = user_input
+        selector, _, command = user_input.partition(" ")
+        if not refresh and not is_multi_target(selector):
+            cached = get_result_cache().get(selector, command)
+            if cached is not None:
+                self.workers.cancel_group(self, "device")
+                self.command_worker = None
+                self.query_one("#run_button", Button).disabled = False
+                self.show_result(cached.cached())
+                return
+        # Run the command in the background, so the UI stays responsive
+        self.query_one("#run_button", Button).disabled = True
+        self.streaming = False
+        self.command_worker = self.run_command(user_input)
+
+    def record_result(
+        self,
+        result: dict,
+        created: datetime.datetime,
+        exporter: Optional[TableExporter] = None,
+    ) -> CommandResult:
+        """
+        Add a device's result to the history, and to the result cache if it succeeded.
+        Tabular output is also appended to the export datasets, if exporting is on.
+        """
+        command_result = CommandResult.from_run(result, created=created)
+        if not result["error"]:
+            get_result_cache().put(result["host"], result["command"], command_result)
+        history = get_history_store()
+        if history is not None:
+            command_result.history_id = history.append(result, created)
+        if exporter is not None:
+            try:
+                exporter.export_result(result, created)
+            except (ExportError, OSError) as e:
+                self.export_error = str(e)
+        return command_result
+
+    @work(exclusive=True, group="device")
+    def run_command(self, user_input: str) -> None:
+        """Connect to the device and run the command. Results are posted back to the app as messages."""
+        try:
+            exporter = open_table_exporter()
+        except ExportError as e:
+            exporter = None
+            self.export_error = str(e)
+        try:
+            self.run_targets(user_input, exporter)
+        finally:
+            # Finishes Parquet files, so the run's tables can be read straight away
+            if exporter is not None:
+                exporter.close()
+
+    def run_targets(self, user_input: str, exporter: Optional[TableExporter]) -> None:
+        """Body of the `run_command()` worker, runs in its thread"""
+        worker = get_current_worker()
+        started = datetime.datetime.now()
+
+        def progress(phase: str) -> None:
+            if not worker.is_cancelled:
+                self.post_message(CommandProgress(phase))
+
+        selector, _, command = user_input.partition(" ")
+        if not is_multi_target(selector):
+            result = run_device_command(
+                selector,
+                command,
+                progress=progress,
+                on_output=lambda output: self.post_message(
+                    CommandOutput(output, worker)
+                ),
+                cancelled=lambda: worker.is_cancelled,
+            )
+            if result["cancelled"]:
+                # Output received before a cancel is still shown, but isn't kept
+                if result["raw_output"]:
+                    self.post_message(
+                        CommandComplete(
+                            CommandResult.from_run(result, created=started), worker
+                        )
+                    )
+                return
+            command_result = self.record_result(result, started, exporter)
+            if not worker.is_cancelled:
+                self.post_message(CommandComplete(command_result, worker))
+            return
+
+        # Run the command on every matching device at once
+        targets = resolve_targets(selector, get_inventory_store())
+        if not targets:
+            self.post_message(
+                CommandComplete(
+                    CommandResult(
+                        f"No devices in the inventory match '{selector}'.", "N/A"
+                    ),
+                    worker,
+                )
+            )
+            return
+        progress(f"Running '{command}' on {len(targets)} devices...")
+        start = time.perf_counter()
+        results = []
+        devices = {}
+        for result in run_fanout(
+            targets, command, cancelled=lambda: worker.is_cancelled
+        ):
+            results.append(result)
+            devices[result["name"]] = self.record_result(result, started, exporter)
+            if not worker.is_cancelled:
+                self.post_message(DeviceResult(result, len(results), len(targets)))
+        if not worker.is_cancelled:
+            outputs = combine_results(command, results, time.perf_counter() - start)
+            self.post_message(
+                CommandComplete(
+                    CommandResult(
+                        *outputs, host=selector, command=command, devices=devices
+                    ),
+                    worker,
+                )
+            )
+
+    def show_message(self, message: RenderableType) -> None:
+        """Show a status message in the output area"""
+        self.query_one("#output-results", Static).update(message)
+        self.query_one("#output-switcher", ContentSwitcher).current = (
+            "output-static-view"
+        )
+
+    def on_command_progress(self, message: CommandProgress) -> None:
+        """Show the current phase of the running command"""
+        switcher = self.query_one("#output-switcher", ContentSwitcher)
+        if self.streaming and switcher.current == "output-raw-view":
+            # Keep showing the output as it comes in
+            return
+        self.show_message(Text(message.phase))
+
+    def on_command_output(self, message: CommandOutput) -> None:
+        """Add output to the raw output viewer as it arrives"""
+        if message.worker is not self.command_worker:
+            # Left over from a command that was replaced by a newer one
+            return
+        viewer = self.query_one("#output-raw", RawOutputViewer)
+        if not self.streaming:
+            self.streaming = True
+            viewer.clear()
+            if self.query_one(Tabs).active == "tab-1":
+                self.query_one("#output-switcher", ContentSwitcher).current = (
+                    "output-raw-view"
+                )
+        viewer.append(message.output)
+
+    def on_device_result(self, message: DeviceResult) -> None:
+        """Show each device's result as it finishes during a multi-device run"""
+        result = message.result
+        status = (
+            Text("FAILED", style="red1")
+            if result["error"]
+            else Text("ok", style="green1")
+        )
+        self.show_message(
+            Text.assemble(
+                f"{message.done}/{message.total} devices done - last: {result['name']} ",
+                status,
+                f" ({result['elapsed']:.2f}s)",
+            )
+        )
+
+    def on_command_complete(self, message: CommandComplete) -> None:
+        """Store the outputs and refresh the active tab"""
+        if message.worker is not None and message.worker is not self.command_worker:
+            return
+        self.show_result(message.result)
+
+    def show_result(self, result: CommandResult) -> None:
+        """Store a result and refresh the active tab"""
+        start = time.perf_counter()
+        self.result = result
+        info = Text(result.summary, style="#a1a1a1")
+        if self.export_error:
+            info.append(f" · export failed: {self.export_error}", style="red1")
+            self.export_error = None
+        self.query_one("#output-info", Static).update(info)
+        if self.streaming:
+            self.streaming = False
+            # The output is already in the viewer, so it doesn't need to be loaded again
+            self.query_one("#output-raw", RawOutputViewer).finish(
+                self.result.raw_output
+            )
+        save_output = os.getenv("NET_TEXT_SAVE_OUTPUT", "1").lower()
+        # Results served from the cache or the history were saved when they ran
+        if result.source == "device" and save_output not in ("0", "false", "no"):
+            self.save_result(self.result)
+        self.query_one("#run_button", Button).disabled = False
+        active_tab = self.query_one(Tabs).active
+        if active_tab == "tab-4":
+            # Don't ask ChatGPT again until the user re-opens the tab
+            self.show_message(
+                "Command complete. Re-open this tab to analyze the new output."
+            )
+        elif active_tab:
+            self.show_tab(active_tab)
+        if result.trace is not None:
+            result.trace.add("render", time.perf_counter() - start, start=start)
+        self.update_timings()
+
+    @work(group="persist")
+    def save_result(self, result: CommandResult) -> None:
+        """Write parsed output to local JSON file in the background"""
+        start = time.perf_counter()
+        write_json_file("parsed_output", result.parsed_output)
+        if result.trace is not None:
+            result.trace.add("write_json", time.perf_counter() - start, start=start)
+
+    def update_timings(self) -> None:
+        """Refresh the timing panel, if it's shown"""
+        panel = self.query_one("#timing-panel", Static)
+        if not panel.has_class("hidden"):
+            trace = self.result.trace if self.result is not None else None
+            panel.update(timing_renderable(trace, get_timing_stats()))
+
+    def action_toggle_timings(self) -> None:
+        """Called when user hits 't'. Shows or hides the timing panel."""
+        self.query_one("#timing-panel", Static).toggle_class("hidden")
+        self.update_timings()
+
+    def action_export_timings(self) -> None:
+        """Called when user hits 'ctrl+t'. Writes every kept trace to a Chrome trace file."""
+        path = os.path.abspath("timings.json")
+        count = get_timing_stats().export(path)
+        self.query_one("#output-info", Static).update(
+            Text(f"Exported {count} trace(s) to {path}", style="#a1a1a1")
+        )
+
+    def action_cancel_command(self) -> None:
+        """Called when user hits 'ctrl+x'. Cancels the running command."""
+        if self.stop_watch():
+            self.show_watch_status()
+        if self.workers.cancel_group(self, "device"):
+            self.query_one("#run_button", Button).disabled = False
+            self.show_message(Text("Command cancelled.", style="gold1"))
+
+    def action_cancel_prewarm(self) -> None:
+        """Called when user hits 'ctrl+o'. Closes sessions opened ahead of a command that wasn't run."""
+        count = get_prewarmer().cancel()
+        self.query_one("#output-info", Static).update(
+            Text(f"Cancelled {count} pre-warmed session(s)", style="#a1a1a1")
+        )
+
+    def on_auto_complete_selected(self, event: AutoComplete.Selected) -> None:
+        """Start connecting to the device picked in the dropdown, so the session is ready for the command"""
+        get_prewarmer().prewarm(event.item.main.plain)
+
+    def action_search_output(self) -> None:
+        """Called when user hits 'ctrl+g'. Shows the raw output and focuses the search box."""
+        self.query_one(Tabs).active = "tab-1"
+        self.query_one("#raw_search", Input).focus()
+
+    def on_input_submitted(self, event: Input.Submitted) -> None:
+        """Jump to the next match in the raw output"""
+        if event.input.id == "raw_search":
+            found = self.query_one("#output-raw", RawOutputViewer).search(event.value)
+            event.input.set_class(not found and bool(event.value), "not-found")
+
+    async def action_inventory(self) -> None:
         """Toggle the display of the inventory sidebar"""
-        if self.inventory.shown:
+        if self.inventory is None:
+            self.inventory = InventorySidebar(classes="hidden")
+            await self.mount(self.inventory)
+            # Slide in from the hidden position
+            self.call_after_refresh(self.inventory.show)
+        elif self.inventory.shown:
             self.inventory.hide()
         else:
             self.inventory.show()
 
     async def on_tabs_tab_activated(self, event: Tabs.TabActivated) -> None:
         """Handle TabActivated message sent by Tabs."""
-        # Raw Output tab
-        if event.tab.id == "tab-1":
-            self.query_one("#output-results", Static).update(
-                Syntax(
-                    self.raw_output, "teratermmacro", theme="nord", line_numbers=True
-                )
-            )
-        # Parsed Output tab
-        elif event.tab.id == "tab-2":
-            try:
-                # Load the JSON file
-                file_path = Path(__file__).parent / "parsed_output.json"
-                with open(file_path) as parsed_data:
-                    self.parsed_output = json.load(parsed_data)
-            except:
-                self.query_one("#output-results", Static).update(
+        self.show_tab(event.tab.id)
+
+    def show_tab(self, tab_id: str) -> None:
+        """Render the outputs for the given tab"""
+        output_widget = self.query_one("#output-results", Static)
+        switcher = self.query_one("#output-switcher", ContentSwitcher)
+        switcher.current = "output-static-view"
+        result = self.result
+        if result is None and tab_id != "tab-1":
+            # Nothing run yet, fall back to the parsed output saved by a previous session
+            result = CommandResult.from_file()
+            if result is None:
+                output_widget.update(
                     "Local JSON file could not be loaded. Please ensure parsed output is available."
                 )
                 return
-            # Convert loaded JSON to string for display
-            parsed_jstring = json.dumps(self.parsed_output, indent=2)
-            self.query_one("#output-results", Static).update(
-                Syntax(
-                    parsed_jstring,
-                    "teratermmacro",
-                    theme="nord",
-                    line_numbers=True,
-                )
+        # Raw Output tab
+        if tab_id == "tab-1":
+            self.query_one("#output-raw", RawOutputViewer).load(
+                result.raw_output if result else ""
             )
+            switcher.current = "output-raw-view"
+        # Parsed Output tab
+        elif tab_id == "tab-2":
+            watch_tables = switcher.query("#watch-table")
+            if self.watcher is not None and watch_tables:
+                # Tables of watched devices are updated in place, row by row
+                switcher.current = "watch-table"
+            else:
+                output_widget.update(result.parsed_renderable)
         # Parsed Output (tree) tab
-        elif event.tab.id == "tab-3":
-            # Load the JSON file
-            try:
-                file_path = Path(__file__).parent / "parsed_output.json"
-                with open(file_path) as parsed_data:
-                    self.json_data = json.load(parsed_data)
-            except:
-                self.query_one("#output-results", Static).update(
-                    "Local JSON file could not be loaded. Please ensure parsed output is available."
-                )
-                return
-            # Update the correct tab
-            tree: Tree[dict] = Tree("Parsed Output")
-            # json_node = tree.add("Parsed Output")
-            tree = add_node("Parsed Output", tree, self.json_data)
-            self.query_one("#output-results", Static).update(tree)
+        elif tab_id == "tab-3":
+            trees = switcher.query("#output-tree")
+            if trees:
+                tree = trees.first(JSONTree)
+            else:
+                tree = JSONTree(id="output-tree", classes="result")
+                switcher.mount(tree)
+            tree.load(result.parsed_output)
+            switcher.current = "output-tree"
         # Learn with ChatGPT tab
-        elif event.tab.id == "tab-4":
+        elif tab_id == "tab-4":
             # Clear results box and provide useful feedback to user
-            self.query_one("#output-results", Static).update(
+            output_widget.update(
                 "Please wait... ChatGPT is analyzing the JSON payload."
             )
-            # Load the JSON file, if not already loaded
-            try:
-                file_path = Path(__file__).parent / "parsed_output.json"
-                with open(file_path) as parsed_data:
-                    self.json_data = json.load(parsed_data)
-            except:
+            # Ask ChatGPT to analyze JSON
+            self.ai_chat(result.parsed_output)
+        # Diff tab
+        elif tab_id == "tab-5":
+            output_widget.update("Comparing with the previous run...")
+            self.show_diff(result)
+
+    def action_snapshot(self) -> None:
+        """Called when user hits 's'. Pins the current result, the Diff tab compares later runs with it."""
+        result = self.result
+        if result is None or not result.host or not result.command:
+            return
+        self.snapshots[ResultCache.make_key(result.host, result.command)] = result
+        self.query_one("#output-info", Static).update(
+            Text(
+                f"Snapshot of '{result.command}' on {result.host} taken, "
+                "the Diff tab compares later runs with it",
+                style="#a1a1a1",
+            )
+        )
+
+    def action_toggle_watch(self) -> None:
+        """
+        Called when user hits 'w'. Starts re-running the command in the input on an interval, on the
+        device(s) it selects, or stops watching. Watched results aren't kept in the history.
+        """
+        if self.stop_watch():
+            self.show_watch_status()
+            return
+        user_input = self.query_one("#command_input", Input).value or self.last_input
+        selector, _, command = (user_input or "").partition(" ")
+        if not selector or not command:
+            self.show_message("Enter a device and a command to watch first.")
+            return
+        if is_multi_target(selector):
+            targets = resolve_targets(selector, get_inventory_store())
+        else:
+            targets = [{"name": selector, "host": selector}]
+        if not targets:
+            self.show_message(f"No devices in the inventory match '{selector}'.")
+            return
+        self.workers.cancel_group(self, "device")
+        self.command_worker = None
+        self.streaming = False
+        self.query_one("#run_button", Button).disabled = False
+        self.last_input = user_input
+        self.watch_results = {}
+        self.query_one("#output-raw", RawOutputViewer).clear()
+        switcher = self.query_one("#output-switcher", ContentSwitcher)
+        watch_tables = switcher.query("#watch-table")
+        if watch_tables:
+            watch_tables.first(WatchTable).clear()
+        else:
+            switcher.mount(WatchTable(id="watch-table", classes="result"))
+        # Results are posted from the watcher's threads
+        watcher = Watcher(
+            targets,
+            command,
+            on_result=lambda result: self.post_message(WatchResult(result, watcher)),
+            **get_watch_settings(),
+        )
+        self.watcher = watcher.start()
+        self.show_message(
+            Text(
+                f"Watching '{command}' on {len(targets)} device(s)...", style="#a1a1a1"
+            )
+        )
+        self.show_watch_status()
+
+    def stop_watch(self) -> bool:
+        """Stop watching. Returns True if a command was being watched."""
+        watcher, self.watcher = self.watcher, None
+        if watcher is None:
+            return False
+        watcher.stop()
+        return True
+
+    def on_watch_result(self, message: WatchResult) -> None:
+        """Update the tabs with a watched device's latest result, only redrawing what changed"""
+        watcher = message.watcher
+        if watcher is not self.watcher:
+            # Finished after watching stopped
+            return
+        result = message.result
+        self.watch_results[result["name"]] = result
+        results = [
+            self.watch_results[target["name"]]
+            for target in watcher.targets
+            if target["name"] in self.watch_results
+        ]
+        selector = self.last_input.partition(" ")[0]
+        if len(watcher.targets) == 1:
+            self.result = CommandResult.from_run(result)
+        else:
+            # Same layout as a multi-device run, without the summary, whose counts change every run
+            raw_output = "\n\n".join(
+                f"### {device['name']} ###\n{device['raw_output']}"
+                for device in results
+            )
+            parsed_output = {
+                device["name"]: device["parsed_output"] for device in results
+            }
+            self.result = CommandResult(
+                raw_output, parsed_output, host=selector, command=watcher.command
+            )
+        self.query_one("#output-raw", RawOutputViewer).update_lines(
+            self.result.raw_output
+        )
+        table = self.query_one("#watch-table", WatchTable)
+        if is_table(result["parsed_output"]):
+            table.update_device(result["name"], result["parsed_output"])
+        self.show_watch_status(result)
+        active_tab = self.query_one(Tabs).active
+        switcher = self.query_one("#output-switcher", ContentSwitcher)
+        if active_tab == "tab-1":
+            switcher.current = "output-raw-view"
+        elif active_tab == "tab-2":
+            if table.row_count:
+                switcher.current = "watch-table"
+            else:
+                # Output that isn't a table is shown as a whole
                 self.query_one("#output-results", Static).update(
-                    "Local JSON file could not be loaded. Please ensure parsed output is available."
+                    self.result.parsed_renderable
                 )
-                return
-            # Ask ChatGPT to analyze JSON
-            self.ai_chat(f"Tell me about this JSON payload: {self.json_data}")
+                switcher.current = "output-static-view"
+
+    def show_watch_status(self, result: Optional[dict] = None) -> None:
+        """Show how the watch is going in the info line"""
+        watcher = self.watcher
+        info = self.query_one("#output-info", Static)
+        if watcher is None:
+            info.update(Text("Stopped watching.", style="#a1a1a1"))
+            return
+        status = Text(
+            f"Watching '{watcher.command}' on {len(watcher.targets)} device(s) "
+            f"every {watcher.interval:g}s - {watcher.runs} run(s)",
+            style="#a1a1a1",
+        )
+        if watcher.skipped:
+            status.append(f", {watcher.skipped} skipped (still running)", style="gold1")
+        if result is not None:
+            status.append(
+                f" - last: {result['name']} at {datetime.datetime.now():%H:%M:%S}",
+                style="#a1a1a1",
+            )
+            if result["error"]:
+                status.append(" FAILED", style="red1")
+        status.append(" - press w to stop", style="#a1a1a1")
+        info.update(status)
+
+    def find_baseline(
+        self, result: CommandResult
+    ) -> tuple[Optional[CommandResult], str]:
+        """
+        What a result is compared with: its snapshot if one was taken, otherwise the previous
+        successful run in the history. A multi-device run is compared with each device's own
+        previous run, devices that didn't run the command before are left out.
+
+        Returns:
+            Tuple of (result to compare with or None, description of it)
+        """
+        snapshot = self.snapshots.get(ResultCache.make_key(result.host, result.command))
+        if snapshot is not None and snapshot is not result:
+            return snapshot, f"the snapshot from {snapshot.created:%Y-%m-%d %H:%M:%S}"
+        history = get_history_store()
+        if history is None:
+            return None, ""
+        if result.devices is None:
+            entry = history.previous(
+                result.host, result.command, before=result.history_id
+            )
+            if entry is None:
+                return None, ""
+            baseline = CommandResult.from_run(entry, created=entry["created"])
+            return baseline, f"the run at {baseline.created:%Y-%m-%d %H:%M:%S}"
+        # The history is kept per device, the selector a fan-out ran on isn't in it
+        previous = {}
+        for name, device in result.devices.items():
+            entry = history.previous(
+                device.host, device.command, before=device.history_id
+            )
+            if entry is not None:
+                previous[name] = entry["parsed_output"]
+        if not previous:
+            return None, ""
+        description = "each device's previous run"
+        new_devices = sorted(result.devices.keys() - previous.keys())
+        if new_devices:
+            description += f" ({', '.join(new_devices)} didn't run it before)"
+        baseline = CommandResult("", previous, host=result.host, command=result.command)
+        return baseline, description
+
+    @work(exclusive=True, group="diff")
+    def show_diff(self, result: CommandResult) -> None:
+        """Compare the result with the previous run (or snapshot) in the background"""
+        worker = get_current_worker()
+        output_widget = self.query_one("#output-results", Static)
+        if not result.host or not result.command:
+            message = "Run a command first, then run it again to see what changed."
+        else:
+            baseline, description = self.find_baseline(result)
+            if baseline is None:
+                message = (
+                    f"'{result.command}' hasn't run on {result.host} before. Run it again, "
+                    "or press 's' to take a snapshot and compare the next run with it."
+                )
+            else:
+                current = result.parsed_output
+                if result.devices is not None and isinstance(
+                    baseline.parsed_output, dict
+                ):
+                    # Only devices with something to compare with, not every row as added
+                    current = {
+                        name: output
+                        for name, output in current.items()
+                        if name in baseline.parsed_output
+                    }
+                diffs = diff_outputs(baseline.parsed_output, current)
+                message = diff_renderable(
+                    diffs, baseline.parsed_output == current, description
+                )
+        if not worker.is_cancelled:
+            self.call_from_thread(output_widget.update, message)
 
     @work(exclusive=True)
-    def ai_chat(self, prompt: str) -> str:
-        """Ask ChatGPT a question. Assumes API key is set as an environment variable"""
-        api_key = os.getenv("OPEN_AI_KEY")
+    def ai_chat(self, parsed_output) -> None:
+        """Ask ChatGPT about the parsed output and stream the answer into the tab"""
         worker = get_current_worker()
         chatgpt_widget = self.query_one("#output-results", Static)
+        last_update = 0.0
 
-        if prompt and api_key is not None:
-            response = requests.post(
-                url="https://api.openai.com/v1/chat/completions",
-                headers={"authorization": f"Bearer {api_key}"},
-                json={
-                    "model": "gpt-3.5-turbo",
-                    "messages": [{"role": "user", "content": prompt}],
-                },
-            )
-            chatgpt_results = Text.from_ansi(
-                response.json()["choices"][0]["message"]["content"]
+        def show(answer: str) -> None:
+            nonlocal last_update
+            # Redraw at most 20 times a second, however fast tokens arrive
+            now = time.monotonic()
+            if now - last_update >= 0.05 and not worker.is_cancelled:
+                last_update = now
+                self.call_from_thread(chatgpt_widget.update, Text(answer))
+
+        try:
+            answer = ask_about_output(
+                parsed_output, show, cancelled=lambda: worker.is_cancelled
             )
-            if not worker.is_cancelled:
-                # Update widget from thread
-                self.call_from_thread(chatgpt_widget.update, chatgpt_results)
+        except ChatError as e:
+            answer = None
+            message = Text(f"Could not get an answer from ChatGPT: {e}", style="red1")
         else:
-            # No result from ChatGPT, return blank
-            if not worker.is_cancelled:
-                self.call_from_thread(
-                    chatgpt_widget.update,
-                    "Sorry, no OpenAI API key was found. Please make sure to set an environment variable.",
-                )
+            message = (
+                Text(answer)
+                if answer is not None
+                else "Sorry, no OpenAI API key was found. Please make sure to set an environment variable."
+            )
+        if not worker.is_cancelled:
+            # Update widget from thread
+            self.call_from_thread(chatgpt_widget.update, message)
 
 
 if __name__ == "__main__":
     app = NetTextorialApp()
-    app.run()
+    try:
+        app.run()
+    finally:
+        # Cleanly close any SSH sessions kept open for reuse, and the parser processes
+        app.stop_watch()
+        close_prewarmer()
+        close_session_pool()
+        close_parse_pool()
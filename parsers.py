@@ -0,0 +1,270 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Iterator, Optional, Union
+
+import textfsm
+from textfsm import clitable, texttable
+
+# Outputs bigger than this (in characters) are parsed in a separate process, so parsing them
+# doesn't hold up the UI
+PROCESS_PARSE_THRESHOLD = 256 * 1024
+# Extensions of captured outputs picked up by `parse_directory()`
+CAPTURE_EXTENSIONS = (".txt", ".raw", ".log")
+
+
+class TemplateCache:
+    """
+    Finds and compiles the ntc-templates TextFSM template for a (platform, command) only once.
+    Netmiko looks the command up in the template index and compiles the template again for every
+    command. Here the lookup result and the compiled templates are kept for the life of the process.
+
+    Args:
+        template_dir (str): Directory with the TextFSM 'index' file. Defaults to Netmiko's lookup
+            (NET_TEXTFSM env var, then the installed ntc-templates package).
+    """
+
+    def __init__(self, template_dir: Optional[str] = None):
+        self._template_dir = template_dir
+        self._index = None
+        self._lookups: dict[tuple, tuple[str, ...]] = {}
+        self._compiled: dict[str, tuple[textfsm.TextFSM, threading.Lock]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def template_dir(self) -> str:
+        if self._template_dir is None:
+            # Netmiko is slow to import, so it's only imported once a template is needed
+            from netmiko.utilities import get_template_dir
+
+            self._template_dir = get_template_dir()
+        return self._template_dir
+
+    def templates_for(self, platform: str, command: str) -> tuple[str, ...]:
+        """Template files used to parse a command's output, or an empty tuple if there are none"""
+        key = (platform, " ".join(command.split()))
+        templates = self._lookups.get(key)
+        if templates is None:
+            with self._lock:
+                if self._index is None:
+                    # CliTable expands abbreviations like 'sh[[ow]]' when it reads the index
+                    self._index = clitable.CliTable("index", self.template_dir).index
+                row = self._index.GetRowMatch({"Platform": key[0], "Command": key[1]})
+            templates = (
+                tuple(self._index.index[row]["Template"].split(":")) if row else ()
+            )
+            self._lookups[key] = templates
+        return templates
+
+    def _fsm(self, template: str) -> tuple[textfsm.TextFSM, threading.Lock]:
+        compiled = self._compiled.get(template)
+        if compiled is None:
+            with open(os.path.join(self.template_dir, template)) as template_file:
+                compiled = (textfsm.TextFSM(template_file), threading.Lock())
+            self._compiled[template] = compiled
+        return compiled
+
+    def _parse_table(
+        self, template: str, raw_output: str
+    ) -> tuple[texttable.TextTable, set]:
+        """Parse output with one template. Returns the table and the template's key columns."""
+        fsm, lock = self._fsm(template)
+        # A compiled template keeps its parsing state, so only one thread can use it at a time
+        with lock:
+            fsm.Reset()
+            records = fsm.ParseText(raw_output)
+            table = texttable.TextTable()
+            table.header = fsm.header
+            for record in records:
+                table.Append(record)
+            keys = set(fsm.GetValuesByAttrib("Key"))
+        return table, keys
+
+    def parse(
+        self, raw_output: str, platform: str, command: str
+    ) -> Optional[list[dict]]:
+        """
+        Parse a command's output with its TextFSM template
+
+        Returns:
+            List of dicts with lowercase keys, like Netmiko's `use_textfsm=True`.
+            None if there is no template for the command, or nothing was parsed.
+        """
+        templates = self.templates_for(platform, command)
+        if not templates and "cisco_xe" in platform:
+            # ntc-templates has IOS-XE commands under cisco_ios, like Netmiko falls back to
+            templates = self.templates_for("cisco_ios", command)
+        if not templates:
+            return None
+        try:
+            table, keys = self._parse_table(templates[0], raw_output)
+            # Columns from any other templates are merged in on the first template's keys
+            for template in templates[1:]:
+                table.extend(self._parse_table(template, raw_output)[0], keys)
+        except (OSError, textfsm.Error, texttable.Error):
+            return None
+        header = [column.lower() for column in table.header]
+        parsed = [dict(zip(header, row.values)) for row in table]
+        return parsed or None
+
+
+_cache: Optional[TemplateCache] = None
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def get_template_cache() -> TemplateCache:
+    """Returns the template cache for this process"""
+    global _cache
+    if _cache is None:
+        _cache = TemplateCache()
+    return _cache
+
+
+def parse_output(raw_output: str, platform: str, command: str) -> Optional[list[dict]]:
+    """
+    Parse saved or live command output. No device connection is needed.
+
+    Args:
+        raw_output (str): Raw CLI output
+        platform (str): Netmiko device type, e.g. 'cisco_ios'
+        command (str): Command that produced the output, abbreviations are fine
+
+    Returns:
+        List of dicts, or None if the output couldn't be parsed
+    """
+    return get_template_cache().parse(raw_output, platform, command)
+
+
+def is_table(data) -> bool:
+    """TextFSM output: a list of dicts that all have the same keys"""
+    return (
+        isinstance(data, list)
+        and bool(data)
+        and all(isinstance(row, dict) for row in data)
+        and all(row.keys() == data[0].keys() for row in data)
+    )
+
+
+def get_parse_pool() -> ProcessPoolExecutor:
+    """
+    Returns the app-wide process pool used to parse big outputs and batches. The number of
+    processes can be set with NET_TEXT_PARSE_WORKERS (default: number of CPUs, max 4).
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = int(
+                os.getenv("NET_TEXT_PARSE_WORKERS", min(4, os.cpu_count() or 1))
+            )
+            # Forking a process that runs the UI and SSH threads isn't safe, so start fresh processes
+            _pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+    return _pool
+
+
+def close_parse_pool() -> None:
+    """Stop the parser processes. Called when the app quits."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(cancel_futures=True)
+
+
+def parse_command_output(
+    raw_output: str, platform: str, command: str
+) -> Optional[list[dict]]:
+    """
+    Parse a command's output, in a separate process if the output is big. Used for live commands.
+
+    Returns:
+        List of dicts, or None if the output couldn't be parsed
+    """
+    if len(raw_output) < PROCESS_PARSE_THRESHOLD:
+        return parse_output(raw_output, platform, command)
+    try:
+        return (
+            get_parse_pool()
+            .submit(parse_output, raw_output, platform, command)
+            .result()
+        )
+    except (BrokenProcessPool, OSError):
+        # Parser processes couldn't be started or died, parse here instead
+        return parse_output(raw_output, platform, command)
+
+
+def capture_details(path: Path, platform: Optional[str] = None) -> tuple[str, str]:
+    """
+    Platform and command of a captured output file. Files are named after the command, with
+    underscores for spaces, in a folder named after the platform, e.g. 'cisco_ios/show_ip_route.txt'.
+
+    Returns:
+        Tuple of (platform, command)
+    """
+    command = path.stem.replace("_", " ")
+    return platform or path.parent.name, command
+
+
+def _parse_capture(job: tuple[str, str, str]) -> dict:
+    path, platform, command = job
+    try:
+        raw_output = Path(path).read_text()
+    except (OSError, UnicodeDecodeError) as e:
+        return {
+            "path": path,
+            "platform": platform,
+            "command": command,
+            "parsed_output": None,
+            "error": f"Could not read file: {e}",
+        }
+    parsed = parse_output(raw_output, platform, command)
+    return {
+        "path": path,
+        "platform": platform,
+        "command": command,
+        "parsed_output": parsed,
+        "error": None if parsed is not None else "No parser available.",
+    }
+
+
+def parse_directory(
+    directory: Union[str, Path],
+    platform: Optional[str] = None,
+    workers: Optional[int] = None,
+) -> Iterator[dict]:
+    """
+    Parse every captured output under a directory across a pool of processes. Each process
+    compiles a template once and reuses it for every file with the same command.
+
+    Args:
+        directory (str): Folder of captured outputs, see `capture_details()` for the naming
+        platform (str): Netmiko device type of every file, instead of taking it from the folder names
+        workers (int): Number of processes, defaults to the app-wide parse pool
+
+    Returns:
+        Iterator of dicts with 'path', 'platform', 'command', 'parsed_output' and 'error' keys,
+        in the same order as the files
+    """
+    jobs = []
+    for path in sorted(Path(directory).rglob("*")):
+        if path.is_file() and path.suffix in CAPTURE_EXTENSIONS:
+            jobs.append((str(path), *capture_details(path, platform)))
+    if not jobs:
+        return iter(())
+    # Send files to the processes in batches, so small files don't cost a round trip each
+    chunksize = max(1, len(jobs) // ((workers or 4) * 8))
+    if workers is None:
+        return get_parse_pool().map(_parse_capture, jobs, chunksize=chunksize)
+    return _parse_with_pool(jobs, workers, chunksize)
+
+
+def _parse_with_pool(jobs: list, workers: int, chunksize: int) -> Iterator[dict]:
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    ) as pool:
+        yield from pool.map(_parse_capture, jobs, chunksize=chunksize)
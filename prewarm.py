@@ -0,0 +1,202 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from netmiko import BaseConnection
+
+# local imports
+from session_pool import get_session_pool
+from timing import span, start_trace
+
+
+class PrewarmJob:
+    """A speculative connection to one device"""
+
+    def __init__(self, host: str):
+        self.host = host
+        self.cancelled = threading.Event()
+        self.future: Optional[Future] = None
+        # Set once the session is open and idle in the pool
+        self.connection: Optional["BaseConnection"] = None
+        self.warmed_at: Optional[float] = None
+
+
+class Prewarmer:
+    """
+    Opens sessions in the background to devices a command is likely to be run on next, e.g. a device
+    picked in the autocomplete dropdown or the inventory table. The DNS lookup, autodetect and the SSH
+    login are done before "Go!" is pressed, and the session is left idle in the session pool, where
+    the command picks it up.
+
+    Speculative sessions that are connecting, or open but not used yet, count towards `max_sessions`.
+    When a new device is picked at the cap, the oldest one is cancelled: a session still connecting
+    is closed once it's open, and an unused open session is closed straight away.
+
+    Args:
+        max_sessions (int): Maximum number of speculative sessions at once, 0 turns pre-warming off
+    """
+
+    def __init__(self, max_sessions: int = 2):
+        self.max_sessions = max_sessions
+        self._jobs: "OrderedDict[str, PrewarmJob]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def prewarm(self, host: str) -> bool:
+        """
+        Start connecting to a device in the background
+
+        Args:
+            host (str): Hostname/IP of the device, as it will be typed in the command
+
+        Returns:
+            True if a connection was started, False if pre-warming is off or the device already
+            has a speculative session
+        """
+        host = host.strip()
+        if self.max_sessions <= 0 or not host:
+            return False
+        pool = get_session_pool()
+        with self._lock:
+            self._prune()
+            if host in self._jobs:
+                self._jobs.move_to_end(host)
+                return False
+            # Make room by cancelling the least recently picked device
+            while len(self._jobs) >= self.max_sessions:
+                _, oldest = self._jobs.popitem(last=False)
+                self._cancel(oldest)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_sessions,
+                    thread_name_prefix="net-textorial-prewarm",
+                )
+            job = PrewarmJob(host)
+            self._jobs[host] = job
+            job.future = self._executor.submit(self._warm, job, pool)
+        return True
+
+    def wait(self, host: str, timeout: Optional[float] = None) -> None:
+        """
+        Wait for a speculative session to the device that's still connecting, so the command uses it
+        instead of opening a second one. A connection that hasn't started yet is cancelled instead.
+        """
+        with self._lock:
+            job = self._jobs.get(host)
+        if job is None or job.future is None or job.future.done():
+            return
+        if job.future.cancel():
+            with self._lock:
+                if self._jobs.get(host) is job:
+                    del self._jobs[host]
+            return
+        with span("prewarm_wait"):
+            try:
+                job.future.result(timeout)
+            except Exception:
+                pass
+
+    def cancel(self, host: Optional[str] = None) -> int:
+        """
+        Cancel speculative sessions that haven't been used by a command yet
+
+        Args:
+            host (str): Only cancel the session to this device. All of them if None.
+
+        Returns:
+            Number of sessions cancelled
+        """
+        with self._lock:
+            self._prune()
+            if host is None:
+                jobs = list(self._jobs.values())
+                self._jobs.clear()
+            else:
+                job = self._jobs.pop(host, None)
+                jobs = [job] if job is not None else []
+            for job in jobs:
+                self._cancel(job)
+        return len(jobs)
+
+    def pending(self) -> list[str]:
+        """Devices with a speculative session that's connecting or open but unused"""
+        with self._lock:
+            self._prune()
+            return list(self._jobs)
+
+    def shutdown(self) -> None:
+        """Cancel everything and stop the background threads. Called when the app quits."""
+        self.cancel()
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _warm(self, job: PrewarmJob, pool) -> None:
+        from helpers import device_connection, get_credentials, release_connection
+
+        if job.cancelled.is_set():
+            return
+        try:
+            with start_trace("prewarm", host=job.host):
+                connection = device_connection(job.host, get_credentials())
+        except Exception:
+            connection = None
+        if connection is None:
+            self._forget(job)
+            return
+        # Leave the session idle in the pool, or close it if it was cancelled while connecting
+        release_connection(connection, failed=job.cancelled.is_set())
+        with self._lock:
+            job.connection = connection
+            job.warmed_at = pool.idle_since(connection)
+            if self._jobs.get(job.host) is job and job.warmed_at is not None:
+                return
+        self._forget(job)
+
+    def _forget(self, job: PrewarmJob) -> None:
+        with self._lock:
+            if self._jobs.get(job.host) is job:
+                del self._jobs[job.host]
+
+    def _prune(self) -> None:
+        """Stop tracking sessions a command has used, or that were closed. Expects self._lock held."""
+        pool = get_session_pool()
+        for host, job in list(self._jobs.items()):
+            if job.connection is None:
+                continue
+            if pool.idle_since(job.connection) != job.warmed_at:
+                del self._jobs[host]
+
+    @staticmethod
+    def _cancel(job: PrewarmJob) -> None:
+        job.cancelled.set()
+        if job.future is not None:
+            job.future.cancel()
+        if job.connection is not None:
+            get_session_pool().close_idle(job.connection)
+
+
+_prewarmer: Optional[Prewarmer] = None
+_prewarmer_lock = threading.Lock()
+
+
+def get_prewarmer() -> Prewarmer:
+    """Returns the app-wide prewarmer. NET_TEXT_PREWARM sets how many speculative sessions are allowed (default: 2)"""
+    global _prewarmer
+    with _prewarmer_lock:
+        if _prewarmer is None:
+            _prewarmer = Prewarmer(max_sessions=int(os.getenv("NET_TEXT_PREWARM", 2)))
+    return _prewarmer
+
+
+def close_prewarmer() -> None:
+    """Cancel speculative sessions. Called when the app quits."""
+    global _prewarmer
+    with _prewarmer_lock:
+        prewarmer, _prewarmer = _prewarmer, None
+    if prewarmer is not None:
+        prewarmer.shutdown()
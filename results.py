@@ -0,0 +1,110 @@
+import copy
+import datetime
+import json
+from functools import cached_property
+from pathlib import Path
+from typing import Any, Optional
+
+from rich.syntax import Syntax
+
+# local imports
+from timing import Trace
+
+PARSED_OUTPUT_FILE = Path(__file__).parent / "parsed_output.json"
+
+
+class CommandResult:
+    """
+    The latest command output, kept in memory so switching tabs doesn't go back to disk.
+    The parsed output renderable is built the first time it is shown and reused after that.
+
+    Args:
+        raw_output (str): Raw CLI output
+        parsed_output (Any): Structured output, or a message if the output couldn't be parsed
+        host (str): Device the command was run on, if it was run on a single device
+        command (str): Command that was run
+        created (datetime): When the command was run, defaults to now
+        source (str): Where the result came from: 'device', 'cache' or 'history'
+        trace (Trace): Time spent in each phase of the command, if it was run just now
+        history_id (int): Id of the result's entry in the command history, if it was recorded
+        devices (dict): Each device's own result by device name, if the command ran on several
+    """
+
+    def __init__(
+        self,
+        raw_output: str,
+        parsed_output: Any,
+        host: Optional[str] = None,
+        command: Optional[str] = None,
+        created: Optional[datetime.datetime] = None,
+        source: str = "device",
+        trace: Optional[Trace] = None,
+        history_id: Optional[int] = None,
+        devices: Optional[dict[str, "CommandResult"]] = None,
+    ):
+        self.raw_output = raw_output
+        self.parsed_output = parsed_output
+        self.host = host
+        self.command = command
+        self.created = created or datetime.datetime.now()
+        self.source = source
+        self.trace = trace
+        self.history_id = history_id
+        self.devices = devices
+
+    @classmethod
+    def from_run(cls, result: dict, **kwargs) -> "CommandResult":
+        """Build from a `run_device_command()` result or a history entry"""
+        return cls(
+            result["raw_output"],
+            result["parsed_output"],
+            host=result["host"],
+            command=result["command"],
+            trace=result.get("trace"),
+            **kwargs,
+        )
+
+    def cached(self) -> "CommandResult":
+        """The same result marked as served from the result cache. Renderables built already are kept."""
+        result = copy.copy(self)
+        result.source = "cache"
+        # The timings were for the original run, not for this one
+        result.trace = None
+        return result
+
+    @property
+    def summary(self) -> str:
+        """Short description of where the result came from, e.g. 'r1 - show version - cached at 10:01:02'"""
+        when = self.created.strftime("%H:%M:%S")
+        if self.source == "cache":
+            origin = f"cached at {when} (ctrl+r to refresh)"
+        elif self.source == "history":
+            origin = f"from history, ran {self.created:%Y-%m-%d} {when}"
+        else:
+            origin = f"ran at {when}"
+        if self.trace is not None and self.trace.phases:
+            origin += f" ({self.trace.summary})"
+        return " - ".join(part for part in (self.host, self.command, origin) if part)
+
+    @classmethod
+    def from_file(cls, path: Path = PARSED_OUTPUT_FILE) -> Optional["CommandResult"]:
+        """Load the parsed output saved by a previous session. Returns None if it can't be loaded."""
+        try:
+            with open(path) as parsed_data:
+                return cls("", json.load(parsed_data))
+        except (OSError, ValueError):
+            return None
+
+    @cached_property
+    def parsed_json(self) -> str:
+        """Parsed output as a JSON string"""
+        return json.dumps(self.parsed_output, indent=2)
+
+    @cached_property
+    def parsed_renderable(self) -> Syntax:
+        return Syntax(
+            self.parsed_json,
+            "teratermmacro",
+            theme="nord",
+            line_numbers=True,
+        )
@@ -0,0 +1,291 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from netmiko import BaseConnection
+
+
+class PooledSession:
+    """A Netmiko connection tracked by the session pool"""
+
+    def __init__(self, key: tuple, connection: "BaseConnection"):
+        self.key = key
+        self.connection = connection
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+
+    @property
+    def in_use(self) -> bool:
+        return self.lock.locked()
+
+
+class SessionPool:
+    """
+    Keeps Netmiko SSH sessions open between commands so repeated commands to the same
+    device only pay for the command round trip.
+
+    Sessions are keyed by (host, username, device_type). Idle sessions are kept alive with
+    periodic keepalives, closed after an idle timeout and evicted least-recently-used first
+    once the pool is full. Room for more sessions can be reserved on top of `max_sessions`,
+    e.g. one per watched device, so they aren't evicted between polls.
+
+    Args:
+        max_sessions (int): Maximum number of sessions kept open at once
+        idle_timeout (float): Seconds a session may sit idle before it is closed
+        keepalive (int): Seconds between keepalives sent on idle sessions
+    """
+
+    def __init__(
+        self, max_sessions: int = 8, idle_timeout: float = 300, keepalive: int = 30
+    ):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.keepalive = keepalive
+        self._sessions: "OrderedDict[tuple, PooledSession]" = OrderedDict()
+        self._reserved = 0
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._reaper = None
+
+    @property
+    def capacity(self) -> int:
+        """Sessions kept open at most: `max_sessions` plus the reserved room"""
+        return self.max_sessions + self._reserved
+
+    def reserve(self, sessions: int) -> None:
+        """Make room for more sessions until `unreserve()` is called with the same number"""
+        with self._lock:
+            self._reserved += sessions
+
+    def unreserve(self, sessions: int) -> None:
+        """Give back room reserved with `reserve()`, closing idle sessions over the cap"""
+        with self._lock:
+            self._reserved = max(0, self._reserved - sessions)
+            evicted = self._evict()
+        for old in evicted:
+            self._disconnect(old.connection)
+
+    @staticmethod
+    def make_key(host: str, username: str, device_type: str) -> tuple:
+        return (host, username, device_type)
+
+    def checkout(
+        self, host: str, username: str, device_type: Optional[str] = None
+    ) -> Optional["BaseConnection"]:
+        """
+        Reserve an open session for the given device, if one is available.
+
+        Args:
+            host (str): Hostname/IP of the device
+            username (str): Username used to log in
+            device_type (str): Netmiko device type. If None, a session of any device type is returned.
+
+        Returns:
+            A live ConnectHandler object or None if no idle session was found
+        """
+        with self._lock:
+            candidates = [
+                session
+                for key, session in reversed(self._sessions.items())
+                if key[:2] == (host, username)
+                and (device_type is None or key[2] == device_type)
+            ]
+            for session in candidates:
+                if session.lock.acquire(blocking=False):
+                    self._sessions.move_to_end(session.key)
+                    break
+            else:
+                return None
+
+        # Check the session before handing it out, a dead session is thrown away
+        if self._is_alive(session.connection):
+            return session.connection
+        self._remove(session)
+        session.lock.release()
+        self._disconnect(session.connection)
+        return None
+
+    def open(self, remote_device: dict) -> "BaseConnection":
+        """
+        Open a new session and add it to the pool. The session is returned reserved.
+
+        Args:
+            remote_device (dict): Netmiko ConnectHandler arguments
+
+        Returns:
+            ConnectHandler object
+        """
+        from netmiko import ConnectHandler
+
+        remote_device = dict(remote_device)
+        remote_device.setdefault("keepalive", self.keepalive)
+        connection = ConnectHandler(**remote_device)
+        key = self.make_key(
+            remote_device.get("host"),
+            remote_device.get("username"),
+            remote_device.get("device_type"),
+        )
+        session = PooledSession(key, connection)
+        session.lock.acquire()
+
+        with self._lock:
+            replaced = self._sessions.pop(key, None)
+            self._sessions[key] = session
+            evicted = self._evict()
+        if replaced is not None and not replaced.in_use:
+            evicted.append(replaced)
+        for old in evicted:
+            self._disconnect(old.connection)
+        self._start_reaper()
+        return connection
+
+    def release(self, connection: "BaseConnection") -> None:
+        """Return a reserved session to the pool"""
+        session = self._find(connection)
+        if session is None:
+            # Session was evicted while in use
+            self._disconnect(connection)
+            return
+        session.last_used = time.monotonic()
+        if session.in_use:
+            session.lock.release()
+        # Sessions opened while every other session was busy may have put the pool over its cap
+        with self._lock:
+            evicted = self._evict()
+        for old in evicted:
+            self._disconnect(old.connection)
+
+    def discard(self, connection: "BaseConnection") -> None:
+        """Close a session and remove it from the pool, e.g. after an error"""
+        session = self._find(connection)
+        if session is not None:
+            self._remove(session)
+        self._disconnect(connection)
+
+    def idle_since(self, connection: "BaseConnection") -> Optional[float]:
+        """When an idle session was last used (`time.monotonic()`), or None if it's in use or gone"""
+        session = self._find(connection)
+        if session is None or session.in_use:
+            return None
+        return session.last_used
+
+    def close_idle(self, connection: "BaseConnection") -> bool:
+        """Close a session unless it's in use. Returns True if it was closed."""
+        session = self._find(connection)
+        if session is None or not session.lock.acquire(blocking=False):
+            return False
+        try:
+            self._remove(session)
+        finally:
+            session.lock.release()
+        self._disconnect(connection)
+        return True
+
+    def close_all(self) -> None:
+        """Close every session in the pool and stop the keepalive thread"""
+        self._closed.set()
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            self._disconnect(session.connection)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _find(self, connection: "BaseConnection") -> Optional[PooledSession]:
+        with self._lock:
+            for session in self._sessions.values():
+                if session.connection is connection:
+                    return session
+        return None
+
+    def _remove(self, session: PooledSession) -> None:
+        with self._lock:
+            if self._sessions.get(session.key) is session:
+                del self._sessions[session.key]
+
+    def _evict(self) -> list[PooledSession]:
+        """Drop least recently used idle sessions until the pool is within its cap. Expects self._lock held."""
+        evicted = []
+        for key, session in list(self._sessions.items()):
+            if len(self._sessions) <= self.capacity:
+                break
+            if not session.in_use:
+                del self._sessions[key]
+                evicted.append(session)
+        return evicted
+
+    def _start_reaper(self) -> None:
+        if self._reaper is None or not self._reaper.is_alive():
+            self._closed.clear()
+            self._reaper = threading.Thread(
+                target=self._reap, name="net-textorial-session-pool", daemon=True
+            )
+            self._reaper.start()
+
+    def _reap(self) -> None:
+        """Close expired sessions and send keepalives on idle ones"""
+        interval = max(1, min(self.keepalive or self.idle_timeout, self.idle_timeout))
+        while not self._closed.wait(interval):
+            now = time.monotonic()
+            with self._lock:
+                idle = list(self._sessions.values())
+            for session in idle:
+                if not session.lock.acquire(blocking=False):
+                    continue
+                try:
+                    expired = now - session.last_used > self.idle_timeout
+                    if expired or not self._is_alive(session.connection):
+                        self._remove(session)
+                        self._disconnect(session.connection)
+                finally:
+                    session.lock.release()
+
+    @staticmethod
+    def _is_alive(connection: "BaseConnection") -> bool:
+        try:
+            return connection.is_alive()
+        except Exception:
+            return False
+
+    @staticmethod
+    def _disconnect(connection: "BaseConnection") -> None:
+        try:
+            connection.disconnect()
+        except Exception:
+            pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_session_pool() -> SessionPool:
+    """
+    Returns the app-wide session pool. Limits can be set with environment variables:
+        - NET_TEXT_MAX_SESSIONS (default: 8)
+        - NET_TEXT_IDLE_TIMEOUT (seconds, default: 300)
+        - NET_TEXT_KEEPALIVE (seconds, default: 30)
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SessionPool(
+                max_sessions=int(os.getenv("NET_TEXT_MAX_SESSIONS", 8)),
+                idle_timeout=float(os.getenv("NET_TEXT_IDLE_TIMEOUT", 300)),
+                keepalive=int(os.getenv("NET_TEXT_KEEPALIVE", 30)),
+            )
+    return _pool
+
+
+def close_session_pool() -> None:
+    """Close all pooled sessions. Called when the app quits."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close_all()
@@ -0,0 +1,62 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# local imports
+from autocomplete import AutocompleteIndex
+from inventory_store import InventoryStore
+
+NAMES = ["core-1", "Core-2", "dist-core-1", "edge-1", "edge-2", "lab-edge-9"]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = InventoryStore(str(tmp_path / "inventory.db"))
+    with store.replace_all() as writer:
+        writer.write(
+            [
+                {"name": name, "primary_ip": f"10.0.0.{i}/32", "device_type": "ios"}
+                for i, name in enumerate(NAMES)
+            ]
+        )
+    return store
+
+
+def search(index: AutocompleteIndex, value: str) -> list[str]:
+    return [item.main.plain for item in index.search(value)]
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("core", ["core-1", "Core-2", "dist-core-1"]),
+        ("CORE-1", ["core-1", "dist-core-1"]),
+        ("ed", ["edge-1", "edge-2", "lab-edge-9"]),
+        ("-9", ["lab-edge-9"]),
+        ("xyz", []),
+    ],
+)
+def test_prefix_matches_come_first(store, value, expected):
+    assert search(AutocompleteIndex(store), value) == expected
+
+
+def test_limit(store):
+    assert search(AutocompleteIndex(store, limit=2), "e") == ["edge-1", "edge-2"]
+
+
+def test_rebuilt_when_the_inventory_changes(store):
+    index = AutocompleteIndex(store)
+    assert search(index, "spine") == []
+    store.merge([{"name": "spine-1"}], [])
+    assert search(index, "spine") == ["spine-1"]
+
+
+def test_items_are_reused_without_old_highlights(store):
+    index = AutocompleteIndex(store)
+    item = index.search("edge-1")[0]
+    item.main.stylize("bold", 0, 4)
+    assert index.search("edge-1")[0] is item
+    assert item.main.spans == []
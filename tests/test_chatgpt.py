@@ -0,0 +1,29 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# local imports
+from chatgpt import compact_json, reduce_payload
+
+ROWS = [
+    {"interface": f"Gi0/{i}", "status": "up", "vlans": ["1", "10"]} for i in range(2000)
+]
+PAYLOADS = [
+    ["x" * 10000],
+    {f"r{i}": "y" * 500 for i in range(50)},
+    {"r1": ROWS, "r2": {"nested": [ROWS, ['é"\\\n' * 300, 10**40]]}},
+    [[[["deep" * 100] * 5] * 5] * 5],
+]
+
+
+@pytest.mark.parametrize("payload", PAYLOADS)
+@pytest.mark.parametrize("budget", [2, 10, 64, 200, 1000, 12000])
+def test_reduce_payload_fits_budget(payload, budget):
+    assert len(compact_json(reduce_payload(payload, budget))) <= budget
+
+
+def test_reduce_payload_keeps_small_payloads():
+    assert reduce_payload({"r1": ROWS[:2]}, 1000) == {"r1": ROWS[:2]}
@@ -0,0 +1,52 @@
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# local imports
+import cli
+import fanout
+from inventory_store import InventoryStore
+from timing import Trace
+
+
+def fake_run_device_command(host: str, command: str) -> dict:
+    if host == "r2":
+        raise OSError("Socket is closed")
+    trace = Trace("command", host=host, command=command)
+    trace.add("command", 0.1)
+    return {
+        "host": host,
+        "command": command,
+        "platform": "cisco_ios",
+        "raw_output": "Cisco IOS Software",
+        "parsed_output": [{"version": "15.2"}],
+        "error": None,
+        "cancelled": False,
+        "elapsed": 0.1,
+        "trace": trace.finish(),
+    }
+
+
+def test_device_that_raises_is_reported_in_its_record(monkeypatch, tmp_path, capsys):
+    monkeypatch.setattr(fanout, "run_device_command", fake_run_device_command)
+    monkeypatch.setattr(
+        cli, "get_inventory_store", lambda: InventoryStore(str(tmp_path / "inv.db"))
+    )
+    output = tmp_path / "results.ndjson"
+
+    code = cli.main(["-t", "r1,r2,r3", "-c", "show version", "-o", str(output)])
+
+    records = {
+        record["name"]: record
+        for record in map(json.loads, output.read_text().splitlines())
+    }
+    assert code == 1
+    assert sorted(records) == ["r1", "r2", "r3"]
+    assert records["r1"]["ok"] and records["r3"]["ok"]
+    assert records["r1"]["timings"] == {"command": 0.1}
+    assert not records["r2"]["ok"]
+    assert "Socket is closed" in records["r2"]["error"]
+    assert records["r2"]["timings"] == {}
+    assert "2 succeeded, 1 failed" in capsys.readouterr().err
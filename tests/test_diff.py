@@ -0,0 +1,111 @@
+import random
+import sys
+from pathlib import Path
+
+from rich.console import Console
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# local imports
+from diff import diff_outputs, diff_renderable, diff_tables
+
+
+def routes(count: int, nexthop: str = "192.0.2.1") -> list[dict]:
+    return [
+        {
+            "network": f"10.0.{i // 256}.{i % 256}",
+            "prefix_length": "32",
+            "nexthop_ip": nexthop,
+        }
+        for i in range(count)
+    ]
+
+
+def render(diffs) -> str:
+    console = Console(width=200, record=True)
+    console.print(diff_renderable(diffs, False, "the run at 10:01:02"))
+    return console.export_text()
+
+
+def test_same_order_changes():
+    old = routes(5000)
+    new = routes(5000)
+    new[10]["nexthop_ip"] = "192.0.2.9"
+    del new[2000]
+    new.insert(3000, {"network": "172.16.0.0", "prefix_length": "16", "nexthop_ip": ""})
+    diff = diff_tables(old, new)
+    assert diff.key == ("network", "prefix_length")
+    assert diff.added == [new[3000]]
+    assert diff.removed == [old[2000]]
+    assert diff.modified == [(old[10], new[10], ["nexthop_ip"])]
+    assert diff.unchanged == 4998
+
+
+def test_reordered_table():
+    old = routes(5000)
+    new = routes(5000)
+    new[42]["nexthop_ip"] = "192.0.2.9"
+    random.Random(0).shuffle(new)
+    diff = diff_tables(old, new)
+    assert not diff.added and not diff.removed
+    assert [(row["network"], changed) for _, row, changed in diff.modified] == [
+        ("10.0.0.42", ["nexthop_ip"])
+    ]
+    assert diff.unchanged == 4999
+
+
+def test_repeated_keys_are_matched_in_order():
+    ecmp = [
+        {"network": "10.0.0.0", "prefix_length": "8", "nexthop_ip": nexthop}
+        for nexthop in ("a", "b", "c")
+    ]
+    diff = diff_tables(ecmp, ecmp[:2])
+    assert diff.removed == [ecmp[2]]
+    assert diff.unchanged == 2
+
+
+def test_values_containing_the_separator():
+    old = [{"id": str(i), "a": "x\x00", "b": "y"} for i in range(1200)]
+    new = [{"id": str(i), "a": "x", "b": "\x00y"} for i in range(1200)]
+    diff = diff_tables(old, new[::-1])
+    assert len(diff.added) == len(diff.removed) == 1200
+
+
+def test_list_values():
+    old = [{"neighbor": "r2", "capabilities": ["R", "S"]}]
+    new = [{"neighbor": "r2", "capabilities": ["R"]}]
+    diff = diff_tables(old, new)
+    assert diff.modified == [(old[0], new[0], ["capabilities"])]
+
+
+def test_template_change_compares_shared_columns():
+    old = [{"interface": f"Gi0/{i}", "status": "up"} for i in range(3)]
+    new = [{"interface": f"Gi0/{i}", "status": "up", "mtu": "1500"} for i in range(3)]
+    new[1]["status"] = "down"
+    diff = diff_tables(old, new)
+    assert diff.added_columns == ("mtu",)
+    assert diff.removed_columns == ()
+    assert diff.key == ("interface",)
+    assert diff.unchanged == 2
+    assert [changed for _, _, changed in diff.modified] == [["status"]]
+    assert "The template changed (+mtu)" in render({"": diff})
+
+
+def test_template_change_without_shared_columns():
+    diff = diff_tables([{"a": "1"}], [{"b": "1"}])
+    assert diff.added == [{"b": "1"}]
+    assert diff.removed == [{"a": "1"}]
+    assert diff.removed_columns == ("a",)
+
+
+def test_multi_device_outputs_are_compared_per_device():
+    old = {"r1": routes(10), "r2": routes(10)}
+    new = {"r1": routes(10), "r2": routes(10, nexthop="192.0.2.9")}
+    diffs = diff_outputs(old, new)
+    assert not diffs["r1"].changed
+    assert len(diffs["r2"].modified) == 10
+    assert "r2: +0 added, -0 removed, ~10 modified" in render(diffs)
+
+
+def test_outputs_that_are_not_tables():
+    assert diff_outputs("text", "other text") == {"": None}
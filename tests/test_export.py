@@ -0,0 +1,84 @@
+import csv
+import datetime
+import gzip
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# local imports
+from export import ExportError, TableExporter, dataset_path
+
+WHEN = datetime.datetime(2024, 5, 1, 10, 1, 2)
+ROWS = [
+    {"interface": "Gi0/1", "status": "up", "vlans": ["1", "10"]},
+    {"interface": "Gi0/2", "status": "down", "vlans": []},
+]
+
+
+def result(name: str, parsed_output, error=None) -> dict:
+    return {
+        "name": name,
+        "host": f"{name}.example.com",
+        "platform": "cisco_ios",
+        "command": "show  interfaces",
+        "parsed_output": parsed_output,
+        "error": error,
+    }
+
+
+def test_dataset_path(tmp_path):
+    assert dataset_path(tmp_path, None, "show ip  route", "csv.gz") == (
+        tmp_path / "unknown" / "show_ip_route.csv.gz"
+    )
+
+
+@pytest.mark.parametrize("fmt", ["csv", "csv.gz"])
+def test_csv_datasets_are_appended_to(tmp_path, fmt):
+    with TableExporter(tmp_path, fmt) as exporter:
+        assert exporter.export_result(result("r1", ROWS), WHEN) == 2
+        assert exporter.export_result(result("r2", ROWS[:1]), WHEN) == 1
+        assert exporter.export_result(result("r3", "No parser available."), WHEN) == 0
+        assert exporter.export_result(result("r4", ROWS, error="timed out"), WHEN) == 0
+    # A new exporter keeps appending to the same file
+    with TableExporter(tmp_path, fmt) as exporter:
+        exporter.export_result(result("r5", ROWS[1:]), WHEN)
+
+    path = tmp_path / "cisco_ios" / f"show_interfaces.{fmt}"
+    opener = gzip.open if fmt == "csv.gz" else open
+    with opener(path, "rt", newline="") as dataset:
+        rows = list(csv.reader(dataset))
+    assert rows == [
+        ["host", "timestamp", "interface", "status", "vlans"],
+        ["r1", "2024-05-01T10:01:02", "Gi0/1", "up", '["1","10"]'],
+        ["r1", "2024-05-01T10:01:02", "Gi0/2", "down", "[]"],
+        ["r2", "2024-05-01T10:01:02", "Gi0/1", "up", '["1","10"]'],
+        ["r5", "2024-05-01T10:01:02", "Gi0/2", "down", "[]"],
+    ]
+
+
+def test_mismatched_columns_are_refused(tmp_path):
+    with TableExporter(tmp_path) as exporter:
+        exporter.export_result(result("r1", ROWS), WHEN)
+        with pytest.raises(ExportError, match="don't match"):
+            exporter.export_result(result("r2", [{"interface": "Gi0/1"}]), WHEN)
+
+
+def test_parquet_dataset(tmp_path):
+    pyarrow_parquet = pytest.importorskip("pyarrow.parquet")
+    with TableExporter(tmp_path, "parquet") as exporter:
+        exporter.export_result(result("r1", ROWS), WHEN)
+        exporter.export_result(result("r2", ROWS), WHEN)
+    table = pyarrow_parquet.read_table(
+        tmp_path / "cisco_ios" / "show_interfaces.parquet"
+    )
+    assert table.num_rows == 4
+    assert table.column("host").to_pylist() == ["r1", "r1", "r2", "r2"]
+    assert table.column("vlans").to_pylist()[:2] == [["1", "10"], []]
+
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(ExportError, match="Unknown export format"):
+        TableExporter(tmp_path, "xlsx")
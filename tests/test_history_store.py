@@ -0,0 +1,76 @@
+import datetime
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# local imports
+import history_store
+from history_store import HistoryStore, ResultCache, normalize_command
+
+
+def result(host: str, command: str, output: str, error=None) -> dict:
+    return {
+        "host": host,
+        "command": command,
+        "raw_output": output,
+        "parsed_output": [{"line": output}],
+        "error": error,
+        "elapsed": 0.5,
+    }
+
+
+def test_normalize_command_keeps_case():
+    assert normalize_command("  show ip  route\t| include Vlan10 ") == (
+        "show ip route | include Vlan10"
+    )
+
+
+def test_cache_key_ignores_whitespace_and_host_case():
+    cache = ResultCache()
+    cache.put("R1", "show  version", "output")
+    assert cache.get("r1", "show version") == "output"
+    assert cache.get("r1", "show ip int | inc Vlan10") is None
+    cache.put("r1", "show ip int | inc Vlan10", "vlan10")
+    assert cache.get("r1", "show ip int | inc vlan10") is None
+
+
+def test_cache_expires_and_evicts(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(history_store.time, "monotonic", lambda: now[0])
+    cache = ResultCache(ttl=60, max_entries=2)
+    cache.put("r1", "show version", 1)
+    cache.put("r2", "show version", 2)
+    cache.get("r1", "show version")
+    cache.put("r3", "show version", 3)
+    assert cache.get("r2", "show version") is None
+    assert cache.get("r1", "show version") == 1
+    now[0] += 61
+    assert cache.get("r1", "show version") is None
+    assert len(cache) == 1
+
+
+def test_history_round_trip(tmp_path):
+    history = HistoryStore(str(tmp_path / "history.db"))
+    created = datetime.datetime(2024, 5, 1, 10, 1, 2)
+    entry_id = history.append(result("r1", "show  version", "IOS 15.2"), created)
+    entry = history.load(entry_id)
+    assert entry["command"] == "show version"
+    assert entry["raw_output"] == "IOS 15.2"
+    assert entry["parsed_output"] == [{"line": "IOS 15.2"}]
+    assert entry["created"] == created
+    assert [row["id"] for row in history.entries()] == [entry_id]
+    assert history.load(entry_id + 1) is None
+
+
+def test_previous_skips_failed_runs_and_uses_the_same_key(tmp_path):
+    history = HistoryStore(str(tmp_path / "history.db"))
+    first = history.append(result("r1", "show ip int | inc Vlan10", "up"))
+    history.append(result("r1", "show ip int | inc Vlan10", "", error="timed out"))
+    history.append(result("r1", "show ip int | inc vlan10", "other filter"))
+    latest = history.append(result("r1", "show ip int | inc Vlan10", "down"))
+
+    previous = history.previous("R1", "show ip int  | inc Vlan10", before=latest)
+    assert previous["id"] == first
+    assert history.previous("r1", "show ip int | inc Vlan10")["id"] == latest
+    assert history.previous("r1", "show ip int | inc Vlan10", before=first) is None
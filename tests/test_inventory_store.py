@@ -0,0 +1,114 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# local imports
+from fanout import resolve_targets
+from inventory_store import InventoryStore
+
+DEVICES = [
+    {
+        "id": 1,
+        "name": "core-1",
+        "primary_ip": "10.0.0.1/32",
+        "device_type": "cisco_ios",
+        "platform": "ios",
+    },
+    {
+        "id": 2,
+        "name": "Core-2",
+        "primary_ip": "10.0.0.2/32",
+        "device_type": "cisco_nxos",
+        "platform": "nxos",
+    },
+    {
+        "id": 3,
+        "name": "edge_1",
+        "primary_ip": None,
+        "device_type": "juniper_junos",
+        "platform": "junos",
+    },
+    {
+        "id": 4,
+        "name": "edge-10",
+        "primary_ip": "10.0.1.10/24",
+        "device_type": "arista_eos",
+        "platform": "eos",
+    },
+]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = InventoryStore(str(tmp_path / "inventory.db"))
+    with store.replace_all() as writer:
+        writer.write(DEVICES)
+    return store
+
+
+def names(devices: list[dict]) -> list[str]:
+    return [dev["name"] for dev in devices]
+
+
+@pytest.mark.parametrize(
+    "name_glob, expected",
+    [
+        ("core-*", ["core-1", "Core-2"]),
+        ("CORE-?", ["core-1", "Core-2"]),
+        ("edge_*", ["edge_1"]),
+        ("edge-1[0-9]", ["edge-10"]),
+        ("*-1*", ["core-1", "edge-10"]),
+        ("dist-*", []),
+    ],
+)
+def test_find_by_name(store, name_glob, expected):
+    assert names(store.find(name_glob=name_glob)) == expected
+
+
+def test_find_by_type_or_platform(store):
+    assert names(store.find(type_glob="cisco_*")) == ["core-1", "Core-2"]
+    assert names(store.find(type_glob="EOS")) == ["edge-10"]
+
+
+@pytest.mark.parametrize(
+    "query, args, index",
+    [
+        ("find", {"name_glob": "core-*"}, "idx_devices_name"),
+        ("find", {"type_glob": "cisco_*"}, "idx_devices_device_type"),
+        ("find", {"type_glob": "cisco_*"}, "idx_devices_platform"),
+        ("lookup", {"host": "10.0.0.1"}, "idx_devices_address"),
+    ],
+)
+def test_queries_use_the_indexes(store, query, args, index):
+    plans = []
+    store._db.set_trace_callback(
+        lambda sql: plans.extend(
+            row["detail"]
+            for row in store._db.execute(f"EXPLAIN QUERY PLAN {sql}")
+            if sql.startswith("SELECT")
+        )
+    )
+    getattr(store, query)(**args)
+    store._db.set_trace_callback(None)
+    assert any(f"SEARCH devices USING INDEX {index}" in plan for plan in plans)
+
+
+def test_lookup_by_name_or_address(store):
+    assert store.lookup("CORE-1")["id"] == 1
+    assert store.lookup("10.0.0.2")["name"] == "Core-2"
+    assert store.lookup("core-3") is None
+
+
+def test_resolve_targets(store):
+    assert resolve_targets("core-1, 10.0.0.2,r9,core-1", store) == [
+        {"name": "core-1", "host": "10.0.0.1"},
+        {"name": "Core-2", "host": "10.0.0.2"},
+        {"name": "r9", "host": "r9"},
+    ]
+    assert resolve_targets("edge*", store) == [
+        {"name": "edge-10", "host": "10.0.1.10"},
+        {"name": "edge_1", "host": "edge_1"},
+    ]
@@ -0,0 +1,75 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# local imports
+from parsers import TemplateCache, capture_details, is_table
+
+INDEX = """Template, Hostname, Platform, Command
+
+cisco_ios_show_version.textfsm, .*, cisco_ios, sh[[ow]] ver[[sion]]
+"""
+TEMPLATE = r"""Value VERSION (\S+)
+Value HOSTNAME (\S+)
+
+Start
+  ^.*Version ${VERSION},
+  ^${HOSTNAME} uptime -> Record
+"""
+OUTPUT = """Cisco IOS Software, Version 15.2(4)M7, RELEASE SOFTWARE
+r1 uptime is 1 week, 2 days
+"""
+
+
+@pytest.fixture
+def cache(tmp_path):
+    (tmp_path / "index").write_text(INDEX)
+    (tmp_path / "cisco_ios_show_version.textfsm").write_text(TEMPLATE)
+    return TemplateCache(str(tmp_path))
+
+
+@pytest.mark.parametrize("command", ["show version", "sh ver", "show  version"])
+def test_parse(cache, command):
+    assert cache.parse(OUTPUT, "cisco_ios", command) == [
+        {"version": "15.2(4)M7", "hostname": "r1"}
+    ]
+
+
+def test_ios_xe_falls_back_to_ios_templates(cache):
+    assert cache.parse(OUTPUT, "cisco_xe", "show version") is not None
+
+
+def test_nothing_to_parse(cache):
+    assert cache.parse(OUTPUT, "cisco_ios", "show clock") is None
+    assert cache.parse(OUTPUT, "juniper_junos", "show version") is None
+    assert cache.parse("no match", "cisco_ios", "show version") is None
+
+
+def test_templates_are_compiled_once(cache):
+    cache.parse(OUTPUT, "cisco_ios", "show version")
+    compiled = cache._fsm("cisco_ios_show_version.textfsm")
+    cache.parse(OUTPUT, "cisco_ios", "sh ver")
+    assert cache._fsm("cisco_ios_show_version.textfsm") is compiled
+
+
+def test_capture_details():
+    path = Path("captures/cisco_nxos/show_ip_route.txt")
+    assert capture_details(path) == ("cisco_nxos", "show ip route")
+    assert capture_details(path, "cisco_ios") == ("cisco_ios", "show ip route")
+
+
+@pytest.mark.parametrize(
+    "data, expected",
+    [
+        ([{"a": 1}, {"a": 2}], True),
+        ([{"a": 1}, {"b": 2}], False),
+        ([], False),
+        ({"a": 1}, False),
+        ("text", False),
+    ],
+)
+def test_is_table(data, expected):
+    assert is_table(data) is expected
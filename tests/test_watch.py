@@ -0,0 +1,74 @@
+import sys
+import threading
+from pathlib import Path
+
+import netmiko
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# local imports
+import watch
+from session_pool import SessionPool
+
+
+class FakeConnection:
+    def __init__(self, **kwargs):
+        self.host = kwargs["host"]
+        self.connected = True
+
+    def is_alive(self) -> bool:
+        return self.connected
+
+    def disconnect(self) -> None:
+        self.connected = False
+
+
+def test_reserved_sessions_are_kept_until_unreserved(monkeypatch):
+    monkeypatch.setattr(netmiko, "ConnectHandler", FakeConnection)
+    pool = SessionPool(max_sessions=2, keepalive=0)
+    pool.reserve(3)
+    connections = [
+        pool.open({"host": f"r{i}", "username": "admin", "device_type": "cisco_ios"})
+        for i in range(5)
+    ]
+    for connection in connections:
+        pool.release(connection)
+    assert len(pool) == 5
+    assert all(connection.connected for connection in connections)
+
+    pool.unreserve(3)
+    assert len(pool) == 2
+    assert [connection.connected for connection in connections] == [
+        False,
+        False,
+        False,
+        True,
+        True,
+    ]
+    pool.close_all()
+
+
+def test_watcher_reserves_a_session_per_device(monkeypatch):
+    pool = SessionPool(max_sessions=2)
+    monkeypatch.setattr(watch, "get_session_pool", lambda: pool)
+    seen = set()
+    all_seen = threading.Event()
+
+    def run_device_command(host: str, command: str) -> dict:
+        return {"host": host, "command": command, "error": None}
+
+    def on_result(result: dict) -> None:
+        seen.add(result["name"])
+        if len(seen) == len(targets):
+            all_seen.set()
+
+    monkeypatch.setattr(watch, "run_device_command", run_device_command)
+    targets = [{"name": f"r{i}", "host": f"10.0.0.{i}"} for i in range(10)]
+    watcher = watch.Watcher(targets, "show version", on_result, interval=0.1, jitter=0)
+
+    watcher.start()
+    assert pool.capacity == 12
+    assert all_seen.wait(5)
+    watcher.stop()
+    watcher.stop()
+    assert pool.capacity == 2
@@ -0,0 +1,363 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from rich.console import Group
+from rich.table import Table
+from rich.text import Text
+
+# Phases in the order they happen, used to sort the timing panel
+PHASE_ORDER = (
+    "prewarm_wait",
+    "session_checkout",
+    "dns",
+    "tcp_connect",
+    "autodetect",
+    "ssh_login",
+    "command",
+    "parse",
+    "render",
+    "write_json",
+    "count",
+    "fetch",
+    "fetch_changed",
+    "fetch_ids",
+    "save",
+)
+
+
+class Trace:
+    """
+    Timings of each phase of one operation, e.g. a command on a device or an inventory sync.
+    A phase can be timed more than once (e.g. one 'fetch' per page), its durations are added up.
+
+    Args:
+        name (str): What was traced: 'command' or 'sync'
+        host (str): Device the command ran on, or the SoT URL
+        command (str): Command that was run
+        attributes: Anything else worth keeping, e.g. the platform or the SoT
+    """
+
+    def __init__(
+        self,
+        name: str,
+        host: Optional[str] = None,
+        command: Optional[str] = None,
+        **attributes,
+    ):
+        self.name = name
+        self.host = host
+        self.command = command
+        self.attributes = attributes
+        self.started = time.time()
+        self._origin = time.perf_counter()
+        self.spans: list[dict] = []
+        self.total: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, phase: str, **attributes) -> Iterator[None]:
+        """Time the code in the `with` block as one phase"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(phase, time.perf_counter() - start, start=start, **attributes)
+
+    def add(
+        self, phase: str, duration: float, start: Optional[float] = None, **attributes
+    ) -> None:
+        """Record a phase timed elsewhere. `start` is a `time.perf_counter()` value."""
+        if start is None:
+            start = time.perf_counter() - duration
+        with self._lock:
+            self.spans.append(
+                {
+                    "phase": phase,
+                    "start": start - self._origin,
+                    "duration": duration,
+                    **attributes,
+                }
+            )
+
+    def finish(self) -> "Trace":
+        """Record the total time. Phases may still be added afterwards, e.g. rendering."""
+        self.total = time.perf_counter() - self._origin
+        return self
+
+    @property
+    def phases(self) -> dict[str, float]:
+        """Total seconds per phase, in the order the phases happen"""
+        totals: dict[str, float] = {}
+        with self._lock:
+            for span in self.spans:
+                totals[span["phase"]] = totals.get(span["phase"], 0) + span["duration"]
+        order = {phase: i for i, phase in enumerate(PHASE_ORDER)}
+        return dict(sorted(totals.items(), key=lambda item: order.get(item[0], 99)))
+
+    @property
+    def summary(self) -> str:
+        """One line summary, e.g. 'ssh_login 0.25s · command 0.10s · parse 0.02s'"""
+        return " · ".join(
+            f"{phase} {duration:.2f}s" for phase, duration in self.phases.items()
+        )
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            spans = [dict(span) for span in self.spans]
+        return {
+            "name": self.name,
+            "host": self.host,
+            "command": self.command,
+            "started": self.started,
+            "total": self.total,
+            "phases": self.phases,
+            "spans": spans,
+            **self.attributes,
+        }
+
+
+_current: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar(
+    "net_textorial_trace", default=None
+)
+
+
+def current_trace() -> Optional[Trace]:
+    """The trace of the operation running in this thread, if there is one"""
+    return _current.get()
+
+
+@contextmanager
+def span(phase: str, **attributes) -> Iterator[None]:
+    """Time a phase of the operation running in this thread. Does nothing if it isn't traced."""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    with trace.span(phase, **attributes):
+        yield
+
+
+@contextmanager
+def start_trace(name: str, **kwargs) -> Iterator[Trace]:
+    """
+    Trace an operation. Phases timed with `span()` in the `with` block, in this thread, are added
+    to the trace. The finished trace is kept by the timing stats.
+
+    Args:
+        name (str): What is traced, see `Trace`
+        kwargs: Passed on to `Trace`
+    """
+    trace = Trace(name, **kwargs)
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+        get_timing_stats().record(trace.finish())
+
+
+class TimingStats:
+    """
+    Keeps the most recent traces, to show aggregates per device and per command and to export
+    them. Aggregates are worked out from the kept traces when they are asked for, so phases
+    added to a trace after it finished (e.g. rendering) are counted too.
+
+    Finished traces are also appended to `log_file`, one JSON object per line, if it is set.
+
+    Args:
+        max_traces (int): Number of traces kept
+        log_file (str): Optional path of a structured (NDJSON) log of every trace
+    """
+
+    def __init__(self, max_traces: int = 1000, log_file: Optional[str] = None):
+        self.log_file = log_file
+        self._traces: "deque[Trace]" = deque(maxlen=max_traces)
+        self._lock = threading.Lock()
+
+    def record(self, trace: Trace) -> None:
+        with self._lock:
+            self._traces.append(trace)
+            if self.log_file:
+                with open(self.log_file, "a") as log:
+                    log.write(json.dumps(trace.to_dict()) + "\n")
+
+    def traces(self, name: Optional[str] = None) -> list[Trace]:
+        with self._lock:
+            traces = list(self._traces)
+        return [trace for trace in traces if name is None or trace.name == name]
+
+    def aggregate(self, by: str = "host", name: str = "command") -> list[dict]:
+        """
+        Timings grouped by device or command, slowest (by mean total time) first
+
+        Args:
+            by (str): 'host' for each device, or 'command' for each platform and command, which
+                also shows which TextFSM templates are slow to parse
+            name (str): Which traces to include, see `Trace`
+
+        Returns:
+            List of dicts with 'key', 'count', 'mean', 'max' and 'phases' (mean seconds per phase) keys
+        """
+        groups: dict[str, list[Trace]] = {}
+        for trace in self.traces(name):
+            if trace.total is None:
+                continue
+            if by == "host":
+                key = trace.host or ""
+            else:
+                platform = trace.attributes.get("platform")
+                key = f"{platform} {trace.command}" if platform else trace.command or ""
+            groups.setdefault(key, []).append(trace)
+
+        rows = []
+        for key, traces in groups.items():
+            phases: dict[str, float] = {}
+            for trace in traces:
+                for phase, duration in trace.phases.items():
+                    phases[phase] = phases.get(phase, 0) + duration
+            totals = [trace.total for trace in traces]
+            rows.append(
+                {
+                    "key": key,
+                    "count": len(traces),
+                    "mean": sum(totals) / len(totals),
+                    "max": max(totals),
+                    "phases": {
+                        phase: total / len(traces) for phase, total in phases.items()
+                    },
+                }
+            )
+        return sorted(rows, key=lambda row: row["mean"], reverse=True)
+
+    def export(self, path: str) -> int:
+        """
+        Write the kept traces as a Chrome trace file, which can be opened in chrome://tracing or
+        https://ui.perfetto.dev. Each device (or SoT) gets its own row.
+
+        Returns:
+            Number of traces written
+        """
+        traces = self.traces()
+        rows: dict[str, int] = {}
+        events = []
+        for trace in traces:
+            row = rows.setdefault(trace.host or trace.name, len(rows) + 1)
+            start = trace.started * 1_000_000
+            label = f"{trace.name}: {trace.command}" if trace.command else trace.name
+            events.append(
+                {
+                    "name": label,
+                    "cat": trace.name,
+                    "ph": "X",
+                    "ts": start,
+                    "dur": (trace.total or 0) * 1_000_000,
+                    "pid": 1,
+                    "tid": row,
+                    "args": {"host": trace.host, **trace.attributes},
+                }
+            )
+            for span in trace.to_dict()["spans"]:
+                args = {
+                    key: value
+                    for key, value in span.items()
+                    if key not in ("phase", "start", "duration")
+                }
+                events.append(
+                    {
+                        "name": span["phase"],
+                        "cat": trace.name,
+                        "ph": "X",
+                        "ts": start + span["start"] * 1_000_000,
+                        "dur": span["duration"] * 1_000_000,
+                        "pid": 1,
+                        "tid": row,
+                        "args": args,
+                    }
+                )
+        # Name each row after its device
+        for host, row in rows.items():
+            events.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": 1,
+                    "tid": row,
+                    "args": {"name": host},
+                }
+            )
+        with open(path, "w") as trace_file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, trace_file)
+        return len(traces)
+
+
+_stats: Optional[TimingStats] = None
+_stats_lock = threading.Lock()
+
+
+def get_timing_stats() -> TimingStats:
+    """
+    Returns the app-wide timing stats. Settings are read from environment variables:
+        - NET_TEXT_TRACE_KEEP: number of traces kept for aggregates and export (default: 1000)
+        - NET_TEXT_TRACE_LOG: file every trace is appended to as a JSON line (default: not logged)
+    """
+    global _stats
+    with _stats_lock:
+        if _stats is None:
+            _stats = TimingStats(
+                max_traces=int(os.getenv("NET_TEXT_TRACE_KEEP", 1000)),
+                log_file=os.getenv("NET_TEXT_TRACE_LOG") or None,
+            )
+    return _stats
+
+
+def timing_renderable(
+    trace: Optional[Trace], stats: TimingStats, limit: int = 5
+) -> Group:
+    """Timing panel: phases of the last command, then the slowest devices and commands"""
+    parts = []
+    if trace is not None:
+        phases = Table(title="Last command", title_justify="left", box=None)
+        phases.add_column("Phase")
+        phases.add_column("Time", justify="right")
+        phases.add_column("")
+        longest = max(trace.phases.values(), default=0) or 1
+        for phase, duration in trace.phases.items():
+            bar = "█" * max(1, round(duration / longest * 30))
+            phases.add_row(phase, f"{duration * 1000:.0f}ms", Text(bar, style="green1"))
+        if trace.total is not None:
+            phases.add_row(
+                Text("total", style="bold"), f"{trace.total * 1000:.0f}ms", ""
+            )
+        parts.append(phases)
+
+    for by, title in (("host", "Slowest devices"), ("command", "Slowest commands")):
+        rows = stats.aggregate(by)[:limit]
+        if not rows:
+            continue
+        table = Table(title=title, title_justify="left", box=None)
+        table.add_column(by.capitalize())
+        table.add_column("Runs", justify="right")
+        table.add_column("Mean", justify="right")
+        table.add_column("Max", justify="right")
+        table.add_column("Slowest phase")
+        for row in rows:
+            slowest = max(row["phases"].items(), key=lambda item: item[1], default=None)
+            table.add_row(
+                row["key"],
+                str(row["count"]),
+                f"{row['mean']:.2f}s",
+                f"{row['max']:.2f}s",
+                f"{slowest[0]} ({slowest[1]:.2f}s)" if slowest else "",
+            )
+        parts.append(table)
+
+    if not parts:
+        parts.append(Text("No timings yet. Run a command first."))
+    parts.append(Text("ctrl+t exports every trace to timings.json", style="#a1a1a1"))
+    return Group(*parts)
@@ -0,0 +1,494 @@
+from collections import OrderedDict
+from typing import Any, Optional
+
+from rich.cells import cell_len, set_cell_size
+from rich.segment import Segment
+from rich.style import Style
+from rich.syntax import Syntax
+from rich.text import Text
+from textual.geometry import Region, Size
+from textual.scroll_view import ScrollView
+from textual.strip import Strip
+from textual.widgets import Tree
+from textual.widgets._tree import TreeNode
+
+# local imports
+from diff import key_columns
+
+# Max number of children created under one node. Bigger lists/dicts are split into ranges.
+PAGE_SIZE = 100
+# Number of highlighted lines kept by the raw output viewer
+LINE_CACHE_SIZE = 2000
+
+
+class LazyNode:
+    """
+    Data attached to each node of the JSON tree
+
+    Args:
+        value (Any): The part of the parsed output this node represents
+        start (int): First index/key of `value` shown under this node
+        stop (int): Index/key after the last one shown under this node
+        keys (list): Keys of `value` if it's a dict, shared between the ranges of a big dict
+    """
+
+    def __init__(self, value: Any, start: int = 0, stop: int = None, keys: list = None):
+        self.value = value
+        self.start = start
+        self.stop = len(value) if stop is None else stop
+        if keys is None and isinstance(value, dict):
+            keys = list(value.keys())
+        self.keys = keys
+        self.loaded = False
+
+
+class JSONTree(Tree):
+    """
+    Interactive tree view of parsed output. A node's children are only created when it is expanded,
+    so huge outputs are shown instantly. Lists and dicts with more than PAGE_SIZE entries are split
+    into ranges (e.g. '[0..99] of 120000') that are themselves expanded on demand.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__("Parsed Output", *args, **kwargs)
+        self.show_root = True
+        self._loaded_data = None
+
+    def load(self, data: Any) -> None:
+        """Show new parsed output. Loading the same output again keeps the expanded nodes."""
+        if data is self._loaded_data:
+            return
+        self._loaded_data = data
+        self.clear()
+        self.root.set_label(self.describe("Parsed Output", data))
+        if isinstance(data, (dict, list)):
+            self.root.data = LazyNode(data)
+            self.root.data.loaded = True
+            self.root.allow_expand = True
+            self.populate(self.root)
+        else:
+            self.root.data = None
+            self.root.allow_expand = False
+
+    def on_tree_node_expanded(self, event: Tree.NodeExpanded) -> None:
+        """Create the children of a node the first time it is expanded"""
+        node = event.node
+        if isinstance(node.data, LazyNode) and not node.data.loaded:
+            node.data.loaded = True
+            self.populate(node)
+
+    def populate(self, node: TreeNode) -> None:
+        """Add the children of a node, one level only"""
+        lazy = node.data
+        value, start, stop, keys = lazy.value, lazy.start, lazy.stop, lazy.keys
+        count = stop - start
+
+        if count > PAGE_SIZE:
+            # Split into at most PAGE_SIZE ranges, each expanded on demand
+            step = PAGE_SIZE
+            while count > step * PAGE_SIZE:
+                step *= PAGE_SIZE
+            for range_start in range(start, stop, step):
+                range_stop = min(range_start + step, stop)
+                node.add(
+                    Text(
+                        f"[{range_start}..{range_stop - 1}] of {len(value)}",
+                        style="italic #a1a1a1",
+                    ),
+                    LazyNode(value, range_start, range_stop, keys),
+                )
+            return
+
+        for index in range(start, stop):
+            if keys is not None:
+                name, child = keys[index], value[keys[index]]
+            else:
+                name, child = index, value[index]
+            if isinstance(child, (dict, list)) and child:
+                node.add(self.describe(name, child), LazyNode(child))
+            else:
+                node.add_leaf(self.describe(name, child))
+
+    @staticmethod
+    def describe(name: Any, value: Any) -> Text:
+        """Label for a node"""
+        if isinstance(value, dict):
+            return Text(f"{name} {{dict}} ({len(value)} keys)", style="bold red")
+        if isinstance(value, list):
+            return Text(f"{name} [list] ({len(value)} items)", style="bold red")
+        return Text.assemble((f"{name}: ", "bold"), (f"{value}", "bold gold1"))
+
+
+class RawOutputViewer(ScrollView, can_focus=True):
+    """
+    Line-virtualized viewer for raw CLI output. Only the lines in view are highlighted and rendered,
+    so scrolling through a 200k-line output stays smooth. Output can be appended in chunks while a
+    command is still running, and searched with `search()`.
+    """
+
+    DEFAULT_CSS = """
+    RawOutputViewer {
+        height: 1fr;
+    }
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._syntax = Syntax("", "teratermmacro", theme="nord")
+        self._lines: list[str] = []
+        self._partial = ""
+        self._max_width = 0
+        self._cache: "OrderedDict[int, Strip]" = OrderedDict()
+        self._search: Optional[str] = None
+        self._match_line = -1
+        self._text = None
+
+    @property
+    def line_count(self) -> int:
+        return len(self._lines) + (1 if self._partial else 0)
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self._lines + ([self._partial] if self._partial else []))
+
+    def load(self, text: str) -> None:
+        """Show new output. Loading the same output again keeps the scroll position."""
+        if text is self._text:
+            return
+        self.clear()
+        self.append(text)
+        self._text = text
+
+    def finish(self, text: str) -> None:
+        """
+        Mark streamed output as complete. If `text` is the output that was appended chunk by chunk,
+        loading it later is a no-op. Otherwise it replaces the streamed output.
+        """
+        if text == self.text:
+            self._text = text
+        else:
+            self.load(text)
+
+    def clear(self) -> None:
+        self._lines = []
+        self._partial = ""
+        self._max_width = 0
+        self._cache.clear()
+        self._match_line = -1
+        self._text = None
+        self.scroll_to(0, 0, animate=False)
+        self._update_size()
+
+    def append(self, chunk: str) -> None:
+        """Append a chunk of output, which may end part way through a line"""
+        if not chunk:
+            return
+        self._text = None
+        # Follow the output if the view is at the bottom
+        following = self.scroll_y >= self.max_scroll_y
+        lines = (self._partial + chunk.replace("\r\n", "\n").expandtabs()).split("\n")
+        self._partial = lines.pop()
+        # The partial line is re-rendered once it's complete
+        self._cache.pop(len(self._lines), None)
+        self._lines.extend(lines)
+        self._max_width = max(
+            [self._max_width, len(self._partial)] + [len(line) for line in lines]
+        )
+        self._update_size()
+        if following:
+            self.scroll_end(animate=False)
+
+    def update_lines(self, text: str) -> int:
+        """
+        Replace the output with a newer version of it, e.g. the next run of a watched command.
+        Lines are compared by position and only the lines that changed are rendered again,
+        the scroll position is kept.
+
+        Returns:
+            Number of lines that changed, were added or were removed
+        """
+        if text is self._text:
+            return 0
+        old_lines = self._lines + ([self._partial] if self._partial else [])
+        lines = text.replace("\r\n", "\n").expandtabs().split("\n")
+        self._partial = lines.pop()
+        self._lines = lines
+        self._text = text
+        new_lines = lines + ([self._partial] if self._partial else [])
+        changed = [
+            index
+            for index, (old, new) in enumerate(zip(old_lines, new_lines))
+            if old != new
+        ]
+        for index in changed:
+            self._cache.pop(index, None)
+        resized = len(new_lines) != len(old_lines)
+        for index in range(len(new_lines), len(old_lines)):
+            self._cache.pop(index, None)
+        max_width = max(map(len, new_lines), default=0)
+        if resized or max_width != self._max_width:
+            self._max_width = max_width
+            self._update_size()
+        else:
+            # Only repaint the changed lines that are in view
+            scroll_y = self.scroll_offset.y
+            width, height = self.size
+            for index in changed:
+                if scroll_y <= index < scroll_y + height:
+                    self.refresh(Region(0, index - scroll_y, width, 1))
+        return len(changed) + abs(len(new_lines) - len(old_lines))
+
+    def search(self, term: str) -> bool:
+        """
+        Highlight `term` and scroll to its next occurrence (case insensitive), wrapping around at the end
+
+        Returns:
+            True if the term was found
+        """
+        if term != self._search:
+            self._search = term or None
+            self._match_line = -1
+            self._cache.clear()
+            self.refresh()
+        if not term:
+            return False
+        term = term.lower()
+        count = self.line_count
+        for offset in range(1, count + 1):
+            index = (self._match_line + offset) % count
+            if term in self._get_line(index).lower():
+                # Re-render the previous match without the current match highlight
+                self._cache.pop(self._match_line, None)
+                self._match_line = index
+                self.scroll_to(y=max(0, index - self.size.height // 2), animate=False)
+                self._cache.pop(index, None)
+                self.refresh()
+                return True
+        return False
+
+    def _get_line(self, index: int) -> str:
+        if index < len(self._lines):
+            return self._lines[index]
+        return self._partial
+
+    @property
+    def _gutter_width(self) -> int:
+        return len(str(self.line_count)) + 2
+
+    def _update_size(self) -> None:
+        self.virtual_size = Size(self._max_width + self._gutter_width, self.line_count)
+        self.refresh()
+
+    def render_line(self, y: int) -> Strip:
+        scroll_x, scroll_y = self.scroll_offset
+        index = scroll_y + y
+        width = self.size.width
+        if index >= self.line_count:
+            return Strip.blank(width, self.rich_style)
+
+        gutter_width = self._gutter_width
+        gutter_style = Style(color="#616e88", bgcolor="#2e3440")
+        gutter = Strip(
+            [Segment(f"{index + 1:>{gutter_width - 1}} ", gutter_style)], gutter_width
+        )
+        line = self._render_content(index).crop(
+            scroll_x, scroll_x + width - gutter_width
+        )
+        return Strip.join([gutter, line]).extend_cell_length(width, self.rich_style)
+
+    def _render_content(self, index: int) -> Strip:
+        """Highlight a line, using the cache if it's been highlighted already"""
+        strip = self._cache.get(index)
+        if strip is not None:
+            self._cache.move_to_end(index)
+            return strip
+        text = self._syntax.highlight(self._get_line(index))
+        text.rstrip()
+        if self._search:
+            style = (
+                "black on yellow" if index == self._match_line else "black on #a1a1a1"
+            )
+            text.highlight_words([self._search], style, case_sensitive=False)
+        strip = Strip(list(text.render(self.app.console)))
+        self._cache[index] = strip
+        if len(self._cache) > LINE_CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return strip
+
+
+class WatchTable(ScrollView, can_focus=True):
+    """
+    Table of the latest parsed output of every watched device, one line per row. Each run is
+    matched to the device's previous rows by their natural key (see `diff.KEY_COLUMNS`), and only
+    the lines whose values changed are rendered again, with the changed cells highlighted until
+    the device's next run. Rows added or removed lay the table out again.
+    """
+
+    COMPONENT_CLASSES = {
+        "watch-table--header",
+        "watch-table--changed",
+    }
+
+    DEFAULT_CSS = """
+    WatchTable {
+        height: 1fr;
+    }
+    WatchTable > .watch-table--header {
+        background: $primary;
+        color: $text;
+        text-style: bold;
+    }
+    WatchTable > .watch-table--changed {
+        color: $warning;
+        text-style: bold;
+    }
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._columns: list[str] = []
+        self._widths = [cell_len("device")]
+        # Cell values of each device's rows by row key, in the order the device returned them
+        self._devices: dict[str, dict[tuple, list[str]]] = {}
+        # Changed cells of the rows that changed in their device's last run, by (device, row key)
+        self._changed: dict[tuple, set[int]] = {}
+        # (device, row key) of each line, and the reverse
+        self._order: list[tuple] = []
+        self._lines: dict[tuple, int] = {}
+
+    @property
+    def row_count(self) -> int:
+        return len(self._order)
+
+    @staticmethod
+    def _cell(value: Any) -> str:
+        # TextFSM 'List' values come out as lists
+        if isinstance(value, list):
+            return ", ".join(map(str, value))
+        return "" if value is None else str(value)
+
+    def update_device(self, device: str, rows: list[dict]) -> int:
+        """
+        Show a device's latest table, in place of its previous one
+
+        Args:
+            device (str): Device name, shown in the first column
+            rows (list[dict]): TextFSM table. The columns of the first table shown are used for every device.
+
+        Returns:
+            Number of rows whose values changed since the device's previous run
+        """
+        if not self._columns and rows:
+            self._columns = list(rows[0])
+            self._widths += [cell_len(column) for column in self._columns]
+        columns = self._columns
+        key = [columns.index(column) for column in key_columns(columns)]
+        new: dict[tuple, list[str]] = {}
+        for row in rows:
+            values = [self._cell(row.get(column)) for column in columns]
+            row_key = tuple(values[index] for index in key) if key else tuple(values)
+            # Rows with the same key (e.g. ECMP routes) are told apart by their position
+            occurrence = 0
+            while (row_key, occurrence) in new:
+                occurrence += 1
+            new[row_key, occurrence] = values
+        old = self._devices.get(device, {})
+        self._devices[device] = new
+
+        dirty = set()
+        # Cells highlighted after the previous run go back to normal
+        for row_key in old:
+            if self._changed.pop((device, row_key), None) is not None:
+                dirty.add((device, row_key))
+        changed = 0
+        for row_key, values in new.items():
+            previous = old.get(row_key)
+            if previous is not None and previous != values:
+                self._changed[device, row_key] = {
+                    index
+                    for index, (before, after) in enumerate(zip(previous, values))
+                    if before != after
+                }
+                dirty.add((device, row_key))
+                changed += 1
+
+        widths = self._widths.copy()
+        widths[0] = max(widths[0], cell_len(device))
+        for values in new.values():
+            for index, value in enumerate(values, 1):
+                if len(value) > widths[index]:
+                    widths[index] = max(widths[index], cell_len(value))
+        layout_changed = old.keys() != new.keys()
+        if layout_changed:
+            self._layout()
+        if layout_changed or widths != self._widths:
+            # A wider cell moves the columns after it, so the whole table is repainted
+            self._widths = widths
+            self.virtual_size = Size(self._table_width, len(self._order) + 1)
+            self.refresh()
+            return changed
+
+        # Same rows as before, only repaint the lines that changed and are in view
+        scroll_y = self.scroll_offset.y
+        width, height = self.size
+        for line in sorted(self._lines[row] for row in dirty):
+            # Line 0 is the header
+            y = line + 1 - scroll_y
+            if 1 <= y < height:
+                self.refresh(Region(0, y, width, 1))
+        return changed
+
+    def clear(self) -> None:
+        self._columns = []
+        self._widths = [cell_len("device")]
+        self._devices.clear()
+        self._changed.clear()
+        self._layout()
+        self.virtual_size = Size(0, 1)
+        self.refresh()
+
+    def _layout(self) -> None:
+        """Work out which row goes on which line: devices in the order they were first shown"""
+        self._order = [
+            (device, row_key)
+            for device, rows in self._devices.items()
+            for row_key in rows
+        ]
+        self._lines = {row: line for line, row in enumerate(self._order)}
+
+    @property
+    def _table_width(self) -> int:
+        # Each cell is padded with a space on both sides
+        return sum(width + 2 for width in self._widths)
+
+    def render_line(self, y: int) -> Strip:
+        scroll_x, scroll_y = self.scroll_offset
+        width = self.size.width
+        base_style = self.rich_style
+
+        if y == 0:
+            # Header, stays in place while scrolling down
+            style = self.get_component_rich_style("watch-table--header")
+            cells = ["device", *self._columns]
+            styles = [style] * len(cells)
+        else:
+            line = scroll_y + y - 1
+            if line >= len(self._order):
+                return Strip.blank(width, base_style)
+            device, row_key = row = self._order[line]
+            changed = self._changed.get(row, ())
+            changed_style = self.get_component_rich_style("watch-table--changed")
+            cells = [device, *self._devices[device][row_key]]
+            styles = [base_style] + [
+                changed_style if index in changed else base_style
+                for index in range(len(cells) - 1)
+            ]
+        segments = [
+            Segment(f" {set_cell_size(cell, column_width)} ", style)
+            for cell, column_width, style in zip(cells, self._widths, styles)
+        ]
+        return (
+            Strip(segments, self._table_width)
+            .crop(scroll_x, scroll_x + width)
+            .extend_cell_length(width, base_style)
+        )
@@ -0,0 +1,139 @@
+import heapq
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
+
+# local imports
+from helpers import run_device_command
+from session_pool import SessionPool, get_session_pool
+
+
+class Watcher:
+    """
+    Runs a command on devices over and over, every `interval` seconds, e.g. to keep an eye on
+    interface counters or BGP state. Each device has its own schedule, and sessions are reused
+    from the session pool between runs. Room for a session per device is reserved in the pool
+    while watching, so watching more devices than NET_TEXT_MAX_SESSIONS doesn't reconnect to
+    them on every run.
+
+    - Each run's start is moved by up to `jitter` times the interval, so devices aren't all
+      polled at the same moment.
+    - At most `max_workers` devices are queried at once.
+    - A device that's still answering the previous run when the next one is due is skipped
+      for that round instead of being queried twice.
+
+    Args:
+        targets (list[dict]): Devices returned by `fanout.resolve_targets()`
+        command (str): 'show' command to run
+        on_result (Callable): Called from a worker thread with each result from `run_device_command()`,
+            with a 'name' key added
+        interval (float): Seconds between runs on each device
+        jitter (float): Fraction of the interval each run is moved by, at random (0 to 1)
+        max_workers (int): Max devices queried at once
+    """
+
+    def __init__(
+        self,
+        targets: list[dict],
+        command: str,
+        on_result: Callable[[dict], None],
+        interval: float = 10,
+        jitter: float = 0.1,
+        max_workers: int = 16,
+    ):
+        self.targets = targets
+        self.command = command
+        self.on_result = on_result
+        self.interval = max(interval, 0.1)
+        self.jitter = min(max(jitter, 0), 1)
+        self.max_workers = max(1, max_workers)
+        self.runs = 0
+        self.skipped = 0
+        self._running: dict[int, Future] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pool: Optional[SessionPool] = None
+
+    @property
+    def active(self) -> bool:
+        return self._thread is not None and not self._stopped.is_set()
+
+    def start(self) -> "Watcher":
+        """Run the command on every device now, then keep running it on its schedule"""
+        self._pool = get_session_pool()
+        self._pool.reserve(len(self.targets))
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="net-textorial-watch"
+        )
+        self._thread = threading.Thread(
+            target=self._schedule, name="net-textorial-watch", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop scheduling runs. Commands already sent finish, but their results aren't reported."""
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._pool.unreserve(len(self.targets))
+
+    def _next_due(self, due: float, now: float) -> float:
+        offset = random.uniform(-self.jitter, self.jitter) * self.interval
+        # Keep to the schedule, unless the device fell a whole interval behind
+        return max(due + self.interval, now + self.interval / 2) + offset
+
+    def _schedule(self) -> None:
+        now = time.monotonic()
+        # Spread the first round over the jitter window too
+        queue = [
+            (now + random.uniform(0, self.jitter) * self.interval, index)
+            for index in range(len(self.targets))
+        ]
+        heapq.heapify(queue)
+        while queue and not self._stopped.wait(max(0, queue[0][0] - time.monotonic())):
+            due, index = heapq.heappop(queue)
+            running = self._running.get(index)
+            if running is not None and not running.done():
+                self.skipped += 1
+            else:
+                try:
+                    self._running[index] = self._executor.submit(self._run, index)
+                except RuntimeError:
+                    # Stopped while scheduling
+                    return
+            heapq.heappush(queue, (self._next_due(due, time.monotonic()), index))
+
+    def _run(self, index: int) -> None:
+        target = self.targets[index]
+        result = run_device_command(target["host"], self.command)
+        result["name"] = target["name"]
+        with self._lock:
+            self.runs += 1
+        if not self._stopped.is_set():
+            self.on_result(result)
+
+
+def get_watch_settings() -> dict:
+    """
+    Watcher settings from environment variables:
+        - NET_TEXT_WATCH_INTERVAL: seconds between runs on each device (default: 10)
+        - NET_TEXT_WATCH_JITTER: fraction of the interval runs are moved by at random (default: 0.1)
+        - NET_TEXT_WATCH_CONCURRENCY: devices queried at once (default: NET_TEXT_CONCURRENCY or 16)
+    """
+    return {
+        "interval": float(os.getenv("NET_TEXT_WATCH_INTERVAL", 10)),
+        "jitter": float(os.getenv("NET_TEXT_WATCH_JITTER", 0.1)),
+        "max_workers": int(
+            os.getenv(
+                "NET_TEXT_WATCH_CONCURRENCY", os.getenv("NET_TEXT_CONCURRENCY", 16)
+            )
+        ),
+    }